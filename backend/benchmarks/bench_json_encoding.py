@@ -0,0 +1,109 @@
+"""Serialization time and bytes on the wire for a large indicator matrix.
+
+Builds BENCH_ROWS synthetic matriz_parametro rows (dates and numerics as
+asyncpg returns them) and compares the former path, jsonable_encoder +
+json.dumps, with FastJSONResponse (orjson), then the size of the body under
+gzip and brotli at the levels the middleware uses. No database needed:
+
+    BENCH_ROWS=10000 python backend/benchmarks/bench_json_encoding.py
+"""
+import os
+import sys
+import json
+import time
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'sms_bench')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+
+BENCH_ROWS = int(os.environ.get('BENCH_ROWS', 10000))
+BENCH_REPEAT = int(os.environ.get('BENCH_REPEAT', 5))
+
+
+def build_rows(n: int) -> list:
+    return [
+        {
+            "id_indicador": i,
+            "id_entidad": i % 40,
+            "id_area": i % 300,
+            "id_sector": i % 12,
+            "id_pilar": i % 13,
+            "id_eje": i % 60,
+            "codi_meta": f"M{i % 500:04d}",
+            "codi_resultado": f"R{i % 900:04d}",
+            "codi_accion": f"A{i:05d}",
+            "codi": f"{i % 13}.{i % 60}.{i % 500}.{i}",
+            "indicador_resultado": f"Porcentaje de cobertura del servicio de agua potable en el municipio {i}",
+            "formula_indicador": "(Población con acceso / Población total) * 100",
+            "anio_base": 2020,
+            "linea_base": Decimal(f"{i % 100}.25"),
+            "anio_logro": 2025,
+            "logro": Decimal("85.5"),
+            "estado": "ACTIVO",
+            "fecha_registro": datetime(2024, 1, 1 + i % 28, 10, 30),
+            "fecha_corte": date(2025, 12, 31)
+        }
+        for i in range(n)
+    ]
+
+
+def best_of(func) -> tuple:
+    best = None
+    result = None
+    for _ in range(BENCH_REPEAT):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+def encode_default(rows: list) -> bytes:
+    # FastAPI's path for a plain return value with JSONResponse
+    return json.dumps(jsonable_encoder(rows), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def encode_fast(rows: list) -> bytes:
+    return server.FastJSONResponse(rows).body
+
+
+def main():
+    rows = build_rows(BENCH_ROWS)
+    default_ms, default_body = best_of(lambda: encode_default(rows))
+    fast_ms, fast_body = best_of(lambda: encode_fast(rows))
+    assert json.loads(default_body) == json.loads(fast_body), "encoders disagree"
+
+    print(f"rows: {BENCH_ROWS}")
+    print(f"jsonable_encoder + json.dumps : {default_ms:9.1f} ms  {len(default_body):>10} bytes")
+    print(f"FastJSONResponse (orjson)     : {fast_ms:9.1f} ms  {len(fast_body):>10} bytes  ({default_ms / fast_ms:.1f}x)")
+
+    def compress_gzip():
+        encoder = server.GzipEncoder(server.GZIP_LEVEL)
+        return encoder.compress(fast_body) + encoder.finish()
+
+    gzip_ms, gzip_body = best_of(compress_gzip)
+    assert zlib.decompress(gzip_body, 47) == fast_body
+    print(f"gzip level {server.GZIP_LEVEL}                  : {gzip_ms:9.1f} ms  {len(gzip_body):>10} bytes  "
+          f"({len(fast_body) / len(gzip_body):.1f}x smaller)")
+    if server.brotli is None:
+        print("brotli                        : not installed")
+        return
+
+    def compress_brotli():
+        encoder = server.BrotliEncoder(server.BROTLI_QUALITY)
+        return encoder.compress(fast_body) + encoder.finish()
+
+    brotli_ms, brotli_body = best_of(compress_brotli)
+    print(f"brotli quality {server.BROTLI_QUALITY}              : {brotli_ms:9.1f} ms  {len(brotli_body):>10} bytes  "
+          f"({len(fast_body) / len(brotli_body):.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Latency of an unrelated endpoint while many logins run concurrently.
+
+Measures GET /api/ (no database access) alone and then during a storm of
+concurrent POST /api/sms/login calls. With bcrypt off the event loop, p99 of
+the probe should stay flat:
+
+    BENCH_URL=http://localhost:8001 BENCH_USER=admin BENCH_PASSWORD=... \
+        BENCH_LOGINS=50 python backend/benchmarks/bench_login_latency.py
+"""
+import os
+import time
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+BENCH_URL = os.environ.get('BENCH_URL', 'http://localhost:8001').rstrip('/')
+BENCH_USER = os.environ.get('BENCH_USER', 'admin')
+BENCH_PASSWORD = os.environ.get('BENCH_PASSWORD', 'admin')
+BENCH_LOGINS = int(os.environ.get('BENCH_LOGINS', 50))
+BENCH_ROUNDS = int(os.environ.get('BENCH_ROUNDS', 5))
+PROBE_INTERVAL = 0.01
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def probe(stop: threading.Event) -> list:
+    session = requests.Session()
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.get(f"{BENCH_URL}/api/").raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(PROBE_INTERVAL)
+    return samples
+
+
+def login(_):
+    start = time.perf_counter()
+    res = requests.post(f"{BENCH_URL}/api/sms/login", json={"username": BENCH_USER, "password": BENCH_PASSWORD})
+    res.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def measure(with_logins: bool) -> tuple:
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=BENCH_LOGINS + 1) as pool:
+        probe_future = pool.submit(probe, stop)
+        login_times = []
+        if with_logins:
+            for _ in range(BENCH_ROUNDS):
+                login_times.extend(pool.map(login, range(BENCH_LOGINS)))
+        else:
+            time.sleep(2)
+        stop.set()
+        return probe_future.result(), login_times
+
+
+def report(label: str, samples: list):
+    print(f"{label:<28} n={len(samples):5d}  p50={percentile(samples, 50):8.2f} ms  "
+          f"p99={percentile(samples, 99):8.2f} ms  mean={statistics.mean(samples):8.2f} ms")
+
+
+def main():
+    idle, _ = measure(with_logins=False)
+    loaded, logins = measure(with_logins=True)
+    report("probe GET /api/ (idle)", idle)
+    report(f"probe GET /api/ ({BENCH_LOGINS} logins)", loaded)
+    report("POST /api/sms/login", logins)
+    stats = requests.get(f"{BENCH_URL}/api/sms/auth/stats").json()
+    print(f"bcrypt pool: {stats['bcrypt']}")
+
+
+if __name__ == "__main__":
+    main()
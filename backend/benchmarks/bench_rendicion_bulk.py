@@ -0,0 +1,73 @@
+"""Compare per-record POST /rendicion with POST /rendicion/bulk.
+
+Runs against a live server and WRITES rendicion rows, so point it at a test
+database only:
+
+    BENCH_URL=http://localhost:8001 BENCH_GESTION=2099 BENCH_RECORDS=200 \
+        python backend/benchmarks/bench_rendicion_bulk.py
+"""
+import os
+import time
+import requests
+
+BENCH_URL = os.environ.get('BENCH_URL', 'http://localhost:8001').rstrip('/')
+BENCH_GESTION = int(os.environ.get('BENCH_GESTION', 2099))
+BENCH_RECORDS = int(os.environ.get('BENCH_RECORDS', 200))
+
+
+def load_indicadores(session: requests.Session) -> list:
+    res = session.get(
+        f"{BENCH_URL}/api/sms/matriz_parametros",
+        params={"fields": "id_indicador", "limit": BENCH_RECORDS}
+    )
+    res.raise_for_status()
+    return [row['id_indicador'] for row in res.json()]
+
+
+def build_records(ids: list, round_no: int) -> list:
+    return [
+        {"id_indicador": id_indicador, "gestion": BENCH_GESTION, "ejecutado_ene": round_no, "modificaciones": f"bench {round_no}"}
+        for id_indicador in ids
+    ]
+
+
+def run_per_record(session: requests.Session, records: list) -> float:
+    start = time.perf_counter()
+    for record in records:
+        session.post(f"{BENCH_URL}/api/sms/rendicion", json=record).raise_for_status()
+    return time.perf_counter() - start
+
+
+def run_bulk(session: requests.Session, records: list) -> float:
+    start = time.perf_counter()
+    res = session.post(f"{BENCH_URL}/api/sms/rendicion/bulk", json={"items": records})
+    res.raise_for_status()
+    elapsed = time.perf_counter() - start
+    errores = res.json()['errores']
+    if errores:
+        raise SystemExit(f"Bulk upsert reported {errores} errors: {res.json()['resultados'][:3]}")
+    return elapsed
+
+
+def main():
+    session = requests.Session()
+    ids = load_indicadores(session)
+    if not ids:
+        raise SystemExit("No indicators found in matriz_parametro")
+
+    # Warm up both paths (pool, statement cache, existing rows)
+    run_per_record(session, build_records(ids[:5], 0))
+    run_bulk(session, build_records(ids[:5], 0))
+
+    per_record = run_per_record(session, build_records(ids, 1))
+    bulk = run_bulk(session, build_records(ids, 2))
+
+    n = len(ids)
+    print(f"records: {n}  gestion: {BENCH_GESTION}")
+    print(f"per-record POST /rendicion : {per_record:8.3f} s  {n / per_record:10.1f} rec/s")
+    print(f"POST /rendicion/bulk       : {bulk:8.3f} s  {n / bulk:10.1f} rec/s")
+    print(f"speedup                    : {per_record / bulk:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Merge rendicion rows stored more than once for an (id_indicador, gestion)
+and create the unique index the API's upserts rely on.
+
+For each duplicated pair the newest row (highest id_rendicion) is kept; every
+column it leaves empty is filled from the older rows, newest first, and the
+derived acumulado_* / proc_ejecutado_* values are recomputed. Columns where
+the rows hold different values keep the newest one and are listed so they can
+be checked:
+
+    python dedupe_rendicion.py --dry-run
+    python dedupe_rendicion.py
+"""
+import argparse
+import asyncio
+
+import server
+
+
+def is_empty(value) -> bool:
+    return value is None or value == ''
+
+
+def merge_rows(rows: list, columns) -> tuple:
+    """Merge rows of one pair, newest first: (merged row, conflicting columns)."""
+    merged = dict(rows[0])
+    conflicts = []
+    for column in columns:
+        if column in server.RENDICION_KEY_COLUMNS:
+            continue
+        values = [row[column] for row in rows if not is_empty(row[column])]
+        if values and is_empty(merged[column]):
+            merged[column] = values[0]
+        if len(set(map(str, values))) > 1:
+            conflicts.append(column)
+    merged.update(server.compute_rendicion_totals(merged, columns))
+    return merged, conflicts
+
+
+async def main(dry_run: bool):
+    pool = await server.get_pg_pool()
+    try:
+        async with pool.acquire() as conn, conn.transaction():
+            # Saves wait until the merge and the index are in place
+            await conn.execute("LOCK TABLE rendicion IN SHARE ROW EXCLUSIVE MODE")
+            columns = await server.get_table_columns(conn, "rendicion")
+            duplicates = await conn.fetch(server.RENDICION_DUPLICATES)
+            removed = 0
+            for dup in duplicates:
+                ids = dup['ids']
+                rows = await conn.fetch(
+                    "SELECT * FROM rendicion WHERE id_rendicion = ANY($1::int[]) ORDER BY id_rendicion DESC", ids
+                )
+                merged, conflicts = merge_rows(rows, columns)
+                detail = f", distintos en: {', '.join(conflicts)}" if conflicts else ""
+                server.logger.info(
+                    f"Indicador {dup['id_indicador']} gestión {dup['gestion']}: se conserva {ids[0]}, "
+                    f"se fusionan {ids[1:]}{detail}"
+                )
+                removed += len(ids) - 1
+                if dry_run:
+                    continue
+                update, cols = server.rendicion_update_statement(columns)
+                token = [merged['version']] if 'version' in columns else []
+                await update.fetchrow(conn, ids[0], *token, *[merged.get(c) for c in cols])
+                await conn.execute("DELETE FROM rendicion WHERE id_rendicion = ANY($1::int[])", ids[1:])
+            if dry_run:
+                server.logger.info(f"Se fusionarían {len(duplicates)} pares, {removed} filas eliminadas")
+                return
+            await conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_rendicion_indicador_gestion ON rendicion (id_indicador, gestion)"
+            )
+            for gestion in sorted({dup['gestion'] for dup in duplicates}):
+                await server.refresh_dashboard(conn, gestion=gestion)
+            server.logger.info(f"Fusionados {len(duplicates)} pares, {removed} filas eliminadas, índice creado")
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fusiona las rendiciones duplicadas por indicador y gestión")
+    parser.add_argument("--dry-run", action="store_true", help="Solo informa, no modifica filas")
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run))
@@ -0,0 +1,77 @@
+"""Move existing attachments into the content-addressed blob store.
+
+Hashes every archivos_rendicion file still stored under its own name, moves
+it to blobs/<sha256[:2]>/<sha256> (dropping it if an identical blob already
+exists) and points the document at the shared blob, counting its reference
+first like an upload does:
+
+    python dedupe_uploads.py --dry-run
+    python dedupe_uploads.py
+"""
+import argparse
+import asyncio
+import hashlib
+
+import server
+
+
+def hash_file(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(server.UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def main(dry_run: bool):
+    migrated = missing = freed = 0
+    pending = set()
+    async for archivo in server.db.archivos_rendicion.find({}, {"_id": 0}):
+        sha256 = archivo.get("sha256")
+        if sha256 and archivo["nombre_almacenado"] == server.blob_relative_path(sha256):
+            continue
+        path = server.UPLOAD_DIR / archivo["nombre_almacenado"]
+        if not path.exists():
+            missing += 1
+            server.logger.warning(f"Archivo {archivo['id']}: {path} no existe")
+            continue
+        sha256 = await asyncio.to_thread(hash_file, path)
+        blob = server.UPLOAD_DIR / server.blob_relative_path(sha256)
+        if blob.exists() or sha256 in pending:
+            freed += path.stat().st_size
+        migrated += 1
+        if dry_run:
+            pending.add(sha256)
+            continue
+        # The document's reference, held before the blob is placed or reused
+        await server.acquire_blob(sha256)
+        try:
+            await asyncio.to_thread(server.store_blob, path, sha256)
+            # Only if the document was not deleted (or moved) meanwhile
+            result = await server.db.archivos_rendicion.update_one(
+                {"id": archivo["id"], "nombre_almacenado": archivo["nombre_almacenado"]},
+                {"$set": {"sha256": sha256, "nombre_almacenado": server.blob_relative_path(sha256)}}
+            )
+        except FileNotFoundError:
+            # Deleted with its document after it was hashed
+            await server.release_blob(sha256)
+            missing += 1
+            continue
+        except Exception:
+            await server.release_blob(sha256)
+            raise
+        if not result.matched_count:
+            await server.release_blob(sha256)
+    if not dry_run:
+        # Blobs of documents moved by earlier runs, before they were counted
+        await server.rebuild_blob_refs()
+    action = "Se migrarían" if dry_run else "Migrados"
+    server.logger.info(f"{action} {migrated} archivos, {freed} bytes liberados por duplicados, {missing} no encontrados")
+    server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplica los archivos de rendición por contenido (SHA-256)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo informa, no mueve archivos")
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run))
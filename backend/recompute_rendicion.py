@@ -0,0 +1,33 @@
+"""Backfill acumulado_* / proc_ejecutado_* for stored rendiciones and refresh
+the dashboard summary of each recomputed gestión.
+
+    python recompute_rendicion.py                 # every gestión
+    python recompute_rendicion.py --gestion 2025 --gestion 2026
+"""
+import argparse
+import asyncio
+
+import server
+
+
+async def main(gestiones: list):
+    pool = await server.get_pg_pool()
+    try:
+        async with pool.acquire() as conn:
+            if not gestiones:
+                rows = await server.RENDICION_GESTIONES.fetch(conn)
+                gestiones = [r['gestion'] for r in rows]
+            for gestion in gestiones:
+                count = await server.recompute_rendicion_gestion(conn, gestion)
+                # dashboard_resumen counts estados from these percentages
+                await server.refresh_dashboard(conn, gestion=gestion)
+                server.logger.info(f"Gestión {gestion}: {count} rendiciones recalculadas, dashboard actualizado")
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula los acumulados y porcentajes de rendición")
+    parser.add_argument("--gestion", type=int, action="append", default=[], help="Gestión a recalcular (repetible)")
+    args = parser.parse_args()
+    asyncio.run(main(args.gestion))
@@ -1,19 +1,60 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Form, Request, Response, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
+from fastapi.routing import APIRoute
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import MultipartParseError
 import os
+import json
+import time
+import asyncio
+import io
+import csv
+import hashlib
+import mimetypes
 import logging
+import zlib
+import bisect
+import inspect
+import math
+import re
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Any
 import uuid
-from datetime import datetime, timezone, timedelta
+from decimal import Decimal
+from datetime import date, datetime, timezone, timedelta
+from email.utils import formatdate, parsedate_to_datetime
 import asyncpg
 import bcrypt
+import numpy as np
+import orjson
 import jwt
 
+try:
+    import brotli
+except ImportError:
+    # Optional: without it responses are only gzip-compressed
+    brotli = None
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    # Optional: only needed with CACHE_BACKEND=redis
+    aioredis = None
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -22,30 +63,348 @@ JWT_SECRET = os.environ.get('JWT_SECRET', 'sms_mmaya_secret_key_2025_secure')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRES_HOURS = 24
 
+# Verified-token cache: max entries kept in memory
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+
+# Password hashing: bcrypt cost, worker threads and max queued operations
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', 4))
+BCRYPT_MAX_QUEUE = int(os.environ.get('BCRYPT_MAX_QUEUE', 200))
+
 # PostgreSQL Configuration for SMS
 PG_CONFIG = {
-    'host': '37.60.254.167',
-    'port': 5432,
-    'database': 'sms',
-    'user': 'admin_sibelys',
-    'password': 'P1c010c0#2026',
+    'host': os.environ.get('PG_HOST', '37.60.254.167'),
+    'port': int(os.environ.get('PG_PORT', 5432)),
+    'database': os.environ.get('PG_DATABASE', 'sms'),
+    'user': os.environ.get('PG_USER', 'admin_sibelys'),
+    'password': os.environ.get('PG_PASSWORD', 'P1c010c0#2026'),
     'command_timeout': 60
 }
 
+# Optional read replica for idempotent GET handlers (same credentials unless
+# overridden). Unset PG_REPLICA_HOST to send everything to the primary.
+PG_REPLICA_CONFIG = {
+    **PG_CONFIG,
+    'host': os.environ['PG_REPLICA_HOST'],
+    'port': int(os.environ.get('PG_REPLICA_PORT', PG_CONFIG['port'])),
+    'database': os.environ.get('PG_REPLICA_DATABASE', PG_CONFIG['database']),
+    'user': os.environ.get('PG_REPLICA_USER', PG_CONFIG['user']),
+    'password': os.environ.get('PG_REPLICA_PASSWORD', PG_CONFIG['password'])
+} if os.environ.get('PG_REPLICA_HOST') else None
+# Seconds a client keeps reading from the primary after its own write, and
+# seconds to wait before retrying a replica that could not be reached
+PG_REPLICA_STICKY_SECONDS = float(os.environ.get('PG_REPLICA_STICKY_SECONDS', 5))
+PG_REPLICA_RETRY_SECONDS = float(os.environ.get('PG_REPLICA_RETRY_SECONDS', 30))
+
+# Pool sizing, prepared statements cached per connection and seconds an idle
+# connection is kept open
+PG_POOL_MIN_SIZE = int(os.environ.get('PG_POOL_MIN_SIZE', 2))
+PG_POOL_MAX_SIZE = int(os.environ.get('PG_POOL_MAX_SIZE', 10))
+PG_STATEMENT_CACHE_SIZE = int(os.environ.get('PG_STATEMENT_CACHE_SIZE', 100))
+PG_MAX_INACTIVE_LIFETIME = float(os.environ.get('PG_MAX_INACTIVE_LIFETIME', 300))
+
+# Response compression: smallest body compressed (bytes) and encoder levels
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1000))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 4))
+
+# Health check: seconds allowed for each backend to answer
+HEALTH_TIMEOUT = float(os.environ.get('HEALTH_TIMEOUT', 2))
+
+# Request latency histogram bounds (seconds); queries slower than
+# SLOW_QUERY_MS are logged and the last SLOW_QUERY_LOG_SIZE kept for /metrics
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 500))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 100))
+
+# Largest page accepted by /matriz_parametros?limit=
+MATRIZ_MAX_PAGE = 1000
+
+# Rows per chunk written by the streaming rendicion export
+RENDICION_EXPORT_BATCH = 500
+
+# Maximum records accepted by POST /rendicion/bulk
+RENDICION_BULK_MAX = 2000
+
+# Attachment listings: largest page and most (id_indicador, gestion) pairs per query
+ARCHIVOS_MAX_PAGE = 1000
+ARCHIVOS_QUERY_MAX_PARES = 5000
+
+# Attachments: largest accepted upload and streaming chunk size (bytes)
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 250 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+# Bytes of the other multipart fields (and headroom for part headers)
+UPLOAD_FORM_MAX_BYTES = 64 * 1024
+# Read size used when the server cannot hand a download to sendfile (bytes)
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_SIZE', 256 * 1024))
+
+# Background jobs: worker tasks, pool connections they may hold at once (the
+# rest of pg_pool stays free for requests), queued jobs accepted and hours a
+# finished job and its result file are kept
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_PG_CONNECTIONS = int(os.environ.get('JOB_PG_CONNECTIONS', 2))
+JOB_QUEUE_MAX = int(os.environ.get('JOB_QUEUE_MAX', 100))
+JOB_RESULT_TTL_HOURS = int(os.environ.get('JOB_RESULT_TTL_HOURS', 24))
+
+# Change events (SSE): seconds between keep-alives, events queued per client
+# before it is told to resync, and recent events kept for Last-Event-ID replay
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', 1000))
+EVENTS_REPLAY_SIZE = int(os.environ.get('EVENTS_REPLAY_SIZE', 1000))
+
+# Shared cache tier: "local" keeps entries per worker only, "mongo" shares
+# them through the app database and "redis" through any Redis-compatible
+# server at CACHE_REDIS_URL; CACHE_LOCAL_SIZE entries stay in each worker
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'local')
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_LOCAL_SIZE = int(os.environ.get('CACHE_LOCAL_SIZE', 1000))
+
+# Catalog cache: safety TTL (seconds) for changes made outside this API
+CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 600))
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
-# PostgreSQL pool
+# PostgreSQL pools
 pg_pool = None
+pg_pool_lock = asyncio.Lock()
+pg_replica_pool = None
+pg_replica_retry_at = 0.0
+
+# ========== JSON Helpers ==========
+def json_default(value):
+    """json.dumps fallback for the types asyncpg returns (dates, numerics)."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def orjson_default(value):
+    """orjson fallback: asyncpg records, and Decimals encoded as jsonable_encoder does."""
+    if isinstance(value, asyncpg.Record):
+        return dict(value)
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps_json(content) -> bytes:
+    return orjson.dumps(content, default=orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson.
+
+    Returning it directly from a handler skips FastAPI's jsonable_encoder pass;
+    rows can be handed over as asyncpg records, dates are encoded natively.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps_json(content)
 
 # Create the main app
-app = FastAPI(title="SMS - Sistema de Monitoreo Sectorial")
+app = FastAPI(title="SMS - Sistema de Monitoreo Sectorial", default_response_class=FastJSONResponse)
+
+# Route of the running handler, used to attribute database time
+current_handler: ContextVar[str] = ContextVar("current_handler", default="-")
+# Set for reads by a client that wrote recently: they skip the replica
+read_from_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+class RecentWriters:
+    """Clients (see client_key) that wrote within `window` seconds."""
+
+    def __init__(self, window: float, max_size: int = 10000):
+        self.window = window
+        self.max_size = max_size
+        self._until = {}
+
+    def mark(self, key: str):
+        now = time.monotonic()
+        if len(self._until) >= self.max_size:
+            self._until = {k: t for k, t in self._until.items() if t > now}
+        self._until[key] = now + self.window
+
+    def is_recent(self, key: str) -> bool:
+        until = self._until.get(key)
+        return until is not None and until > time.monotonic()
+
+recent_writers = RecentWriters(PG_REPLICA_STICKY_SECONDS)
+
+# Identifies a browser without a bearer token for read-your-writes; issued
+# on its first successful write, also accepted as an X-Client-Id header
+CLIENT_ID_COOKIE = "sms_cliente"
+CLIENT_ID_MAX_AGE = 30 * 24 * 3600
+
+def client_key(request: Request) -> Optional[str]:
+    """Key of the client for read-your-writes, None if it cannot be told apart.
+
+    The hashed bearer token, else the client id. Never the address: behind
+    the ingress every client shares it.
+    """
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return "t:" + hashlib.sha256(authorization.encode()).hexdigest()
+    client_id = request.headers.get("x-client-id") or request.cookies.get(CLIENT_ID_COOKIE)
+    return "c:" + client_id[:64] if client_id else None
+
+class Histogram:
+    """Latency histogram with Prometheus cumulative `le` buckets."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # One slot per bound plus +Inf; cumulated when exported
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> list:
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Estimate interpolated inside the bucket, as histogram_quantile() does."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return min(lower + (bound - lower) * (rank - seen) / count, self.max)
+            lower, seen = bound, seen + count
+        return self.max
+
+class RequestMetrics:
+    """Latency, status codes and in-flight requests per route of this process."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.in_flight = 0
+        self._routes = {}
+
+    def record(self, method: str, route: str, status: int, elapsed: float):
+        entry = self._routes.get((method, route))
+        if entry is None:
+            entry = self._routes[(method, route)] = {"latency": Histogram(self.buckets), "status": {}}
+        entry["latency"].observe(elapsed)
+        entry["status"][status] = entry["status"].get(status, 0) + 1
+
+    def items(self):
+        return sorted(self._routes.items())
+
+    def stats(self) -> dict:
+        routes = []
+        for (method, route), entry in self._routes.items():
+            latency = entry["latency"]
+            routes.append({
+                "method": method,
+                "route": route,
+                "requests": latency.count,
+                "status": {str(code): n for code, n in sorted(entry["status"].items())},
+                "total_ms": round(1000 * latency.sum, 3),
+                "avg_ms": round(1000 * latency.sum / latency.count, 3),
+                "p50_ms": round(1000 * latency.quantile(0.5), 3),
+                "p95_ms": round(1000 * latency.quantile(0.95), 3),
+                "p99_ms": round(1000 * latency.quantile(0.99), 3),
+                "max_ms": round(1000 * latency.max, 3)
+            })
+        # Where the time goes first
+        routes.sort(key=lambda r: r["total_ms"], reverse=True)
+        return {"in_flight": self.in_flight, "routes": routes}
+
+request_metrics = RequestMetrics(LATENCY_BUCKETS)
+
+# Long-lived streams: in flight only until their headers are sent, and
+# never in the latency series
+UNMETERED_ROUTES = {"/api/sms/events"}
+
+class MetricsMiddleware:
+    """Times every HTTP request until its last body chunk is sent.
+
+    Requests are labelled with the route template MeteredRoute stores in the
+    scope (so /indicadores/1 and /indicadores/2 share a series); requests no
+    route matched are grouped under "unmatched". UNMETERED_ROUTES are left out.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        start = time.perf_counter()
+        counted = True
+
+        async def send_wrapper(message):
+            nonlocal status, counted
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if scope.get("route_path") in UNMETERED_ROUTES:
+                    counted = False
+                    self.metrics.in_flight -= 1
+            await send(message)
+
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if counted:
+                self.metrics.in_flight -= 1
+            if scope.get("route_path") not in UNMETERED_ROUTES:
+                self.metrics.record(scope["method"], scope.get("route_path", "unmatched"), status, time.perf_counter() - start)
+
+class MeteredRoute(APIRoute):
+    """APIRoute that tags the database work of its handler with the route.
+
+    It also gives read-your-writes: after a successful write, the same
+    client's reads stay on the primary for PG_REPLICA_STICKY_SECONDS.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        name = f"{','.join(sorted(self.methods))} {self.path}"
+
+        async def metered_handler(request):
+            # Not reset: streamed bodies run later in the same request task
+            current_handler.set(name)
+            request.scope["route_path"] = self.path
+            if request.method in SAFE_METHODS:
+                if PG_REPLICA_CONFIG:
+                    key = client_key(request)
+                    read_from_primary.set(key is not None and recent_writers.is_recent(key))
+                return await handler(request)
+            response = await handler(request)
+            if PG_REPLICA_CONFIG and response.status_code < 400:
+                key = client_key(request)
+                if key is None:
+                    client_id = uuid.uuid4().hex
+                    response.set_cookie(
+                        CLIENT_ID_COOKIE, client_id, max_age=CLIENT_ID_MAX_AGE, path="/api", httponly=True, samesite="lax"
+                    )
+                    response.headers["X-Client-Id"] = client_id
+                    key = "c:" + client_id
+                recent_writers.mark(key)
+            return response
+        return metered_handler
 
 # Create routers
-api_router = APIRouter(prefix="/api")
-sms_router = APIRouter(prefix="/api/sms", tags=["SMS"])
+api_router = APIRouter(prefix="/api", route_class=MeteredRoute)
+sms_router = APIRouter(prefix="/api/sms", tags=["SMS"], route_class=MeteredRoute)
 
 # Security
 security = HTTPBearer(auto_error=False)
@@ -55,35 +414,803 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 # ========== PostgreSQL Connection ==========
+class PoolMetrics:
+    """Acquire wait, query time and rows, overall and per handler.
+
+    Queries over SLOW_QUERY_MS are logged and kept in `slow_queries`.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.waiting = 0
+        self._handlers = {}
+
+    def _handler(self, name: str) -> dict:
+        entry = self._handlers.get(name)
+        if entry is None:
+            entry = self._handlers[name] = {
+                "acquires": 0, "acquire_wait": 0.0, "acquire_wait_max": 0.0,
+                "queries": 0, "query_time": 0.0, "query_time_max": 0.0, "errors": 0,
+                "rows": 0, "slow": 0
+            }
+        return entry
+
+    def record_acquire(self, wait: float):
+        entry = self._handler(current_handler.get())
+        entry["acquires"] += 1
+        entry["acquire_wait"] += wait
+        entry["acquire_wait_max"] = max(entry["acquire_wait_max"], wait)
+
+    def record_query(self, record):
+        """asyncpg query logger callback (runs in the caller's context)."""
+        handler = current_handler.get()
+        entry = self._handler(handler)
+        entry["queries"] += 1
+        entry["query_time"] += record.elapsed
+        entry["query_time_max"] = max(entry["query_time_max"], record.elapsed)
+        if record.exception is not None:
+            entry["errors"] += 1
+        if 1000 * record.elapsed >= SLOW_QUERY_MS:
+            entry["slow"] += 1
+            query = " ".join(record.query.split())
+            # Arguments are left out: they may carry credentials
+            slow_queries.append({
+                "at": datetime.now(timezone.utc).isoformat(),
+                "pool": self.name,
+                "handler": handler,
+                "elapsed_ms": round(1000 * record.elapsed, 3),
+                "query": query[:1000],
+                "error": type(record.exception).__name__ if record.exception is not None else None
+            })
+            logger.warning(f"Slow query on {self.name} ({1000 * record.elapsed:.0f} ms) in {handler}: {query[:200]}")
+
+    def record_rows(self, rows: int):
+        self._handler(current_handler.get())["rows"] += rows
+
+    def items(self):
+        return sorted(self._handlers.items())
+
+    def stats(self, pool=None) -> dict:
+        handlers = {}
+        for name, entry in sorted(self._handlers.items()):
+            handlers[name] = {
+                "acquires": entry["acquires"],
+                "acquire_wait_avg_ms": round(1000 * entry["acquire_wait"] / entry["acquires"], 3) if entry["acquires"] else 0,
+                "acquire_wait_max_ms": round(1000 * entry["acquire_wait_max"], 3),
+                "queries": entry["queries"],
+                "query_time_ms": round(1000 * entry["query_time"], 3),
+                "query_time_avg_ms": round(1000 * entry["query_time"] / entry["queries"], 3) if entry["queries"] else 0,
+                "query_time_max_ms": round(1000 * entry["query_time_max"], 3),
+                "errors": entry["errors"],
+                "rows": entry["rows"],
+                "slow": entry["slow"]
+            }
+        acquires = sum(e["acquires"] for e in self._handlers.values())
+        wait = sum(e["acquire_wait"] for e in self._handlers.values())
+        result = {
+            "waiting": self.waiting,
+            "acquires": acquires,
+            "acquire_wait_avg_ms": round(1000 * wait / acquires, 3) if acquires else 0,
+            "acquire_wait_max_ms": round(1000 * max((e["acquire_wait_max"] for e in self._handlers.values()), default=0), 3),
+            "handlers": handlers
+        }
+        if pool is not None:
+            size, idle = pool.get_size(), pool.get_idle_size()
+            result.update({
+                "size": size,
+                "idle": idle,
+                "in_use": size - idle,
+                "min_size": pool.get_min_size(),
+                "max_size": pool.get_max_size()
+            })
+        return result
+
+class MeteredConnection(asyncpg.Connection):
+    """Connection that adds the rows each query returned or changed to its pool's metrics.
+
+    `metrics` is set by create_metered_pool when the connection is opened.
+    """
+
+    metrics = None
+
+    async def fetch(self, query, *args, **kwargs):
+        rows = await super().fetch(query, *args, **kwargs)
+        if self.metrics is not None:
+            self.metrics.record_rows(len(rows))
+        return rows
+
+    async def fetchrow(self, query, *args, **kwargs):
+        row = await super().fetchrow(query, *args, **kwargs)
+        if self.metrics is not None and row is not None:
+            self.metrics.record_rows(1)
+        return row
+
+    async def execute(self, query, *args, **kwargs):
+        status = await super().execute(query, *args, **kwargs)
+        # Command tag: "UPDATE 3", "INSERT 0 1", "SELECT 5"...
+        count = status.rsplit(" ", 1)[-1] if status else ""
+        if self.metrics is not None and count.isdigit():
+            self.metrics.record_rows(int(count))
+        return status
+
+class MeteredPool:
+    """asyncpg pool wrapper that times how long acquire() waits."""
+
+    def __init__(self, pool, metrics: PoolMetrics):
+        self._pool = pool
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+    @asynccontextmanager
+    async def acquire(self, timeout: Optional[float] = None):
+        start = time.perf_counter()
+        self.metrics.waiting += 1
+        try:
+            conn = await self._pool.acquire(timeout=timeout)
+        finally:
+            self.metrics.waiting -= 1
+        self.metrics.record_acquire(time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            await self._pool.release(conn)
+
+    def stats(self) -> dict:
+        return self.metrics.stats(self._pool)
+
+pool_metrics = PoolMetrics("primary")
+replica_metrics = PoolMetrics("replica")
+slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+async def create_metered_pool(config: dict, metrics: PoolMetrics, **kwargs) -> MeteredPool:
+    async def setup_connection(conn):
+        conn.metrics = metrics
+        conn.add_query_logger(metrics.record_query)
+
+    pool = await asyncpg.create_pool(
+        **config,
+        min_size=PG_POOL_MIN_SIZE,
+        max_size=PG_POOL_MAX_SIZE,
+        statement_cache_size=PG_STATEMENT_CACHE_SIZE,
+        max_inactive_connection_lifetime=PG_MAX_INACTIVE_LIFETIME,
+        init=setup_connection,
+        connection_class=MeteredConnection,
+        **kwargs
+    )
+    return MeteredPool(pool, metrics)
+
 async def get_pg_pool():
     global pg_pool
     if pg_pool is None:
-        try:
-            pg_pool = await asyncpg.create_pool(**PG_CONFIG, min_size=2, max_size=10)
-            logger.info("PostgreSQL pool created successfully")
-        except Exception as e:
-            logger.error(f"Failed to create PostgreSQL pool: {e}")
-            raise HTTPException(status_code=500, detail="Database connection failed")
+        # Concurrent first callers must not each create a pool
+        async with pg_pool_lock:
+            if pg_pool is None:
+                try:
+                    pg_pool = await create_metered_pool(PG_CONFIG, pool_metrics)
+                    logger.info(f"PostgreSQL pool created successfully (min={PG_POOL_MIN_SIZE}, max={PG_POOL_MAX_SIZE})")
+                except Exception as e:
+                    logger.error(f"Failed to create PostgreSQL pool: {e}")
+                    raise HTTPException(status_code=500, detail="Database connection failed")
     return pg_pool
 
+async def get_pg_replica_pool():
+    """The replica pool, or None if not configured or currently unreachable."""
+    global pg_replica_pool, pg_replica_retry_at
+    if pg_replica_pool is None and PG_REPLICA_CONFIG and time.monotonic() >= pg_replica_retry_at:
+        async with pg_pool_lock:
+            if pg_replica_pool is None and time.monotonic() >= pg_replica_retry_at:
+                try:
+                    # Read-only sessions: a write routed here by mistake fails loudly
+                    pg_replica_pool = await create_metered_pool(
+                        PG_REPLICA_CONFIG, replica_metrics,
+                        server_settings={'default_transaction_read_only': 'on'}
+                    )
+                    logger.info(f"PostgreSQL replica pool created ({PG_REPLICA_CONFIG['host']}:{PG_REPLICA_CONFIG['port']})")
+                except Exception as e:
+                    pg_replica_retry_at = time.monotonic() + PG_REPLICA_RETRY_SECONDS
+                    logger.warning(f"PostgreSQL replica unavailable, reading from primary: {e}")
+    return pg_replica_pool
+
+async def get_pg_read_pool():
+    """Pool for idempotent reads: the replica, unless the client wrote recently."""
+    if PG_REPLICA_CONFIG and not read_from_primary.get():
+        replica = await get_pg_replica_pool()
+        if replica is not None:
+            return replica
+    return await get_pg_pool()
+
 async def get_db():
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
         yield conn
 
+# ========== Table Schema ==========
+# Column names per table, read once from information_schema
+table_columns_cache = {}
+
+async def get_table_columns(conn, table: str) -> list:
+    if table not in table_columns_cache:
+        rows = await conn.fetch("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = $1
+            ORDER BY ordinal_position
+        """, table)
+        table_columns_cache[table] = [r['column_name'] for r in rows]
+    return table_columns_cache[table]
+
+# ========== Statements ==========
+class Statement:
+    """A named SQL statement and its execution timing.
+
+    Preparing is left to asyncpg's per-connection statement cache; what the
+    fixed text adds is that every call hits it instead of parsing a new
+    variant.
+    """
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    async def _run(self, method: str, conn, args):
+        start = time.perf_counter()
+        try:
+            return await getattr(conn, method)(self.sql, *args)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.calls += 1
+            self.total += elapsed
+            self.max = max(self.max, elapsed)
+
+    async def fetch(self, conn, *args):
+        return await self._run("fetch", conn, args)
+
+    async def fetchrow(self, conn, *args):
+        return await self._run("fetchrow", conn, args)
+
+    async def fetchval(self, conn, *args):
+        return await self._run("fetchval", conn, args)
+
+    async def execute(self, conn, *args):
+        return await self._run("execute", conn, args)
+
+    async def executemany(self, conn, records):
+        return await self._run("executemany", conn, (records,))
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(1000 * self.total, 3),
+            "avg_ms": round(1000 * self.total / self.calls, 3) if self.calls else 0,
+            "max_ms": round(1000 * self.max, 3)
+        }
+
+class StatementRegistry:
+    """The API's SQL, declared once per statement.
+
+    Covers the catalog, user, role/menu, indicator, rendición and dashboard
+    queries. Left out on purpose: the indicator search (optional filters and
+    projection), the rendición INSERT and bulk upserts (built from the
+    submitted columns, so table defaults and untouched columns are kept),
+    the recompute row selection (the caller's condition), schema DDL and
+    health probes.
+    """
+
+    def __init__(self):
+        self._statements = {}
+
+    def add(self, name: str, sql: str) -> Statement:
+        """Declare a statement; re-declaring the same text returns the existing one.
+
+        Statements built from table columns are declared at first use and are
+        replaced (with fresh timing) only if the generated text changes.
+        """
+        statement = self._statements.get(name)
+        if statement is None or statement.sql != sql:
+            statement = self._statements[name] = Statement(name, sql)
+        return statement
+
+    def stats(self) -> dict:
+        return {name: statement.stats() for name, statement in sorted(self._statements.items())}
+
+statements = StatementRegistry()
+
+# ========== Cache ==========
+class MongoCacheBackend:
+    """Shared cache tier in a collection of the app's MongoDB.
+
+    Entries carry an `expira` date removed by a TTL index; version counters
+    have none and are kept.
+    """
+
+    kind = "mongo"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def setup(self):
+        await self.collection.create_index("expira", expireAfterSeconds=0)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        # The TTL monitor only runs once a minute
+        doc = await self.collection.find_one({"_id": key, "expira": {"$gt": datetime.now(timezone.utc)}})
+        return doc["valor"] if doc else None
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        expira = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        await self.collection.update_one({"_id": key}, {"$set": {"valor": value, "expira": expira}}, upsert=True)
+
+    async def incr(self, key: str) -> int:
+        doc = await self.collection.find_one_and_update(
+            {"_id": key}, {"$inc": {"n": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return doc["n"]
+
+    async def counter(self, key: str) -> int:
+        doc = await self.collection.find_one({"_id": key})
+        return doc["n"] if doc else 0
+
+    async def scan(self, prefix: str) -> dict:
+        cursor = self.collection.find({
+            "_id": {"$regex": f"^{re.escape(prefix)}"},
+            "expira": {"$gt": datetime.now(timezone.utc)}
+        })
+        return {doc["_id"][len(prefix):]: doc["valor"] async for doc in cursor}
+
+    async def close(self):
+        pass
+
+class RedisCacheBackend:
+    """Shared cache tier in a Redis-compatible server (Redis, Valkey, KeyDB...).
+
+    Keys are prefixed so several deployments can share one server. Version
+    counters have no expiry: use a volatile-* maxmemory policy so only
+    entries are evicted.
+    """
+
+    kind = "redis"
+
+    def __init__(self, url: str, prefix: str):
+        self.client = aioredis.from_url(url)
+        self.prefix = prefix
+
+    async def setup(self):
+        await self.client.ping()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(self.prefix + key)
+
+    async def counter(self, key: str) -> int:
+        return int(await self.client.get(self.prefix + key) or 0)
+
+    async def scan(self, prefix: str) -> dict:
+        keys = [key async for key in self.client.scan_iter(match=f"{self.prefix}{prefix}*")]
+        values = await self.client.mget(keys) if keys else []
+        skip = len(self.prefix) + len(prefix)
+        return {key.decode()[skip:]: value for key, value in zip(keys, values) if value is not None}
+
+    async def close(self):
+        await self.client.aclose()
+
+def create_cache_backend(kind: str):
+    """Shared tier selected by CACHE_BACKEND; None keeps caches per worker."""
+    if kind == "local":
+        return None
+    if kind == "mongo":
+        return MongoCacheBackend(db.cache)
+    if kind == "redis":
+        if aioredis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+        return RedisCacheBackend(CACHE_REDIS_URL, f"{os.environ['DB_NAME']}:")
+    raise RuntimeError(f"Unknown CACHE_BACKEND: {kind}")
+
+cache_backend = create_cache_backend(CACHE_BACKEND)
+
+class TieredCache:
+    """Per-worker LRU in front of an optional shared tier.
+
+    Loaders return serialized bytes, so an entry loaded by one worker is
+    reused by the others; `build` turns them into the value kept locally.
+    Each namespace (a table, for catalogs) has a version that is part of
+    the shared key. invalidate() moves the namespace to a new version and
+    returns it; the caller announces it on the event bus and the other
+    workers drop() their local entries. Shared entries of older versions,
+    including those written by a load that overlapped the change, are never
+    read again and just expire. If the shared tier fails the cache keeps
+    working per worker.
+    """
+
+    def __init__(self, name: str, max_size: int, ttl: int, shared=None, build=None):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self.build = build or (lambda body: body)
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_errors = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._changes = {}
+        self._epoch = 0
+        # (namespace, key) -> [lock, requests using it]
+        self._locks = {}
+
+    def _lookup(self, entry_key):
+        entry = self._entries.get(entry_key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[entry_key]
+            return None
+        self._entries.move_to_end(entry_key)
+        return entry[1]
+
+    def _store(self, entry_key, value):
+        self._entries[entry_key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(entry_key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _shared(self, operation: str, *args):
+        try:
+            return await getattr(self.shared, operation)(*args)
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"Cache {self.name}: shared {operation} failed: {e}")
+            return None
+
+    def _version_key(self, namespace: str) -> str:
+        return f"{self.name}:{namespace}:version"
+
+    async def _shared_key(self, namespace: str, key: str) -> Optional[str]:
+        """Key of the entry under the namespace's current version, None to skip the shared tier."""
+        if not self.shared:
+            return None
+        if namespace not in self._versions:
+            version = await self._shared("counter", self._version_key(namespace))
+            if version is None:
+                return None
+            # A drop() may have set a newer one meanwhile
+            self._versions.setdefault(namespace, version)
+        return f"{self.name}:{namespace}:{self._versions[namespace]}:{key}"
+
+    async def get(self, namespace: str, key: str, loader) -> Any:
+        entry_key = (namespace, key)
+        value = self._lookup(entry_key)
+        if value is not None:
+            self.hits += 1
+            return value
+        # One load per key; the lock lives only while requests use it, since
+        # keys include path ids and would otherwise pile up
+        loading = self._locks.get(entry_key)
+        if loading is None:
+            loading = self._locks[entry_key] = [asyncio.Lock(), 0]
+        loading[1] += 1
+        try:
+            async with loading[0]:
+                return await self._load(entry_key, loader)
+        finally:
+            loading[1] -= 1
+            if not loading[1]:
+                del self._locks[entry_key]
+
+    async def _load(self, entry_key, loader) -> Any:
+        namespace, key = entry_key
+        # Another request may have loaded it while we were waiting
+        value = self._lookup(entry_key)
+        if value is not None:
+            self.hits += 1
+            return value
+        guard = (self._epoch, self._changes.get(namespace, 0))
+        shared_key = await self._shared_key(namespace, key)
+        body = await self._shared("get", shared_key) if shared_key else None
+        if body is not None:
+            self.shared_hits += 1
+        else:
+            self.misses += 1
+            body = await loader()
+            if shared_key:
+                await self._shared("set", shared_key, body, self.ttl)
+        value = self.build(body)
+        # Not kept if the namespace changed while loading
+        if guard == (self._epoch, self._changes.get(namespace, 0)):
+            self._store(entry_key, value)
+        return value
+
+    def _mark(self, namespace: str):
+        self._changes[namespace] = self._changes.get(namespace, 0) + 1
+        for entry_key in [k for k in self._entries if k[0] == namespace]:
+            del self._entries[entry_key]
+
+    async def invalidate(self, namespace: str) -> Optional[int]:
+        """Drop `namespace` here and move it to a new shared version, returned for the event."""
+        version = await self._shared("incr", self._version_key(namespace)) if self.shared else None
+        if version is not None:
+            self._versions[namespace] = max(self._versions.get(namespace, 0), version)
+        self._mark(namespace)
+        return version
+
+    def drop(self, namespace: str, version: Optional[int] = None):
+        """Apply an invalidation made by another worker."""
+        if version is not None:
+            self._versions[namespace] = max(self._versions.get(namespace, 0), version)
+        self._mark(namespace)
+
+    def reset(self):
+        """Forget all local entries and versions, after invalidations may have been missed."""
+        self._epoch += 1
+        self._entries.clear()
+        self._versions.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.shared_hits + self.misses
+        return {
+            "backend": self.shared.kind if self.shared else "local",
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.shared_hits) / total, 4) if total else 0.0,
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "evictions": self.evictions,
+            "shared_errors": self.shared_errors,
+            "invalidations": dict(self._changes),
+            "versions": dict(self._versions),
+            "ttl": self.ttl
+        }
+
+# ========== Catalog Cache ==========
+def catalog_entry(body: bytes) -> dict:
+    """Catalog list kept serialized, parsed (for /bootstrap) and with its ETag."""
+    return {'data': orjson.loads(body), 'body': body, 'etag': f'"{hashlib.sha1(body).hexdigest()}"'}
+
+catalog_cache = TieredCache("catalogos", CACHE_LOCAL_SIZE, CATALOG_CACHE_TTL, cache_backend, catalog_entry)
+
+# Catalog list queries, shared by the catalog endpoints and /bootstrap
+CATALOG_QUERIES = {
+    "sector": statements.add("sector.list", "SELECT id_sector as id, sector as nombre, estado FROM sector ORDER BY id_sector"),
+    "entidad": statements.add("entidad.list", "SELECT id_entidad as id, entidad as nombre, estado FROM entidad ORDER BY id_entidad"),
+    "area": statements.add("area.list", "SELECT id_area as id, id_entidad, area_organizacional as nombre, estado FROM area ORDER BY id_area"),
+    "pilar": statements.add("pilar.list", "SELECT id_pilar as id, pilar as nombre, estado FROM pilar ORDER BY id_pilar"),
+    "eje": statements.add("eje.list", "SELECT id_eje as id, eje as nombre, estado FROM eje ORDER BY id_eje"),
+    "meta": statements.add("meta.list", "SELECT id_meta as id, codi_meta as codigo, meta as nombre, estado FROM meta ORDER BY id_meta"),
+    "resultado": statements.add("resultado.list", "SELECT id_resultado as id, codi_resultado as codigo, resultado as nombre, estado FROM resultado ORDER BY id_resultado"),
+    "accion": statements.add("accion.list", "SELECT id_accion as id, codi_accion as codigo, accion as nombre, estado FROM accion ORDER BY id_accion"),
+    "rol": statements.add("rol.list", "SELECT * FROM rol ORDER BY id_rol")
+}
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in candidates or f'W/{etag}' in candidates
+
+async def get_catalog_entry(table: str, query: Statement, *args) -> dict:
+    async def load():
+        pool = await get_pg_pool()
+        async with pool.acquire() as conn:
+            rows = await query.fetch(conn, *args)
+            return dumps_json(jsonable_encoder([dict(r) for r in rows]))
+
+    # Same key in every worker, for the shared tier
+    key = hashlib.sha1(repr((query.sql, args)).encode()).hexdigest()
+    return await catalog_cache.get(table, key, load)
+
+async def catalog_response(request: Request, table: str, query: Statement, *args) -> Response:
+    entry = await get_catalog_entry(table, query, *args)
+    headers = {"ETag": entry['etag'], "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get('if-none-match'), entry['etag']):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry['body'], media_type="application/json", headers=headers)
+
+# ========== Password Hashing ==========
+class PasswordHasher:
+    """Runs bcrypt on a dedicated, size-bounded thread pool.
+
+    bcrypt takes 100-300 ms per call; running it inline would block the event
+    loop for every other request. When max_queue operations are already in
+    flight, new ones are rejected with 503 instead of piling up.
+    """
+
+    def __init__(self, workers: int, rounds: int, max_queue: int):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    async def _submit(self, func, *args):
+        if self.in_flight >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Servidor ocupado, intente nuevamente")
+        submitted = time.perf_counter()
+        self.in_flight += 1
+
+        def run():
+            started = time.perf_counter()
+            wait = started - submitted
+            try:
+                return func(*args)
+            finally:
+                finished = time.perf_counter()
+                loop.call_soon_threadsafe(self._record, wait, finished - started)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, run)
+
+    def _record(self, wait: float, run: float):
+        # Counters are only touched from the event loop thread
+        self.in_flight -= 1
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_run += run
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._submit(bcrypt.hashpw, password.encode(), bcrypt.gensalt(rounds=self.rounds))
+        return hashed.decode()
+
+    async def check(self, password: str, hashed: str) -> bool:
+        return await self._submit(bcrypt.checkpw, password.encode(), hashed.encode())
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "avg_run_ms": round(self.total_run / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(BCRYPT_WORKERS, BCRYPT_ROUNDS, BCRYPT_MAX_QUEUE)
+
 # ========== JWT Functions ==========
+class TokenRegistry:
+    """Verified-token cache plus in-memory revocation.
+
+    Claims of verified tokens are kept in an LRU keyed by the token's SHA-256,
+    so repeat requests skip the signature check. A token is rejected when its
+    hash was revoked (logout) or when it was issued before the user's epoch,
+    which is bumped on password change or deactivation. Running workers learn
+    of revocations through the event bus; with a shared cache tier they are
+    also stored there for workers started later.
+    """
+
+    def __init__(self, max_size: int, shared=None):
+        self.max_size = max_size
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self._claims = OrderedDict()
+        self._revoked = {}
+        self._epochs = {}
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def verify(self, token: str) -> dict:
+        key = self._key(token)
+        claims = self._claims.get(key)
+        if claims is not None:
+            self.hits += 1
+            self._claims.move_to_end(key)
+        else:
+            self.misses += 1
+            try:
+                claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+            except jwt.ExpiredSignatureError:
+                raise HTTPException(status_code=401, detail="Token expirado")
+            except jwt.InvalidTokenError:
+                raise HTTPException(status_code=401, detail="Token inválido")
+            self._claims[key] = claims
+            if len(self._claims) > self.max_size:
+                self._claims.popitem(last=False)
+
+        if claims['exp'] <= time.time():
+            self._claims.pop(key, None)
+            raise HTTPException(status_code=401, detail="Token expirado")
+        if key in self._revoked or claims.get('iat', 0) < self._epochs.get(claims.get('id_usuario'), 0):
+            raise HTTPException(status_code=401, detail="Token revocado")
+        return dict(claims)
+
+    def revoke(self, token: str, exp: float) -> str:
+        key = self._key(token)
+        self.revoke_key(key, exp)
+        return key
+
+    def revoke_key(self, key: str, exp: float):
+        self._revoked[key] = exp
+        # Expired tokens are rejected anyway; keep the set small
+        now = time.time()
+        for expired in [k for k, e in self._revoked.items() if e <= now]:
+            del self._revoked[expired]
+
+    def revoke_user(self, id_usuario: int, at: Optional[float] = None) -> float:
+        """Invalidate every token issued to the user until `at` (now); returns it."""
+        at = at or time.time()
+        self._epochs[id_usuario] = max(self._epochs.get(id_usuario, 0), at)
+        return at
+
+    async def _share(self, key: str, value: float, ttl: float):
+        if not self.shared or ttl <= 0:
+            return
+        try:
+            await self.shared.set(key, str(value).encode(), ttl)
+        except Exception as e:
+            logger.warning(f"Could not share token revocation: {e}")
+
+    async def share_revocation(self, key: str, exp: float):
+        await self._share(f"tokens:revocado:{key}", exp, exp - time.time())
+
+    async def share_epoch(self, id_usuario: int, at: float):
+        # Tokens issued before `at` are expired after JWT_EXPIRES_HOURS anyway
+        await self._share(f"tokens:epoca:{id_usuario}", at, JWT_EXPIRES_HOURS * 3600)
+
+    async def load(self):
+        """Take the revocations kept in the shared tier (worker start, missed events)."""
+        if not self.shared:
+            return
+        revocados = await self.shared.scan("tokens:revocado:")
+        epocas = await self.shared.scan("tokens:epoca:")
+        self._revoked.update((key, float(exp)) for key, exp in revocados.items())
+        for id_usuario, at in epocas.items():
+            self.revoke_user(int(id_usuario), float(at))
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._claims),
+            "revoked": len(self._revoked),
+            "user_epochs": len(self._epochs)
+        }
+
+token_registry = TokenRegistry(TOKEN_CACHE_SIZE, cache_backend)
+
 def create_token(data: dict) -> str:
     expires = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRES_HOURS)
     data['exp'] = expires
+    # Sub-second issue time so a revocation epoch never matches a newer token
+    data['iat'] = time.time()
     return jwt.encode(data, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 def verify_token(token: str) -> dict:
-    try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expirado")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Token inválido")
+    return token_registry.verify(token)
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     if not credentials:
@@ -146,6 +1273,23 @@ class IndicadorCreate(BaseModel):
     logro: Optional[str] = None
     estado: str = "ACTIVO"
 
+class RendicionBulkRequest(BaseModel):
+    items: List[dict]
+
+class JobRequest(BaseModel):
+    tipo: str
+    params: dict = Field(default_factory=dict)
+
+class ArchivoPar(BaseModel):
+    id_indicador: int
+    gestion: int
+
+class ArchivosQueryRequest(BaseModel):
+    pares: List[ArchivoPar]
+    fields: Optional[List[str]] = None
+    limit: int = Field(ARCHIVOS_MAX_PAGE, ge=1, le=ARCHIVOS_MAX_PAGE)
+    cursor: Optional[str] = None
+
 class RendicionData(BaseModel):
     id_indicador: int
     gestion: int
@@ -159,17 +1303,20 @@ class RendicionData(BaseModel):
 # ========== SMS Routes ==========
 
 # Login
+LOGIN_USER = statements.add("usuario.login", """
+    SELECT u.*, a.area_organizacional as nombre_area, r.rol
+    FROM usuario u
+    LEFT JOIN area a ON u.id_area = a.id_area
+    LEFT JOIN rol r ON u.id_rol = r.id_rol
+    WHERE u.username = $1 AND u.estado = 'ACTIVO'
+""")
+USUARIO_SET_CLAVE = statements.add("usuario.set_clave", "UPDATE usuario SET clave = $1 WHERE id_usuario = $2")
+
 @sms_router.post("/login", response_model=LoginResponse)
 async def login(request: LoginRequest):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        user = await conn.fetchrow("""
-            SELECT u.*, a.area_organizacional as nombre_area, r.rol
-            FROM usuario u
-            LEFT JOIN area a ON u.id_area = a.id_area
-            LEFT JOIN rol r ON u.id_rol = r.id_rol
-            WHERE u.username = $1 AND u.estado = 'ACTIVO'
-        """, request.username)
+        user = await LOGIN_USER.fetchrow(conn, request.username)
         
         if not user:
             raise HTTPException(status_code=401, detail="Usuario no encontrado o inactivo")
@@ -180,15 +1327,15 @@ async def login(request: LoginRequest):
         # Check if password is hashed or plain text
         if stored_password.startswith('$2'):
             # bcrypt hash
-            password_valid = bcrypt.checkpw(request.password.encode(), stored_password.encode())
+            password_valid = await password_hasher.check(request.password, stored_password)
         else:
             # Plain text (legacy)
             password_valid = (request.password == stored_password)
             
             # Auto-migrate to hashed password
             if password_valid:
-                hashed = bcrypt.hashpw(request.password.encode(), bcrypt.gensalt()).decode()
-                await conn.execute("UPDATE usuario SET clave = $1 WHERE id_usuario = $2", hashed, user['id_usuario'])
+                hashed = await password_hasher.hash(request.password)
+                await USUARIO_SET_CLAVE.execute(conn, hashed, user['id_usuario'])
                 logger.info(f"Password migrated for user: {request.username}")
         
         if not password_valid:
@@ -216,351 +1363,877 @@ async def login(request: LoginRequest):
 async def verify_token_endpoint(user: dict = Depends(get_current_user)):
     return {"valid": True, "user": user}
 
+# Logout
+@sms_router.post("/logout")
+async def logout(user: dict = Depends(get_current_user), credentials: HTTPAuthorizationCredentials = Depends(security)):
+    key = token_registry.revoke(credentials.credentials, user['exp'])
+    await token_registry.share_revocation(key, user['exp'])
+    await event_bus.publish("sesion", clave=key, exp=user['exp'])
+    return {"message": "Sesión cerrada"}
+
 # ========== Menu ==========
-@sms_router.get("/menu/{id_rol}")
-async def get_menu(id_rol: int):
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT m.*
-            FROM menu m
-            JOIN opciones o ON m.id_menu = o.id_menu
-            WHERE o.id_rol = $1 AND m.estado = 'ACTIVO' AND o.estado = 'ACTIVO'
-            ORDER BY m.id_menu ASC
-        """, id_rol)
-        return [dict(r) for r in rows]
+MENU_LIST = statements.add("menu.list", "SELECT * FROM menu ORDER BY id_menu ASC")
+OPCIONES_LIST = statements.add("opciones.list", "SELECT id_opcion, id_rol, id_menu, estado FROM opciones ORDER BY id_rol, id_menu")
 
-# ========== Sectores ==========
-@sms_router.get("/sectores")
-async def get_sectores():
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("SELECT id_sector as id, sector as nombre, estado FROM sector ORDER BY id_sector")
-        return [dict(r) for r in rows]
+class PermissionMatrix:
+    """Compiled role -> menu permissions, built from menu and opciones.
 
-@sms_router.post("/sectores")
-async def create_sector(item: GenericItem):
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "INSERT INTO sector (sector, estado) VALUES ($1, $2) RETURNING id_sector as id, sector as nombre, estado",
-            item.nombre, item.estado
-        )
-        return dict(row)
+    The whole structure is rebuilt after every write to menu/opciones/rol and
+    swapped in a single assignment, so readers always see a consistent
+    snapshot and menu/permission lookups are plain dictionary reads.
+    """
 
-@sms_router.put("/sectores/{id}")
-async def update_sector(id: int, item: GenericItem):
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "UPDATE sector SET sector = $1, estado = $2 WHERE id_sector = $3 RETURNING id_sector as id, sector as nombre, estado",
-            item.nombre, item.estado, id
-        )
-        return dict(row) if row else {"error": "Not found"}
+    def __init__(self):
+        self._snapshot = None
+        self._lock = asyncio.Lock()
+        self.builds = 0
+        self.built_at = None
 
-# ========== Entidades ==========
-@sms_router.get("/entidades")
-async def get_entidades():
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("SELECT id_entidad as id, entidad as nombre, estado FROM entidad ORDER BY id_entidad")
-        return [dict(r) for r in rows]
+    @staticmethod
+    def _build_tree(menus: list) -> list:
+        nodes = {m['id_menu']: {**m, 'hijos': []} for m in menus}
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node.get('id_padre'))
+            if parent is not None and parent is not node:
+                parent['hijos'].append(node)
+            else:
+                roots.append(node)
+        return roots
 
-@sms_router.post("/entidades")
-async def create_entidad(item: GenericItem):
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "INSERT INTO entidad (entidad, estado) VALUES ($1, $2) RETURNING id_entidad as id, entidad as nombre, estado",
-            item.nombre, item.estado
-        )
-        return dict(row)
+    async def rebuild(self, conn=None):
+        async with self._lock:
+            if conn is None:
+                pool = await get_pg_pool()
+                async with pool.acquire() as conn:
+                    snapshot = await self._load(conn)
+            else:
+                snapshot = await self._load(conn)
+            self._snapshot = snapshot
+            self.builds += 1
+            self.built_at = datetime.now(timezone.utc)
 
-@sms_router.put("/entidades/{id}")
-async def update_entidad(id: int, item: GenericItem):
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "UPDATE entidad SET entidad = $1, estado = $2 WHERE id_entidad = $3 RETURNING id_entidad as id, entidad as nombre, estado",
-            item.nombre, item.estado, id
-        )
-        return dict(row) if row else {"error": "Not found"}
+    async def _load(self, conn) -> dict:
+        menu_rows = await MENU_LIST.fetch(conn)
+        opcion_rows = await OPCIONES_LIST.fetch(conn)
 
-# ========== Areas ==========
-@sms_router.get("/areas")
-async def get_areas():
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("SELECT id_area as id, id_entidad, area_organizacional as nombre, estado FROM area ORDER BY id_area")
-        return [dict(r) for r in rows]
+        menus = {r['id_menu']: dict(r) for r in menu_rows}
+        menu_admin = [
+            {**m, 'padre_nombre': menus[m['id_padre']]['opcion'] if m.get('id_padre') in menus else None}
+            for m in menus.values()
+        ]
+        opciones = {}
+        allowed = {}
+        for r in opcion_rows:
+            menu = menus.get(r['id_menu'])
+            if menu is None:
+                continue
+            opciones.setdefault(r['id_rol'], []).append({
+                'id_opcion': r['id_opcion'],
+                'id_rol': r['id_rol'],
+                'id_menu': r['id_menu'],
+                'opcion': menu['opcion'],
+                'estado': r['estado']
+            })
+            if r['estado'] == 'ACTIVO' and menu['estado'] == 'ACTIVO':
+                allowed.setdefault(r['id_rol'], set()).add(r['id_menu'])
 
-@sms_router.get("/entidades/{id}/areas")
-async def get_areas_by_entidad(id: int):
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            "SELECT id_area as id, area_organizacional as nombre, estado FROM area WHERE id_entidad = $1 ORDER BY id_area",
-            id
-        )
-        return [dict(r) for r in rows]
+        menu_by_rol = {id_rol: [menus[i] for i in sorted(ids)] for id_rol, ids in allowed.items()}
+        return {
+            'menu_admin': menu_admin,
+            'opciones': opciones,
+            'allowed': {id_rol: frozenset(ids) for id_rol, ids in allowed.items()},
+            'menu': menu_by_rol,
+            'arbol': {id_rol: self._build_tree(items) for id_rol, items in menu_by_rol.items()}
+        }
 
-@sms_router.post("/areas")
-async def create_area(id_entidad: int = Form(...), nombre: str = Form(...), estado: str = Form("ACTIVO")):
+    async def get(self) -> dict:
+        if self._snapshot is None:
+            await self.rebuild()
+        return self._snapshot
+
+    async def menu(self, id_rol: int) -> list:
+        return (await self.get())['menu'].get(id_rol, [])
+
+    async def arbol(self, id_rol: int) -> list:
+        return (await self.get())['arbol'].get(id_rol, [])
+
+    async def opciones(self, id_rol: int) -> list:
+        return (await self.get())['opciones'].get(id_rol, [])
+
+    async def menu_admin(self) -> list:
+        return (await self.get())['menu_admin']
+
+    async def allows(self, id_rol: int, id_menu: int) -> bool:
+        return id_menu in (await self.get())['allowed'].get(id_rol, ())
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot or {}
+        return {
+            "builds": self.builds,
+            "built_at": self.built_at.isoformat() if self.built_at else None,
+            "roles": len(snapshot.get('opciones', {})),
+            "menus": len(snapshot.get('menu_admin', []))
+        }
+
+permission_matrix = PermissionMatrix()
+
+@sms_router.get("/menu/{id_rol}")
+async def get_menu(id_rol: int):
+    return await permission_matrix.menu(id_rol)
+
+@sms_router.get("/menu/{id_rol}/arbol")
+async def get_menu_arbol(id_rol: int):
+    return await permission_matrix.arbol(id_rol)
+
+# ========== Change Events ==========
+EVENTS_CHANNEL = "sms_cambios"
+# NOTIFY payloads are limited to 8000 bytes; bigger events lose their `fila`
+EVENTS_MAX_PAYLOAD = 7500
+# Seconds before reconnecting a lost listener (also sent to SSE clients)
+EVENTS_RETRY_SECONDS = 5
+# Shared with the other workers only, never sent to clients
+INTERNAL_EVENTS = {"sesion"}
+
+class EventSubscriber:
+    """Queue of SSE frames for one connected client and the user it belongs to."""
+
+    def __init__(self, max_size: int, tipos: Optional[set], user: dict):
+        self.queue = asyncio.Queue(max_size)
+        self.tipos = tipos
+        self.user = user
+
+    def wants(self, tipo: str) -> bool:
+        return tipo == "reset" or not self.tipos or tipo in self.tipos
+
+    def view(self, event: dict) -> Optional[str]:
+        """How much of `event` this client may see: "full", "keys" (no `fila`) or None.
+
+        Administrators see everything. Other users only see events about
+        their own account, and indicator rows of their own area; for other
+        indicators they get the keys, enough to refetch what they show.
+        """
+        tipo = event["tipo"]
+        if not self.wants(tipo):
+            return None
+        if self.user.get("id_rol") == ADMIN_ROL_ID:
+            return "full"
+        if tipo == "usuario":
+            return "full" if event.get("id_usuario") == self.user.get("id_usuario") else None
+        if tipo == "indicador":
+            fila = event.get("fila") or {}
+            same_area = self.user.get("id_area") is not None and fila.get("id_area") == self.user.get("id_area")
+            return "full" if same_area else "keys"
+        return "full"
+
+class EventBus:
+    """Change events shared by all workers through PostgreSQL LISTEN/NOTIFY.
+
+    Write handlers publish compact events ({"tipo": ..., keys}) once their
+    change is committed. Each worker keeps one listening connection: events
+    from other workers invalidate its local caches, and every event is sent
+    to the SSE clients connected to it with an id "<worker>-<seq>". A client
+    that reconnects to another worker, falls too far behind or may have
+    missed events while the listener was down gets a `reset` event and must
+    refetch what it shows.
+    """
+
+    def __init__(self, queue_size: int, replay_size: int):
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.queue_size = queue_size
+        self.connected = False
+        self.published = 0
+        self.received = 0
+        self.resets = 0
+        self._seq = 0
+        self._recent = deque(maxlen=replay_size)
+        self._subscribers = set()
+        self._task = None
+        self._tasks = set()
+
+    async def publish(self, tipo: str, conn=None, **datos):
+        """NOTIFY an event; never fails the write that triggered it."""
+        event = {"tipo": tipo, "origen": self.worker_id, **datos}
+        payload = dumps_json(event).decode()
+        if len(payload) > EVENTS_MAX_PAYLOAD:
+            event.pop("fila", None)
+            payload = dumps_json(event).decode()
+        try:
+            if conn is None:
+                pool = await get_pg_pool()
+                async with pool.acquire() as conn:
+                    await conn.execute("SELECT pg_notify($1, $2)", EVENTS_CHANNEL, payload)
+            else:
+                await conn.execute("SELECT pg_notify($1, $2)", EVENTS_CHANNEL, payload)
+            self.published += 1
+        except Exception as e:
+            logger.warning(f"Could not publish {tipo} event: {e}")
+
+    def start(self):
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _listen(self):
+        resync = False
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(**PG_CONFIG)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(EVENTS_CHANNEL, self._on_notify)
+                self.connected = True
+                logger.info(f"Listening for change events on {EVENTS_CHANNEL}")
+                if resync:
+                    # Whatever was published while we were not listening is lost
+                    self._resync()
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), EVENTS_HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        # Detects connections dropped without a FIN
+                        await conn.fetchval("SELECT 1", timeout=HEALTH_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Change event listener failed: {e}")
+            finally:
+                self.connected = False
+                if conn is not None:
+                    conn.terminate()
+            resync = True
+            await asyncio.sleep(EVENTS_RETRY_SECONDS)
+
+    def _on_notify(self, conn, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+            tipo = event["tipo"]
+        except (ValueError, KeyError):
+            logger.warning(f"Ignoring malformed change event: {payload[:200]}")
+            return
+        self.received += 1
+        if event.pop("origen", None) != self.worker_id:
+            self._apply(event)
+        if tipo not in INTERNAL_EVENTS:
+            self._broadcast(event)
+
+    def _apply(self, event: dict):
+        """Invalidate what another worker changed."""
+        tipo = event["tipo"]
+        if tipo == "catalogo":
+            catalog_cache.drop(event["tabla"], event.get("version"))
+        elif tipo == "permisos":
+            self._rebuild_permissions()
+        elif tipo == "usuario" and event.get("revocado"):
+            token_registry.revoke_user(event["id_usuario"], event["revocado"])
+        elif tipo == "sesion":
+            token_registry.revoke_key(event["clave"], event["exp"])
+
+    def _spawn(self, coro, failure: str):
+        async def run():
+            try:
+                await coro
+            except Exception as e:
+                logger.warning(f"{failure}: {e}")
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _rebuild_permissions(self):
+        self._spawn(permission_matrix.rebuild(), "Could not rebuild permission matrix")
+
+    def _resync(self):
+        catalog_cache.reset()
+        self._rebuild_permissions()
+        self._spawn(token_registry.load(), "Could not reload token revocations")
+        self._broadcast({"tipo": "reset"})
+
+    def _frame(self, seq: int, event: dict) -> str:
+        return f"id: {self.worker_id}-{seq}\nevent: {event['tipo']}\ndata: {dumps_json(event).decode()}\n\n"
+
+    def _frames(self, seq: int, event: dict) -> dict:
+        """The event's frame per EventSubscriber.view, each rendered once."""
+        full = self._frame(seq, event)
+        if "fila" not in event:
+            return {"full": full, "keys": full}
+        return {"full": full, "keys": self._frame(seq, {k: v for k, v in event.items() if k != "fila"})}
+
+    def _offer(self, subscriber: EventSubscriber, frame: str):
+        try:
+            subscriber.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Too far behind: drop its backlog, it refetches instead
+            self.resets += 1
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(self._frame(self._seq, {"tipo": "reset"}))
+
+    def _broadcast(self, event: dict):
+        self._seq += 1
+        frames = self._frames(self._seq, event)
+        self._recent.append((self._seq, event, frames))
+        for subscriber in list(self._subscribers):
+            view = subscriber.view(event)
+            if view:
+                self._offer(subscriber, frames[view])
+
+    def subscribe(self, user: dict, tipos: Optional[set] = None, last_event_id: Optional[str] = None) -> EventSubscriber:
+        """Register a client, replaying what it missed since `last_event_id` if still buffered."""
+        subscriber = EventSubscriber(self.queue_size, tipos, user)
+        if last_event_id:
+            worker, _, seq = last_event_id.rpartition("-")
+            oldest = self._recent[0][0] if self._recent else self._seq + 1
+            if worker == self.worker_id and seq.isdigit() and oldest <= int(seq) + 1:
+                for n, event, frames in self._recent:
+                    view = subscriber.view(event)
+                    if n > int(seq) and view:
+                        self._offer(subscriber, frames[view])
+            else:
+                self.resets += 1
+                self._offer(subscriber, self._frame(self._seq, {"tipo": "reset"}))
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: EventSubscriber):
+        self._subscribers.discard(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "connected": self.connected,
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "received": self.received,
+            "resets": self.resets,
+            "last_id": f"{self.worker_id}-{self._seq}"
+        }
+
+event_bus = EventBus(EVENTS_QUEUE_SIZE, EVENTS_REPLAY_SIZE)
+
+async def catalog_changed(conn, table: str, accion: str, id: int, row=None):
+    """Drop the cached lists of `table` here, then tell other workers and clients."""
+    version = await catalog_cache.invalidate(table)
+    await event_bus.publish(
+        "catalogo", conn, accion=accion, tabla=table, id=id, version=version, fila=dict(row) if row else None
+    )
+
+async def permissions_changed(conn):
+    """Rebuild the permission matrix here, then tell other workers and clients."""
+    await permission_matrix.rebuild(conn)
+    await event_bus.publish("permisos", conn)
+
+@sms_router.get("/events")
+async def stream_events(
+    request: Request,
+    tipos: Optional[str] = None,
+    token: Optional[str] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Server-sent change events; `tipos` is an optional comma-separated filter.
+
+    Types: catalogo, permisos, usuario, indicador, rendicion, and reset
+    (refetch everything). Needs a session token, in the Authorization header
+    or, for EventSource (which cannot send headers), the `token` parameter;
+    each client only gets what its user may see (EventSubscriber.view).
+    Reconnecting EventSource clients send Last-Event-ID and get the events
+    they missed.
+    """
+    raw_token = credentials.credentials if credentials else token
+    if not raw_token:
+        raise HTTPException(status_code=401, detail="No autorizado")
+    user = verify_token(raw_token)
+    wanted = {t.strip() for t in tipos.split(",") if t.strip()} if tipos else None
+    subscriber = event_bus.subscribe(user, wanted, request.headers.get("last-event-id"))
+
+    async def stream():
+        try:
+            yield f"retry: {EVENTS_RETRY_SECONDS * 1000}\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Ends the stream once the session is revoked or expires
+                    try:
+                        verify_token(raw_token)
+                    except HTTPException:
+                        return
+                    # Keeps proxies from closing an idle stream
+                    frame = ": ping\n\n"
+                yield frame
+        finally:
+            event_bus.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@sms_router.get("/events/stats")
+async def get_event_stats():
+    return event_bus.stats()
+
+# ========== Sectores ==========
+SECTOR_CREATE = statements.add(
+    "sector.create",
+    "INSERT INTO sector (sector, estado) VALUES ($1, $2) RETURNING id_sector as id, sector as nombre, estado"
+)
+SECTOR_UPDATE = statements.add(
+    "sector.update",
+    "UPDATE sector SET sector = $1, estado = $2 WHERE id_sector = $3 RETURNING id_sector as id, sector as nombre, estado"
+)
+
+@sms_router.get("/sectores")
+async def get_sectores(request: Request):
+    return await catalog_response(request, "sector", CATALOG_QUERIES["sector"])
+
+@sms_router.post("/sectores")
+async def create_sector(item: GenericItem):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "INSERT INTO area (id_entidad, area_organizacional, estado) VALUES ($1, $2, $3) RETURNING id_area as id, id_entidad, area_organizacional as nombre, estado",
-            id_entidad, nombre, estado
-        )
+        row = await SECTOR_CREATE.fetchrow(conn, item.nombre, item.estado)
+        await catalog_changed(conn, "sector", "crear", row['id'], row)
+        return dict(row)
+
+@sms_router.put("/sectores/{id}")
+async def update_sector(id: int, item: GenericItem):
+    pool = await get_pg_pool()
+    async with pool.acquire() as conn:
+        row = await SECTOR_UPDATE.fetchrow(conn, item.nombre, item.estado, id)
+        await catalog_changed(conn, "sector", "actualizar", id, row)
+        return dict(row) if row else {"error": "Not found"}
+
+# ========== Entidades ==========
+ENTIDAD_CREATE = statements.add(
+    "entidad.create",
+    "INSERT INTO entidad (entidad, estado) VALUES ($1, $2) RETURNING id_entidad as id, entidad as nombre, estado"
+)
+ENTIDAD_UPDATE = statements.add(
+    "entidad.update",
+    "UPDATE entidad SET entidad = $1, estado = $2 WHERE id_entidad = $3 RETURNING id_entidad as id, entidad as nombre, estado"
+)
+
+@sms_router.get("/entidades")
+async def get_entidades(request: Request):
+    return await catalog_response(request, "entidad", CATALOG_QUERIES["entidad"])
+
+@sms_router.post("/entidades")
+async def create_entidad(item: GenericItem):
+    pool = await get_pg_pool()
+    async with pool.acquire() as conn:
+        row = await ENTIDAD_CREATE.fetchrow(conn, item.nombre, item.estado)
+        await catalog_changed(conn, "entidad", "crear", row['id'], row)
+        return dict(row)
+
+@sms_router.put("/entidades/{id}")
+async def update_entidad(id: int, item: GenericItem):
+    pool = await get_pg_pool()
+    async with pool.acquire() as conn:
+        row = await ENTIDAD_UPDATE.fetchrow(conn, item.nombre, item.estado, id)
+        await catalog_changed(conn, "entidad", "actualizar", id, row)
+        return dict(row) if row else {"error": "Not found"}
+
+# ========== Areas ==========
+AREAS_BY_ENTIDAD = statements.add(
+    "area.by_entidad",
+    "SELECT id_area as id, area_organizacional as nombre, estado FROM area WHERE id_entidad = $1 ORDER BY id_area"
+)
+AREA_CREATE = statements.add(
+    "area.create",
+    "INSERT INTO area (id_entidad, area_organizacional, estado) VALUES ($1, $2, $3) RETURNING id_area as id, id_entidad, area_organizacional as nombre, estado"
+)
+AREA_UPDATE = statements.add(
+    "area.update",
+    "UPDATE area SET area_organizacional = $1, estado = $2 WHERE id_area = $3 RETURNING id_area as id, id_entidad, area_organizacional as nombre, estado"
+)
+AREA_DELETE = statements.add(
+    "area.delete",
+    "DELETE FROM area WHERE id_area = $1"
+)
+
+@sms_router.get("/areas")
+async def get_areas(request: Request):
+    return await catalog_response(request, "area", CATALOG_QUERIES["area"])
+
+@sms_router.get("/entidades/{id}/areas")
+async def get_areas_by_entidad(id: int, request: Request):
+    return await catalog_response(request, "area", AREAS_BY_ENTIDAD, id)
+
+@sms_router.post("/areas")
+async def create_area(id_entidad: int = Form(...), nombre: str = Form(...), estado: str = Form("ACTIVO")):
+    pool = await get_pg_pool()
+    async with pool.acquire() as conn:
+        row = await AREA_CREATE.fetchrow(conn, id_entidad, nombre, estado)
+        await catalog_changed(conn, "area", "crear", row['id'], row)
         return dict(row)
 
 @sms_router.post("/areas/json")
 async def create_area_json(data: dict):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "INSERT INTO area (id_entidad, area_organizacional, estado) VALUES ($1, $2, $3) RETURNING id_area as id, id_entidad, area_organizacional as nombre, estado",
-            data.get('id_entidad'), data.get('nombre'), data.get('estado', 'ACTIVO')
-        )
+        row = await AREA_CREATE.fetchrow(conn, data.get('id_entidad'), data.get('nombre'), data.get('estado', 'ACTIVO'))
+        await catalog_changed(conn, "area", "crear", row['id'], row)
         return dict(row)
 
 @sms_router.put("/areas/{id}")
 async def update_area(id: int, data: dict):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "UPDATE area SET area_organizacional = $1, estado = $2 WHERE id_area = $3 RETURNING id_area as id, id_entidad, area_organizacional as nombre, estado",
-            data.get('nombre'), data.get('estado'), id
-        )
+        row = await AREA_UPDATE.fetchrow(conn, data.get('nombre'), data.get('estado'), id)
+        await catalog_changed(conn, "area", "actualizar", id, row)
         return dict(row) if row else {"error": "Not found"}
 
 @sms_router.delete("/areas/{id}")
 async def delete_area(id: int):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        await conn.execute("DELETE FROM area WHERE id_area = $1", id)
+        await AREA_DELETE.execute(conn, id)
+        await catalog_changed(conn, "area", "eliminar", id)
         return {"message": "Área eliminada"}
 
 # ========== Pilares ==========
+PILAR_CREATE = statements.add(
+    "pilar.create",
+    "INSERT INTO pilar (pilar, estado) VALUES ($1, $2) RETURNING id_pilar as id, pilar as nombre, estado"
+)
+PILAR_UPDATE = statements.add(
+    "pilar.update",
+    "UPDATE pilar SET pilar = $1, estado = $2 WHERE id_pilar = $3 RETURNING id_pilar as id, pilar as nombre, estado"
+)
+
 @sms_router.get("/pilares")
-async def get_pilares():
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("SELECT id_pilar as id, pilar as nombre, estado FROM pilar ORDER BY id_pilar")
-        return [dict(r) for r in rows]
+async def get_pilares(request: Request):
+    return await catalog_response(request, "pilar", CATALOG_QUERIES["pilar"])
 
 @sms_router.post("/pilares")
 async def create_pilar(item: GenericItem):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "INSERT INTO pilar (pilar, estado) VALUES ($1, $2) RETURNING id_pilar as id, pilar as nombre, estado",
-            item.nombre, item.estado
-        )
+        row = await PILAR_CREATE.fetchrow(conn, item.nombre, item.estado)
+        await catalog_changed(conn, "pilar", "crear", row['id'], row)
         return dict(row)
 
 @sms_router.put("/pilares/{id}")
 async def update_pilar(id: int, item: GenericItem):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "UPDATE pilar SET pilar = $1, estado = $2 WHERE id_pilar = $3 RETURNING id_pilar as id, pilar as nombre, estado",
-            item.nombre, item.estado, id
-        )
+        row = await PILAR_UPDATE.fetchrow(conn, item.nombre, item.estado, id)
+        await catalog_changed(conn, "pilar", "actualizar", id, row)
         return dict(row) if row else {"error": "Not found"}
 
 # ========== Ejes ==========
+EJE_CREATE = statements.add(
+    "eje.create",
+    "INSERT INTO eje (eje, estado) VALUES ($1, $2) RETURNING id_eje as id, eje as nombre, estado"
+)
+EJE_UPDATE = statements.add(
+    "eje.update",
+    "UPDATE eje SET eje = $1, estado = $2 WHERE id_eje = $3 RETURNING id_eje as id, eje as nombre, estado"
+)
+
 @sms_router.get("/ejes")
-async def get_ejes():
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("SELECT id_eje as id, eje as nombre, estado FROM eje ORDER BY id_eje")
-        return [dict(r) for r in rows]
+async def get_ejes(request: Request):
+    return await catalog_response(request, "eje", CATALOG_QUERIES["eje"])
 
 @sms_router.post("/ejes")
 async def create_eje(item: GenericItem):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "INSERT INTO eje (eje, estado) VALUES ($1, $2) RETURNING id_eje as id, eje as nombre, estado",
-            item.nombre, item.estado
-        )
+        row = await EJE_CREATE.fetchrow(conn, item.nombre, item.estado)
+        await catalog_changed(conn, "eje", "crear", row['id'], row)
         return dict(row)
 
 @sms_router.put("/ejes/{id}")
 async def update_eje(id: int, item: GenericItem):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "UPDATE eje SET eje = $1, estado = $2 WHERE id_eje = $3 RETURNING id_eje as id, eje as nombre, estado",
-            item.nombre, item.estado, id
-        )
+        row = await EJE_UPDATE.fetchrow(conn, item.nombre, item.estado, id)
+        await catalog_changed(conn, "eje", "actualizar", id, row)
         return dict(row) if row else {"error": "Not found"}
 
 # ========== Metas ==========
+META_CREATE = statements.add(
+    "meta.create",
+    "INSERT INTO meta (codi_meta, meta, estado) VALUES ($1, $2, $3) RETURNING id_meta as id, codi_meta as codigo, meta as nombre, estado"
+)
+META_UPDATE = statements.add(
+    "meta.update",
+    "UPDATE meta SET codi_meta = $1, meta = $2, estado = $3 WHERE id_meta = $4 RETURNING id_meta as id, codi_meta as codigo, meta as nombre, estado"
+)
+
 @sms_router.get("/metas")
-async def get_metas():
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("SELECT id_meta as id, codi_meta as codigo, meta as nombre, estado FROM meta ORDER BY id_meta")
-        return [dict(r) for r in rows]
+async def get_metas(request: Request):
+    return await catalog_response(request, "meta", CATALOG_QUERIES["meta"])
 
 @sms_router.post("/metas")
 async def create_meta(item: GenericItemWithCode):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "INSERT INTO meta (codi_meta, meta, estado) VALUES ($1, $2, $3) RETURNING id_meta as id, codi_meta as codigo, meta as nombre, estado",
-            item.codigo, item.nombre, item.estado
-        )
+        row = await META_CREATE.fetchrow(conn, item.codigo, item.nombre, item.estado)
+        await catalog_changed(conn, "meta", "crear", row['id'], row)
         return dict(row)
 
 @sms_router.put("/metas/{id}")
 async def update_meta(id: int, item: GenericItemWithCode):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "UPDATE meta SET codi_meta = $1, meta = $2, estado = $3 WHERE id_meta = $4 RETURNING id_meta as id, codi_meta as codigo, meta as nombre, estado",
-            item.codigo, item.nombre, item.estado, id
-        )
+        row = await META_UPDATE.fetchrow(conn, item.codigo, item.nombre, item.estado, id)
+        await catalog_changed(conn, "meta", "actualizar", id, row)
         return dict(row) if row else {"error": "Not found"}
 
 # ========== Resultados ==========
+RESULTADO_CREATE = statements.add(
+    "resultado.create",
+    "INSERT INTO resultado (codi_resultado, resultado, estado) VALUES ($1, $2, $3) RETURNING id_resultado as id, codi_resultado as codigo, resultado as nombre, estado"
+)
+RESULTADO_UPDATE = statements.add(
+    "resultado.update",
+    "UPDATE resultado SET codi_resultado = $1, resultado = $2, estado = $3 WHERE id_resultado = $4 RETURNING id_resultado as id, codi_resultado as codigo, resultado as nombre, estado"
+)
+
 @sms_router.get("/resultados")
-async def get_resultados():
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("SELECT id_resultado as id, codi_resultado as codigo, resultado as nombre, estado FROM resultado ORDER BY id_resultado")
-        return [dict(r) for r in rows]
+async def get_resultados(request: Request):
+    return await catalog_response(request, "resultado", CATALOG_QUERIES["resultado"])
 
 @sms_router.post("/resultados")
 async def create_resultado(item: GenericItemWithCode):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "INSERT INTO resultado (codi_resultado, resultado, estado) VALUES ($1, $2, $3) RETURNING id_resultado as id, codi_resultado as codigo, resultado as nombre, estado",
-            item.codigo, item.nombre, item.estado
-        )
+        row = await RESULTADO_CREATE.fetchrow(conn, item.codigo, item.nombre, item.estado)
+        await catalog_changed(conn, "resultado", "crear", row['id'], row)
         return dict(row)
 
 @sms_router.put("/resultados/{id}")
 async def update_resultado(id: int, item: GenericItemWithCode):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "UPDATE resultado SET codi_resultado = $1, resultado = $2, estado = $3 WHERE id_resultado = $4 RETURNING id_resultado as id, codi_resultado as codigo, resultado as nombre, estado",
-            item.codigo, item.nombre, item.estado, id
-        )
+        row = await RESULTADO_UPDATE.fetchrow(conn, item.codigo, item.nombre, item.estado, id)
+        await catalog_changed(conn, "resultado", "actualizar", id, row)
         return dict(row) if row else {"error": "Not found"}
 
 # ========== Acciones ==========
+ACCION_CREATE = statements.add(
+    "accion.create",
+    "INSERT INTO accion (codi_accion, accion, estado) VALUES ($1, $2, $3) RETURNING id_accion as id, codi_accion as codigo, accion as nombre, estado"
+)
+ACCION_UPDATE = statements.add(
+    "accion.update",
+    "UPDATE accion SET codi_accion = $1, accion = $2, estado = $3 WHERE id_accion = $4 RETURNING id_accion as id, codi_accion as codigo, accion as nombre, estado"
+)
+
 @sms_router.get("/acciones")
-async def get_acciones():
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("SELECT id_accion as id, codi_accion as codigo, accion as nombre, estado FROM accion ORDER BY id_accion")
-        return [dict(r) for r in rows]
+async def get_acciones(request: Request):
+    return await catalog_response(request, "accion", CATALOG_QUERIES["accion"])
 
 @sms_router.post("/acciones")
 async def create_accion(item: GenericItemWithCode):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "INSERT INTO accion (codi_accion, accion, estado) VALUES ($1, $2, $3) RETURNING id_accion as id, codi_accion as codigo, accion as nombre, estado",
-            item.codigo, item.nombre, item.estado
-        )
+        row = await ACCION_CREATE.fetchrow(conn, item.codigo, item.nombre, item.estado)
+        await catalog_changed(conn, "accion", "crear", row['id'], row)
         return dict(row)
 
 @sms_router.put("/acciones/{id}")
 async def update_accion(id: int, item: GenericItemWithCode):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "UPDATE accion SET codi_accion = $1, accion = $2, estado = $3 WHERE id_accion = $4 RETURNING id_accion as id, codi_accion as codigo, accion as nombre, estado",
-            item.codigo, item.nombre, item.estado, id
-        )
+        row = await ACCION_UPDATE.fetchrow(conn, item.codigo, item.nombre, item.estado, id)
+        await catalog_changed(conn, "accion", "actualizar", id, row)
         return dict(row) if row else {"error": "Not found"}
 
 # ========== Indicadores (Matriz Parametro) ==========
+# Full-text document for ?q= searches; ensure_pg_schema() builds a GIN index on
+# this exact expression, so both must stay in sync
+MATRIZ_SEARCH_VECTOR = (
+    "to_tsvector('spanish', coalesce(codi, '') || ' ' || "
+    "coalesce(indicador_resultado, '') || ' ' || coalesce(formula_indicador, ''))"
+)
+
 @sms_router.get("/matriz_parametros")
-async def get_indicadores():
-    pool = await get_pg_pool()
+async def get_indicadores(
+    limit: Optional[int] = Query(None, ge=1, le=MATRIZ_MAX_PAGE),
+    cursor: Optional[int] = None,
+    fields: Optional[str] = None,
+    id_sector: Optional[int] = None,
+    id_pilar: Optional[int] = None,
+    id_eje: Optional[int] = None,
+    codi_meta: Optional[str] = None,
+    estado: Optional[str] = None,
+    q: Optional[str] = None
+):
+    """Indicator matrix with optional filters, projection and keyset paging.
+
+    Without `limit` the full (filtered) list is returned as before. With `limit`
+    the page holds rows after `cursor` (an id_indicador) and, if more rows
+    remain, the next cursor is sent in the X-Next-Cursor header.
+    """
+    pool = await get_pg_read_pool()
     async with pool.acquire() as conn:
-        rows = await conn.fetch("SELECT * FROM matriz_parametro ORDER BY id_indicador")
-        return [dict(r) for r in rows]
+        select = "*"
+        if fields:
+            columns = await get_table_columns(conn, "matriz_parametro")
+            requested = [f.strip() for f in fields.split(',') if f.strip()]
+            unknown = [f for f in requested if f not in columns]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(unknown)}")
+            # id_indicador is always returned: it is the paging key
+            select = ", ".join(['id_indicador'] + [f for f in requested if f != 'id_indicador'])
+
+        conditions = []
+        values = []
+        filters = {
+            'id_sector': id_sector,
+            'id_pilar': id_pilar,
+            'id_eje': id_eje,
+            'codi_meta': codi_meta,
+            'estado': estado
+        }
+        for column, value in filters.items():
+            if value is not None:
+                values.append(value)
+                conditions.append(f"{column} = ${len(values)}")
+        if q:
+            values.append(q)
+            conditions.append(f"{MATRIZ_SEARCH_VECTOR} @@ plainto_tsquery('spanish', ${len(values)})")
+        if cursor is not None:
+            values.append(cursor)
+            conditions.append(f"id_indicador > ${len(values)}")
+
+        query = f"SELECT {select} FROM matriz_parametro"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        query += " ORDER BY id_indicador"
+        if limit:
+            # Fetch one extra row to know whether another page exists
+            values.append(limit + 1)
+            query += f" LIMIT ${len(values)}"
+
+        rows = await conn.fetch(query, *values)
+        headers = {}
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = str(rows[-1]['id_indicador'])
+        return FastJSONResponse(rows, headers=headers)
+
+INDICADORES_BY_AREA = statements.add(
+    "matriz_parametro.by_area",
+    "SELECT * FROM matriz_parametro WHERE id_area = $1 ORDER BY id_indicador"
+)
+INDICADORES_ALL = statements.add("matriz_parametro.all", "SELECT * FROM matriz_parametro ORDER BY id_indicador")
+
+async def fetch_indicadores_by_area(conn, id_area: int) -> list:
+    rows = await INDICADORES_BY_AREA.fetch(conn, id_area)
+    return [dict(r) for r in rows]
 
 @sms_router.get("/indicadores/area/{id_area}")
 async def get_indicadores_by_area(id_area: int):
-    pool = await get_pg_pool()
+    pool = await get_pg_read_pool()
     async with pool.acquire() as conn:
-        rows = await conn.fetch("SELECT * FROM matriz_parametro WHERE id_area = $1 ORDER BY id_indicador", id_area)
-        return [dict(r) for r in rows]
+        return FastJSONResponse(await fetch_indicadores_by_area(conn, id_area))
+
+INDICADOR_CREATE = statements.add("matriz_parametro.create", """
+    INSERT INTO matriz_parametro
+    (id_entidad, id_area, id_sector, id_pilar, id_eje, codi_meta, codi_resultado, codi_accion, codi, indicador_resultado, formula_indicador, anio_base, linea_base, anio_logro, logro, estado)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16)
+    RETURNING *
+""")
+INDICADOR_UPDATE = statements.add("matriz_parametro.update", """
+    UPDATE matriz_parametro SET
+    id_entidad=$1, id_area=$2, id_sector=$3, id_pilar=$4, id_eje=$5,
+    codi_meta=$6, codi_resultado=$7, codi_accion=$8, codi=$9,
+    indicador_resultado=$10, formula_indicador=$11, anio_base=$12,
+    linea_base=$13, anio_logro=$14, logro=$15, estado=$16
+    WHERE id_indicador = $17
+    RETURNING *
+""")
 
 @sms_router.post("/matriz_parametros")
 async def create_indicador(item: IndicadorCreate):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow("""
-            INSERT INTO matriz_parametro 
-            (id_entidad, id_area, id_sector, id_pilar, id_eje, codi_meta, codi_resultado, codi_accion, codi, indicador_resultado, formula_indicador, anio_base, linea_base, anio_logro, logro, estado)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16)
-            RETURNING *
-        """, item.id_entidad, item.id_area, item.id_sector, item.id_pilar, item.id_eje, 
-            item.codi_meta, item.codi_resultado, item.codi_accion, item.codi, 
-            item.indicador_resultado, item.formula_indicador, item.anio_base, 
-            item.linea_base, item.anio_logro, item.logro, item.estado)
+        row = await INDICADOR_CREATE.fetchrow(
+            conn, item.id_entidad, item.id_area, item.id_sector, item.id_pilar, item.id_eje,
+            item.codi_meta, item.codi_resultado, item.codi_accion, item.codi,
+            item.indicador_resultado, item.formula_indicador, item.anio_base,
+            item.linea_base, item.anio_logro, item.logro, item.estado
+        )
+        await refresh_dashboard_grupos(conn, await get_dashboard_grupos(conn, [(row['id_indicador'], None)]))
+        await event_bus.publish("indicador", conn, accion="crear", id_indicador=row['id_indicador'], fila=dict(row))
         return dict(row)
 
 @sms_router.put("/matriz_parametros/{id}")
 async def update_indicador(id: int, item: IndicadorCreate):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow("""
-            UPDATE matriz_parametro SET
-            id_entidad=$1, id_area=$2, id_sector=$3, id_pilar=$4, id_eje=$5, 
-            codi_meta=$6, codi_resultado=$7, codi_accion=$8, codi=$9, 
-            indicador_resultado=$10, formula_indicador=$11, anio_base=$12, 
-            linea_base=$13, anio_logro=$14, logro=$15, estado=$16
-            WHERE id_indicador = $17
-            RETURNING *
-        """, item.id_entidad, item.id_area, item.id_sector, item.id_pilar, item.id_eje,
+        # The indicator may move between dashboard groups: refresh old and new
+        grupos = await get_dashboard_grupos(conn, [(id, None)])
+        row = await INDICADOR_UPDATE.fetchrow(
+            conn, item.id_entidad, item.id_area, item.id_sector, item.id_pilar, item.id_eje,
             item.codi_meta, item.codi_resultado, item.codi_accion, item.codi,
             item.indicador_resultado, item.formula_indicador, item.anio_base,
-            item.linea_base, item.anio_logro, item.logro, item.estado, id)
+            item.linea_base, item.anio_logro, item.logro, item.estado, id
+        )
+        grupos |= await get_dashboard_grupos(conn, [(id, None)])
+        await refresh_dashboard_grupos(conn, grupos)
+        if row:
+            await event_bus.publish("indicador", conn, accion="actualizar", id_indicador=id, fila=dict(row))
         return dict(row) if row else {"error": "Not found"}
 
 # ========== Usuarios ==========
+USUARIOS_LIST = statements.add("usuario.list", """
+    SELECT u.id_usuario, u.nro_documento, u.nombre, u.username, u.fecha_creacion, 
+           u.id_area, u.id_rol, u.estado, a.area_organizacional as area, r.rol
+    FROM usuario u
+    LEFT JOIN area a ON u.id_area = a.id_area
+    LEFT JOIN rol r ON u.id_rol = r.id_rol
+    ORDER BY u.id_usuario
+""")
+USUARIO_BY_USERNAME = statements.add("usuario.by_username", "SELECT id_usuario FROM usuario WHERE username = $1")
+USUARIO_CREATE = statements.add("usuario.create", """
+    INSERT INTO usuario (nro_documento, nombre, username, clave, id_area, id_rol, fecha_creacion)
+    VALUES ($1, $2, $3, $4, $5, $6, CURRENT_DATE)
+    RETURNING id_usuario
+""")
+USUARIO_UPDATE = statements.add("usuario.update", """
+    UPDATE usuario SET nro_documento=$1, nombre=$2, username=$3, id_area=$4, id_rol=$5, estado=$6
+    WHERE id_usuario=$7
+""")
+USUARIO_UPDATE_CLAVE = statements.add("usuario.update_with_clave", """
+    UPDATE usuario SET nro_documento=$1, nombre=$2, username=$3, clave=$4, id_area=$5, id_rol=$6, estado=$7
+    WHERE id_usuario=$8
+""")
+
 @sms_router.get("/usuarios")
 async def get_usuarios():
-    pool = await get_pg_pool()
+    pool = await get_pg_read_pool()
     async with pool.acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT u.id_usuario, u.nro_documento, u.nombre, u.username, u.fecha_creacion, 
-                   u.id_area, u.id_rol, u.estado, a.area_organizacional as area, r.rol
-            FROM usuario u
-            LEFT JOIN area a ON u.id_area = a.id_area
-            LEFT JOIN rol r ON u.id_rol = r.id_rol
-            ORDER BY u.id_usuario
-        """)
-        return [dict(r) for r in rows]
+        rows = await USUARIOS_LIST.fetch(conn)
+        return FastJSONResponse(rows)
 
 @sms_router.post("/usuarios")
 async def create_usuario(user: UserCreate):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
         # Check if username exists
-        existing = await conn.fetchrow("SELECT id_usuario FROM usuario WHERE username = $1", user.username)
+        existing = await USUARIO_BY_USERNAME.fetchrow(conn, user.username)
         if existing:
             raise HTTPException(status_code=400, detail="El nombre de usuario ya existe")
         
         # Hash password
-        hashed = bcrypt.hashpw(user.clave.encode(), bcrypt.gensalt()).decode()
+        hashed = await password_hasher.hash(user.clave)
         
-        await conn.execute("""
-            INSERT INTO usuario (nro_documento, nombre, username, clave, id_area, id_rol, fecha_creacion)
-            VALUES ($1, $2, $3, $4, $5, $6, CURRENT_DATE)
-        """, user.nro_documento, user.nombre, user.username, hashed, user.id_area, user.id_rol)
+        id_usuario = await USUARIO_CREATE.fetchval(
+            conn, user.nro_documento, user.nombre, user.username, hashed, user.id_area, user.id_rol
+        )
         
+        await event_bus.publish("usuario", conn, accion="crear", id_usuario=id_usuario)
         return {"message": "Usuario creado exitosamente"}
 
 @sms_router.put("/usuarios/{id}")
@@ -568,261 +2241,1176 @@ async def update_usuario(id: int, user: UserUpdate):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
         if user.clave:
-            hashed = bcrypt.hashpw(user.clave.encode(), bcrypt.gensalt()).decode()
-            await conn.execute("""
-                UPDATE usuario SET nro_documento=$1, nombre=$2, username=$3, clave=$4, id_area=$5, id_rol=$6, estado=$7
-                WHERE id_usuario=$8
-            """, user.nro_documento, user.nombre, user.username, hashed, user.id_area, user.id_rol, user.estado, id)
+            hashed = await password_hasher.hash(user.clave)
+            await USUARIO_UPDATE_CLAVE.execute(
+                conn, user.nro_documento, user.nombre, user.username, hashed, user.id_area, user.id_rol, user.estado, id
+            )
         else:
-            await conn.execute("""
-                UPDATE usuario SET nro_documento=$1, nombre=$2, username=$3, id_area=$4, id_rol=$5, estado=$6
-                WHERE id_usuario=$7
-            """, user.nro_documento, user.nombre, user.username, user.id_area, user.id_rol, user.estado, id)
+            await USUARIO_UPDATE.execute(
+                conn, user.nro_documento, user.nombre, user.username, user.id_area, user.id_rol, user.estado, id
+            )
         
+        # New password or deactivation: existing sessions stop working now,
+        # on every worker
+        revocado = None
+        if user.clave or user.estado != 'ACTIVO':
+            revocado = token_registry.revoke_user(id)
+            await token_registry.share_epoch(id, revocado)
+        await event_bus.publish("usuario", conn, accion="actualizar", id_usuario=id, revocado=revocado)
         return {"message": "Usuario actualizado"}
 
 @sms_router.put("/usuarios/{id}/clave")
 async def change_password(id: int, clave: str = Form(...)):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        hashed = bcrypt.hashpw(clave.encode(), bcrypt.gensalt()).decode()
-        await conn.execute("UPDATE usuario SET clave = $1 WHERE id_usuario = $2", hashed, id)
+        hashed = await password_hasher.hash(clave)
+        await USUARIO_SET_CLAVE.execute(conn, hashed, id)
+        revocado = token_registry.revoke_user(id)
+        await token_registry.share_epoch(id, revocado)
+        await event_bus.publish("usuario", conn, accion="clave", id_usuario=id, revocado=revocado)
         return {"message": "Contraseña actualizada"}
 
 # ========== Roles ==========
 @sms_router.get("/roles")
-async def get_roles():
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("SELECT * FROM rol ORDER BY id_rol")
-        return [dict(r) for r in rows]
+async def get_roles(request: Request):
+    return await catalog_response(request, "rol", CATALOG_QUERIES["rol"])
+
+# id_opcion values come from this sequence (synced with MAX(id_opcion) at startup)
+OPCIONES_SEQ = "opciones_id_opcion_seq"
+
+ROL_CREATE = statements.add("rol.create", "INSERT INTO rol (rol, estado) VALUES ($1, $2) RETURNING *")
+ROL_UPDATE = statements.add("rol.update", "UPDATE rol SET rol = $1, estado = $2 WHERE id_rol = $3 RETURNING *")
+OPCIONES_PROVISION_ROL = statements.add("opciones.provision_rol", f"""
+    INSERT INTO opciones (id_opcion, id_rol, id_menu, estado)
+    SELECT nextval('{OPCIONES_SEQ}'), $1, m.id_menu, COALESCE(s.estado, 'INACTIVO')
+    FROM menu m
+    LEFT JOIN opciones s ON s.id_menu = m.id_menu AND s.id_rol = $2
+    ORDER BY m.id_menu
+""")
+OPCIONES_PROVISION_MENU = statements.add("opciones.provision_menu", f"""
+    INSERT INTO opciones (id_opcion, id_rol, id_menu, estado)
+    SELECT nextval('{OPCIONES_SEQ}'), r.id_rol, $1, 'INACTIVO'
+    FROM rol r
+    ORDER BY r.id_rol
+""")
+OPCIONES_CLONE_UPDATE = statements.add("opciones.clone_update", """
+    UPDATE opciones d SET estado = s.estado
+    FROM opciones s
+    WHERE d.id_rol = $1 AND s.id_rol = $2 AND s.id_menu = d.id_menu
+""")
+OPCIONES_CLONE_INSERT = statements.add("opciones.clone_insert", f"""
+    INSERT INTO opciones (id_opcion, id_rol, id_menu, estado)
+    SELECT nextval('{OPCIONES_SEQ}'), $1, s.id_menu, s.estado
+    FROM opciones s
+    WHERE s.id_rol = $2
+      AND NOT EXISTS (SELECT 1 FROM opciones d WHERE d.id_rol = $1 AND d.id_menu = s.id_menu)
+    ORDER BY s.id_menu
+""")
+
+async def provision_role_opciones(conn, id_rol: int, id_rol_origen: Optional[int] = None):
+    """Create the opciones of a new role for every menu in one statement.
+
+    States are copied from id_rol_origen when given; any other menu starts
+    as INACTIVO.
+    """
+    await OPCIONES_PROVISION_ROL.execute(conn, id_rol, id_rol_origen)
+
+async def provision_menu_opciones(conn, id_menu: int):
+    """Create the (INACTIVO) opciones of a new menu for every role."""
+    await OPCIONES_PROVISION_MENU.execute(conn, id_menu)
+
+async def clone_role_opciones(conn, id_rol: int, id_rol_origen: int):
+    """Copy every menu permission of id_rol_origen onto id_rol."""
+    await OPCIONES_CLONE_UPDATE.execute(conn, id_rol, id_rol_origen)
+    await OPCIONES_CLONE_INSERT.execute(conn, id_rol, id_rol_origen)
 
 @sms_router.post("/roles")
 async def create_role(data: dict):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        # Insert new role
-        row = await conn.fetchrow(
-            "INSERT INTO rol (rol, estado) VALUES ($1, $2) RETURNING *",
-            data.get('rol'), data.get('estado', 'ACTIVO')
-        )
-        new_role = dict(row)
-        
-        # Create options for the new role (all menus as INACTIVO by default)
-        menus = await conn.fetch("SELECT id_menu FROM menu")
-        for menu in menus:
-            await conn.execute("""
-                INSERT INTO opciones (id_opcion, id_rol, id_menu, estado) 
-                VALUES ((SELECT COALESCE(MAX(id_opcion),0)+1 FROM opciones), $1, $2, 'INACTIVO')
-            """, new_role['id_rol'], menu['id_menu'])
+        async with conn.transaction():
+            # Insert new role
+            row = await ROL_CREATE.fetchrow(conn, data.get('rol'), data.get('estado', 'ACTIVO'))
+            new_role = dict(row)
+            
+            # Options for every menu: INACTIVO, or copied from id_rol_origen
+            await provision_role_opciones(conn, new_role['id_rol'], data.get('id_rol_origen'))
         
+        await catalog_changed(conn, "rol", "crear", new_role['id_rol'], new_role)
+        await permissions_changed(conn)
         return new_role
 
 @sms_router.put("/roles/{id}")
 async def update_role(id: int, data: dict):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "UPDATE rol SET rol = $1, estado = $2 WHERE id_rol = $3 RETURNING *",
-            data.get('rol'), data.get('estado'), id
-        )
+        row = await ROL_UPDATE.fetchrow(conn, data.get('rol'), data.get('estado'), id)
+        await catalog_changed(conn, "rol", "actualizar", id, row)
         return dict(row) if row else {"error": "Not found"}
 
+@sms_router.post("/roles/{id}/clonar")
+async def clone_role_permissions(id: int, data: dict):
+    id_rol_origen = data.get('id_rol_origen')
+    if id_rol_origen is None:
+        raise HTTPException(status_code=400, detail="id_rol_origen es obligatorio")
+    pool = await get_pg_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await clone_role_opciones(conn, id, id_rol_origen)
+        await permissions_changed(conn)
+        return {"message": "Permisos copiados"}
+
 # ========== Opciones (Role Options) ==========
+OPCION_UPDATE = statements.add("opcion.update", "UPDATE opciones SET estado = $1 WHERE id_opcion = $2")
+
 @sms_router.get("/opciones/{id_rol}")
 async def get_opciones_by_rol(id_rol: int):
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT o.id_opcion, o.id_rol, o.id_menu, m.opcion, o.estado
-            FROM opciones o
-            JOIN menu m ON o.id_menu = m.id_menu
-            WHERE o.id_rol = $1
-            ORDER BY o.id_menu
-        """, id_rol)
-        return [dict(r) for r in rows]
+    return await permission_matrix.opciones(id_rol)
 
 @sms_router.put("/opciones/{id}")
 async def update_opcion(id: int, data: dict):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        await conn.execute(
-            "UPDATE opciones SET estado = $1 WHERE id_opcion = $2",
-            data.get('estado'), id
-        )
+        await OPCION_UPDATE.execute(conn, data.get('estado'), id)
+        await permissions_changed(conn)
         return {"message": "Opción actualizada"}
 
 # ========== Menu Admin ==========
+MENU_CREATE = statements.add("menu.create", """
+    INSERT INTO menu (opcion, tipo_opcion, enlace, id_padre, estado)
+    VALUES ($1, $2, $3, $4, $5)
+    RETURNING *
+""")
+MENU_UPDATE = statements.add("menu.update", """
+    UPDATE menu SET opcion=$1, tipo_opcion=$2, enlace=$3, id_padre=$4, estado=$5
+    WHERE id_menu = $6
+    RETURNING *
+""")
+
 @sms_router.get("/menu_admin")
 async def get_menu_admin():
-    pool = await get_pg_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT m.*, p.opcion as padre_nombre
-            FROM menu m
-            LEFT JOIN menu p ON m.id_padre = p.id_menu
-            ORDER BY m.id_menu ASC
-        """)
-        return [dict(r) for r in rows]
+    return FastJSONResponse(await permission_matrix.menu_admin())
 
 @sms_router.post("/menu")
 async def create_menu(data: dict):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow("""
-            INSERT INTO menu (opcion, tipo_opcion, enlace, id_padre, estado)
-            VALUES ($1, $2, $3, $4, $5)
-            RETURNING *
-        """, data.get('opcion'), data.get('tipo_opcion', 'opcion'), 
-            data.get('enlace'), data.get('id_padre'), data.get('estado', 'ACTIVO'))
-        
-        new_menu = dict(row)
-        
-        # Create options for all roles for this new menu
-        roles = await conn.fetch("SELECT id_rol FROM rol")
-        for role in roles:
-            await conn.execute("""
-                INSERT INTO opciones (id_opcion, id_rol, id_menu, estado)
-                VALUES ((SELECT COALESCE(MAX(id_opcion),0)+1 FROM opciones), $1, $2, 'INACTIVO')
-            """, role['id_rol'], new_menu['id_menu'])
+        async with conn.transaction():
+            row = await MENU_CREATE.fetchrow(
+                conn, data.get('opcion'), data.get('tipo_opcion', 'opcion'),
+                data.get('enlace'), data.get('id_padre'), data.get('estado', 'ACTIVO')
+            )
+            
+            new_menu = dict(row)
+            
+            # Create options for all roles for this new menu
+            await provision_menu_opciones(conn, new_menu['id_menu'])
         
+        await permissions_changed(conn)
         return new_menu
 
 @sms_router.put("/menu/{id}")
 async def update_menu(id: int, data: dict):
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow("""
-            UPDATE menu SET opcion=$1, tipo_opcion=$2, enlace=$3, id_padre=$4, estado=$5
-            WHERE id_menu = $6
-            RETURNING *
-        """, data.get('opcion'), data.get('tipo_opcion'), data.get('enlace'), 
-            data.get('id_padre'), data.get('estado'), id)
+        row = await MENU_UPDATE.fetchrow(
+            conn, data.get('opcion'), data.get('tipo_opcion'), data.get('enlace'),
+            data.get('id_padre'), data.get('estado'), id
+        )
+        await permissions_changed(conn)
         return dict(row) if row else {"error": "Not found"}
 
 # ========== Contexto Usuario ==========
+CONTEXTO_AREA = statements.add("contexto.area", """
+    SELECT a.area_organizacional as area, e.entidad, a.id_entidad
+    FROM area a
+    JOIN entidad e ON a.id_entidad = e.id_entidad
+    WHERE a.id_area = $1
+""")
+CONTEXTO_SECTOR = statements.add("contexto.sector", """
+    SELECT s.sector
+    FROM matriz_parametro mp
+    JOIN sector s ON mp.id_sector = s.id_sector
+    WHERE mp.id_area = $1
+    LIMIT 1
+""")
+
+async def fetch_user_context(conn, id_area: int) -> Optional[dict]:
+    area_data = await CONTEXTO_AREA.fetchrow(conn, id_area)
+    
+    if not area_data:
+        return None
+    
+    # Get sector from indicators
+    sector_data = await CONTEXTO_SECTOR.fetchrow(conn, id_area)
+    
+    return {
+        "area": area_data['area'],
+        "entidad": area_data['entidad'],
+        "sector": sector_data['sector'] if sector_data else "-"
+    }
+
 @sms_router.get("/contexto_usuario/{id_area}")
 async def get_user_context(id_area: int):
-    pool = await get_pg_pool()
+    pool = await get_pg_read_pool()
     async with pool.acquire() as conn:
-        area_data = await conn.fetchrow("""
-            SELECT a.area_organizacional as area, e.entidad, a.id_entidad
-            FROM area a
-            JOIN entidad e ON a.id_entidad = e.id_entidad
-            WHERE a.id_area = $1
-        """, id_area)
-        
-        if not area_data:
+        contexto = await fetch_user_context(conn, id_area)
+        if not contexto:
             raise HTTPException(status_code=404, detail="Área no encontrada")
-        
-        # Get sector from indicators
-        sector_data = await conn.fetchrow("""
-            SELECT s.sector
-            FROM matriz_parametro mp
-            JOIN sector s ON mp.id_sector = s.id_sector
-            WHERE mp.id_area = $1
-            LIMIT 1
-        """, id_area)
-        
-        return {
-            "area": area_data['area'],
-            "entidad": area_data['entidad'],
-            "sector": sector_data['sector'] if sector_data else "-"
-        }
+        return contexto
+
+# ========== Bootstrap ==========
+# Role that sees the whole indicator matrix (same rule as the frontend)
+ADMIN_ROL_ID = 1
+
+@sms_router.get("/bootstrap")
+async def get_bootstrap(user: dict = Depends(get_current_user)):
+    """Everything the frontend needs after login, in a single response.
+
+    Catalogs come from catalog_cache and menu/opciones from the permission
+    matrix; the remaining per-user queries share one pool connection.
+    """
+    id_rol = user.get('id_rol')
+    id_area = user.get('id_area')
+
+    async def load_user_data():
+        pool = await get_pg_read_pool()
+        async with pool.acquire() as conn:
+            contexto = await fetch_user_context(conn, id_area) if id_area else None
+            if id_rol == ADMIN_ROL_ID:
+                rows = await INDICADORES_ALL.fetch(conn)
+                indicadores = [dict(r) for r in rows]
+            elif id_area:
+                indicadores = await fetch_indicadores_by_area(conn, id_area)
+            else:
+                indicadores = []
+            return contexto, indicadores
+
+    (contexto, indicadores), matrix, entidades, areas, roles = await asyncio.gather(
+        load_user_data(),
+        permission_matrix.get(),
+        get_catalog_entry("entidad", CATALOG_QUERIES["entidad"]),
+        get_catalog_entry("area", CATALOG_QUERIES["area"]),
+        get_catalog_entry("rol", CATALOG_QUERIES["rol"])
+    )
+
+    return FastJSONResponse({
+        "user": {k: v for k, v in user.items() if k not in ('exp', 'iat')},
+        "menu": matrix['menu'].get(id_rol, []),
+        "menu_arbol": matrix['arbol'].get(id_rol, []),
+        "opciones": matrix['opciones'].get(id_rol, []),
+        "contexto": contexto,
+        "entidades": entidades['data'],
+        "areas": areas['data'],
+        "roles": roles['data'],
+        "indicadores": indicadores
+    })
+
+# ========== Rendicion Calculations ==========
+MESES = ['ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic']
+
+# Columns holding the programmed goal, in order of preference
+PROGRAMADO_COLUMNS = ('programado_periodo', 'programado')
+
+def to_number(value) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    # 'NaN' / 'Infinity' strings count as not reported
+    return number if math.isfinite(number) else None
+
+def get_programado(data: dict) -> Optional[float]:
+    for column in PROGRAMADO_COLUMNS:
+        value = to_number(data.get(column))
+        if value is not None:
+            return value
+    return None
+
+def proc_base(programado: Optional[float]) -> Optional[float]:
+    """Value proc_ejecutado is a percentage of; none unless programado is positive.
+
+    Shared by the single-row and vectorized paths so both agree on every row.
+    """
+    return programado if programado is not None and programado > 0 else None
+
+def compute_rendicion_totals(data: dict, columns) -> dict:
+    """Derive acumulado_* and proc_ejecutado_* for one rendición.
+
+    acumulado_<mes> is the running total of ejecutado up to that month and
+    proc_ejecutado_<mes> is that total as a percentage of the programmed value.
+    Months without ejecutado are left empty. Only columns present in the table
+    are returned.
+    """
+    base = proc_base(get_programado(data))
+    derived = {}
+    total = 0.0
+    for mes in MESES:
+        ejecutado = to_number(data.get(f'ejecutado_{mes}'))
+        acumulado = None
+        proc = None
+        if ejecutado is not None:
+            total += ejecutado
+            acumulado = round(total, 3)
+            if base is not None:
+                proc = round(total / base * 100, 3)
+        if f'acumulado_{mes}' in columns:
+            derived[f'acumulado_{mes}'] = acumulado
+        if f'proc_ejecutado_{mes}' in columns:
+            derived[f'proc_ejecutado_{mes}'] = proc
+    return derived
+
+async def recompute_rendicion(conn, condition: str, *args) -> int:
+    """Recompute the derived columns of the rendiciones matching `condition`.
+
+    Vectorized version of compute_rendicion_totals for batches and backfills,
+    with the same base and rounding; returns the number of rows written.
+    """
+    columns = await get_table_columns(conn, "rendicion")
+    ejecutado_cols = [f'ejecutado_{m}' for m in MESES]
+    programado_cols = [c for c in PROGRAMADO_COLUMNS if c in columns]
+    select_cols = ['id_rendicion'] + [c for c in ejecutado_cols + programado_cols if c in columns]
+    rows = await conn.fetch(f"SELECT {', '.join(select_cols)} FROM rendicion WHERE {condition}", *args)
+    if not rows:
+        return 0
+
+    ejecutado = np.array(
+        [[to_number(r[c]) if c in columns else None for c in ejecutado_cols] for r in rows],
+        dtype=float
+    )
+    base = np.array([proc_base(get_programado(dict(r))) for r in rows], dtype=float)
+
+    reported = ~np.isnan(ejecutado)
+    acumulado = np.where(reported, np.nancumsum(ejecutado, axis=1), np.nan)
+    with np.errstate(invalid='ignore'):
+        proc = acumulado / base[:, None] * 100
+
+    targets = []
+    for idx, mes in enumerate(MESES):
+        if f'acumulado_{mes}' in columns:
+            targets.append((f'acumulado_{mes}', acumulado[:, idx]))
+        if f'proc_ejecutado_{mes}' in columns:
+            targets.append((f'proc_ejecutado_{mes}', proc[:, idx]))
+    if not targets:
+        return 0
+
+    set_clause = ", ".join(f"{name} = ${i + 2}" for i, (name, _) in enumerate(targets))
+    # Rounded like compute_rendicion_totals (np.round can differ on halves)
+    records = [
+        [row['id_rendicion']] + [None if np.isnan(values[n]) else round(float(values[n]), 3) for _, values in targets]
+        for n, row in enumerate(rows)
+    ]
+    # Same text for every batch of a table layout
+    update = statements.add("rendicion.recompute", f"UPDATE rendicion SET {set_clause} WHERE id_rendicion = $1")
+    async with conn.transaction():
+        await update.executemany(conn, records)
+    return len(records)
+
+RENDICION_GESTIONES = statements.add(
+    "rendicion.gestiones",
+    "SELECT DISTINCT gestion FROM rendicion WHERE gestion IS NOT NULL ORDER BY gestion"
+)
+RENDICION_COUNT = statements.add("rendicion.count", "SELECT COUNT(*) FROM rendicion WHERE gestion = $1")
+
+async def recompute_rendicion_gestion(conn, gestion: int) -> int:
+    return await recompute_rendicion(conn, "gestion = $1", gestion)
 
 # ========== Rendicion ==========
+RENDICION_GET = statements.add(
+    "rendicion.get",
+    "SELECT * FROM rendicion WHERE id_indicador = $1 AND gestion = $2"
+)
+RENDICION_GET_FOR_UPDATE = statements.add(
+    "rendicion.get_for_update",
+    "SELECT * FROM rendicion WHERE id_indicador = $1 AND gestion = $2 FOR UPDATE"
+)
+# Never written from request data; `version` is bumped by every save
+RENDICION_KEY_COLUMNS = ('id_rendicion', 'id_indicador', 'gestion', 'version')
+
+# Save attempts without a version token while the row keeps changing; the
+# last one locks the row
+RENDICION_SAVE_ATTEMPTS = 3
+
+RENDICION_CONFLICT = "El registro fue modificado por otro usuario; recargue los datos antes de guardar"
+
+def rendicion_update_statement(columns) -> tuple:
+    """Full-column UPDATE by id_rendicion; same text for every save.
+
+    With a version column the row must still be at the version read ($2).
+    """
+    cols = [c for c in columns if c not in RENDICION_KEY_COLUMNS]
+    if 'version' not in columns:
+        sets = ", ".join(f"{c} = ${i + 2}" for i, c in enumerate(cols))
+        sql = f"UPDATE rendicion SET {sets} WHERE id_rendicion = $1 RETURNING *"
+        return statements.add("rendicion.update", sql), cols
+    sets = ", ".join(f"{c} = ${i + 3}" for i, c in enumerate(cols))
+    sql = f"UPDATE rendicion SET {sets}, version = version + 1 WHERE id_rendicion = $1 AND version = $2 RETURNING *"
+    return statements.add("rendicion.update_versioned", sql), cols
+
+def rendicion_insert_query(cols: list) -> str:
+    """INSERT of a new rendición that yields no row if it was created meanwhile."""
+    placeholders = ", ".join(f"${i + 1}" for i in range(len(cols)))
+    return (
+        f"INSERT INTO rendicion ({', '.join(cols)}) VALUES ({placeholders}) "
+        f"ON CONFLICT (id_indicador, gestion) DO NOTHING RETURNING *"
+    )
+
+async def write_rendicion(conn, key: tuple, submitted: dict, columns, expected: Optional[int], lock: bool = False):
+    """One save attempt: merge `submitted` into the stored row and write it.
+
+    Returns the written row, or None when another save changed or created
+    the row after it was read. Raises 409 right away if the row is not at
+    the `expected` version (0: it must not exist yet).
+    """
+    existing = await (RENDICION_GET_FOR_UPDATE if lock else RENDICION_GET).fetchrow(conn, *key)
+    if expected is not None and (existing['version'] if existing else 0) != expected:
+        raise HTTPException(status_code=409, detail=RENDICION_CONFLICT)
+    current = dict(existing) if existing else {}
+    current.update(submitted)
+    # Accumulated and percentage values are always derived server-side
+    current.update(compute_rendicion_totals(current, columns))
+
+    if existing:
+        # Every column is written, so the statement text is always the same
+        update, cols = rendicion_update_statement(columns)
+        token = [existing['version']] if 'version' in columns else []
+        return await update.fetchrow(conn, existing['id_rendicion'], *token, *[current.get(c) for c in cols])
+    # Only the given columns, so the table defaults apply to the rest
+    cols = list(current)
+    return await conn.fetchrow(rendicion_insert_query(cols), *[current[c] for c in cols])
+
 @sms_router.get("/rendicion/{id_indicador}/{gestion}")
 async def get_rendicion(id_indicador: int, gestion: int):
-    pool = await get_pg_pool()
+    pool = await get_pg_read_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT * FROM rendicion WHERE id_indicador = $1 AND gestion = $2",
-            id_indicador, gestion
-        )
+        row = await RENDICION_GET.fetchrow(conn, id_indicador, gestion)
         return dict(row) if row else {}
 
+RENDICION_EXPORT_QUERY = """
+    SELECT mp.id_entidad, mp.id_area, mp.id_sector, mp.id_pilar, mp.id_eje,
+           mp.codi_meta, mp.codi_resultado, mp.codi_accion, mp.codi,
+           mp.indicador_resultado, r.*
+    FROM rendicion r
+    JOIN matriz_parametro mp ON mp.id_indicador = r.id_indicador
+    WHERE r.gestion = $1
+    ORDER BY r.id_indicador
+"""
+
+async def stream_rendicion_export(pool, gestion: int, formato: str):
+    """Yield the export in chunks of RENDICION_EXPORT_BATCH rows.
+
+    Rows are read through a server-side cursor, so memory stays bounded by the
+    chunk size regardless of how many indicators the gestión has. `pool` is
+    anything with acquire(), e.g. a background job context.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = None
+    count = 0
+    async with pool.acquire() as conn:
+        async with conn.transaction(readonly=True):
+            async for record in conn.cursor(RENDICION_EXPORT_QUERY, gestion, prefetch=RENDICION_EXPORT_BATCH):
+                row = dict(record)
+                if formato == "csv":
+                    if header is None:
+                        header = list(row.keys())
+                        writer.writerow(header)
+                    writer.writerow([row.get(k) for k in header])
+                else:
+                    buffer.write(json.dumps(row, default=json_default, ensure_ascii=False))
+                    buffer.write("\n")
+                count += 1
+                if count % RENDICION_EXPORT_BATCH == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@sms_router.get("/rendicion/export")
+async def export_rendicion(gestion: int, formato: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    pool = await get_pg_read_pool()
+    media_type = "text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson"
+    extension = "csv" if formato == "csv" else "ndjson"
+    return StreamingResponse(
+        stream_rendicion_export(pool, gestion, formato),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="rendicion_{gestion}.{extension}"'}
+    )
+
 @sms_router.post("/rendicion")
 async def save_rendicion(data: dict):
+    """Create or update one rendición without holding row locks.
+
+    `version` is the token returned by GET /rendicion: the save only applies
+    if the row is still at that version (0 or null: not created yet) and
+    answers 409 otherwise. Without it the submitted fields are merged into
+    the latest row, re-read whenever a concurrent save gets in between.
+    """
     pool = await get_pg_pool()
     async with pool.acquire() as conn:
-        # Check if exists
-        existing = await conn.fetchrow(
-            "SELECT id_rendicion FROM rendicion WHERE id_indicador = $1 AND gestion = $2",
-            data.get('id_indicador'), data.get('gestion')
-        )
+        columns = await get_table_columns(conn, "rendicion")
+        unknown = sorted(k for k in data if k not in columns and k != 'version')
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Columnas no válidas: {', '.join(unknown)}")
+        expected = None
+        if 'version' in data and 'version' in columns:
+            try:
+                expected = int(data['version'] or 0)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="version debe ser numérico")
+        submitted = {k: (v if v != '' else None) for k, v in data.items() if k not in ('id_rendicion', 'version')}
+        key = (data.get('id_indicador'), data.get('gestion'))
         
-        if existing:
-            # Update
-            set_clauses = []
-            values = []
-            i = 1
-            for key, value in data.items():
-                if key not in ['id_indicador', 'gestion']:
-                    set_clauses.append(f"{key} = ${i}")
-                    values.append(value if value != '' else None)
-                    i += 1
-            
-            if set_clauses:
-                values.append(existing['id_rendicion'])
-                query = f"UPDATE rendicion SET {', '.join(set_clauses)} WHERE id_rendicion = ${i} RETURNING *"
-                row = await conn.fetchrow(query, *values)
-                return dict(row)
-            return dict(existing)
-        else:
-            # Insert
-            cols = list(data.keys())
-            placeholders = [f"${i+1}" for i in range(len(cols))]
-            values = [data[k] if data[k] != '' else None for k in cols]
-            
-            query = f"INSERT INTO rendicion ({', '.join(cols)}) VALUES ({', '.join(placeholders)}) RETURNING *"
-            row = await conn.fetchrow(query, *values)
-            return dict(row)
+        row = None
+        for attempt in range(RENDICION_SAVE_ATTEMPTS):
+            if expected is None and attempt == RENDICION_SAVE_ATTEMPTS - 1:
+                # Still racing after the optimistic attempts: take the row lock
+                async with conn.transaction():
+                    row = await write_rendicion(conn, key, submitted, columns, None, lock=True)
+            else:
+                row = await write_rendicion(conn, key, submitted, columns, expected)
+            if row is not None or expected is not None:
+                break
+        if row is None:
+            raise HTTPException(status_code=409, detail=RENDICION_CONFLICT)
+        
+        await refresh_dashboard_grupos(conn, await get_dashboard_grupos(conn, [(row['id_indicador'], row['gestion'])]))
+        await event_bus.publish(
+            "rendicion", conn, accion="guardar", id_indicador=row['id_indicador'], gestion=row['gestion'],
+            version=row.get('version')
+        )
+        return dict(row)
+
+RENDICION_EXISTING = statements.add("rendicion.existing", """
+    SELECT r.id_indicador, r.gestion
+    FROM rendicion r
+    JOIN unnest($1::int[], $2::int[]) AS k(id_indicador, gestion)
+      ON r.id_indicador = k.id_indicador AND r.gestion = k.gestion
+""")
+
+def build_rendicion_upsert(cols: tuple, versioned: bool = False) -> str:
+    """INSERT ... ON CONFLICT for one column set (keys always come first)."""
+    placeholders = ", ".join(f"${i + 1}" for i in range(len(cols)))
+    updates = [f"{c} = EXCLUDED.{c}" for c in cols if c not in ('id_indicador', 'gestion')]
+    if updates and versioned:
+        # Editors holding the previous version get a 409 on their next save
+        updates.append("version = rendicion.version + 1")
+    conflict = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+    return (
+        f"INSERT INTO rendicion ({', '.join(cols)}) VALUES ({placeholders}) "
+        f"ON CONFLICT (id_indicador, gestion) {conflict}"
+    )
+
+@sms_router.post("/rendicion/bulk")
+async def save_rendicion_bulk(request: RendicionBulkRequest):
+    """Upsert many rendiciones in a single transaction.
+
+    Each record is validated against the rendicion columns. Records repeating
+    an (id_indicador, gestion) pair are merged in request order, then grouped
+    by column set and written with one executemany per group, after which the
+    derived monthly totals of the touched rows are recomputed. The write is
+    all-or-nothing: if the database rejects any record, none is kept.
+    There is no version check here (last write wins), but updated rows get a
+    new version so editors holding the old one are told on their next save.
+    """
+    items = request.items
+    if len(items) > RENDICION_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo {RENDICION_BULK_MAX} registros por solicitud")
+
+    pool = await get_pg_pool()
+    async with pool.acquire() as conn:
+        columns = await get_table_columns(conn, "rendicion")
+        writable = set(columns) - {'id_rendicion', 'version'}
+        resultados = []
+        merged = {}
+        for idx, item in enumerate(items):
+            resultado = {"indice": idx, "id_indicador": item.get('id_indicador'), "gestion": item.get('gestion')}
+            resultados.append(resultado)
+            try:
+                key = (int(item['id_indicador']), int(item['gestion']))
+            except (KeyError, TypeError, ValueError):
+                resultado.update(estado="error", detalle="id_indicador y gestion son obligatorios y numéricos")
+                continue
+            unknown = sorted(k for k in item if k not in writable)
+            if unknown:
+                resultado.update(estado="error", detalle=f"Columnas no válidas: {', '.join(unknown)}")
+                continue
+            record, pending_resultados = merged.setdefault(key, ({}, []))
+            record.update({k: (v if v != '' else None) for k, v in item.items()})
+            record['id_indicador'], record['gestion'] = key
+            pending_resultados.append(resultado)
+
+        if merged:
+            groups = {}
+            for record, _ in merged.values():
+                cols = ('id_indicador', 'gestion') + tuple(sorted(k for k in record if k not in ('id_indicador', 'gestion')))
+                groups.setdefault(cols, []).append([record[c] for c in cols])
+            try:
+                async with conn.transaction():
+                    keys = list(merged)
+                    existing = await RENDICION_EXISTING.fetch(conn, [k[0] for k in keys], [k[1] for k in keys])
+                    existing_keys = {(r['id_indicador'], r['gestion']) for r in existing}
+                    for cols, rows in groups.items():
+                        await conn.executemany(build_rendicion_upsert(cols, 'version' in columns), rows)
+                    await recompute_rendicion(
+                        conn,
+                        "(id_indicador, gestion) IN (SELECT * FROM unnest($1::int[], $2::int[]))",
+                        [k[0] for k in keys], [k[1] for k in keys]
+                    )
+            except (asyncpg.PostgresError, asyncpg.DataError) as e:
+                logger.error(f"Bulk rendicion upsert failed: {e}")
+                for _, pending_resultados in merged.values():
+                    for resultado in pending_resultados:
+                        resultado.update(estado="error", detalle=f"Transacción revertida: {e}")
+            else:
+                # A repeated key counts as an update of its first record
+                for key, (_, pending_resultados) in merged.items():
+                    for n, resultado in enumerate(pending_resultados):
+                        resultado['estado'] = "actualizado" if n or key in existing_keys else "insertado"
+                await refresh_dashboard_grupos(conn, await get_dashboard_grupos(conn, list(merged)))
+                # Keys only while they fit in a notification; otherwise clients reload the gestiones
+                claves = [list(key) for key in merged] if len(merged) <= 200 else None
+                await event_bus.publish(
+                    "rendicion", conn, accion="masivo", gestiones=sorted({key[1] for key in merged}), claves=claves
+                )
+
+    errores = sum(1 for r in resultados if r['estado'] == "error")
+    return {
+        "total": len(items),
+        "procesados": len(items) - errores,
+        "errores": errores,
+        "resultados": resultados
+    }
+
+# ========== Dashboard ==========
+# dashboard_resumen keeps one row per (gestion, sector, pilar, eje, entidad,
+# area) with the counts the dashboard needs. Missing ids are stored as 0.
+DASHBOARD_KEYS = ('id_sector', 'id_pilar', 'id_eje', 'id_entidad', 'id_area')
+
+# Dashboard levels: nivel -> (key column, catalog table, name column)
+DASHBOARD_NIVELES = {
+    'sector': ('id_sector', 'sector', 'sector'),
+    'pilar': ('id_pilar', 'pilar', 'pilar'),
+    'eje': ('id_eje', 'eje', 'eje'),
+    'entidad': ('id_entidad', 'entidad', 'entidad'),
+    'area': ('id_area', 'area', 'area_organizacional')
+}
+
+DASHBOARD_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS dashboard_resumen (
+        gestion integer NOT NULL,
+        id_sector integer NOT NULL,
+        id_pilar integer NOT NULL,
+        id_eje integer NOT NULL,
+        id_entidad integer NOT NULL,
+        id_area integer NOT NULL,
+        total_indicadores integer NOT NULL,
+        con_rendicion integer NOT NULL,
+        en_meta integer NOT NULL,
+        suma_avance numeric NOT NULL DEFAULT 0,
+        con_avance integer NOT NULL DEFAULT 0,
+        actualizado timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (gestion, id_sector, id_pilar, id_eje, id_entidad, id_area)
+    )
+"""
+
+# Progress of an indicator is its latest reported proc_ejecutado; it is on
+# track when that value reaches the share of the year elapsed at that month
+DASHBOARD_AVANCE = "COALESCE(" + ", ".join(f"r.proc_ejecutado_{m}" for m in reversed(MESES)) + ")"
+DASHBOARD_MES = "CASE " + " ".join(
+    f"WHEN r.proc_ejecutado_{m} IS NOT NULL THEN {12 - i}" for i, m in enumerate(reversed(MESES))
+) + " END"
+
+def build_dashboard_refresh(grupo: Optional[tuple] = None, gestion: Optional[int] = None) -> tuple:
+    """Upsert the summary rows of one group (or all) and drop stale ones.
+
+    Returns (statement, args); the text only depends on which of `grupo` and
+    `gestion` are given, so there are four statements.
+    """
+    args = []
+    mp_conditions = ["mp.estado = 'ACTIVO'"]
+    d_conditions = []
+    if gestion is None:
+        gestiones = "SELECT DISTINCT gestion FROM rendicion WHERE gestion IS NOT NULL"
+    else:
+        args.append(gestion)
+        gestiones = "SELECT $1::int AS gestion"
+        d_conditions.append("d.gestion = $1")
+    if grupo is not None:
+        for column, value in zip(DASHBOARD_KEYS, grupo):
+            args.append(value)
+            mp_conditions.append(f"COALESCE(mp.{column}, 0) = ${len(args)}")
+            d_conditions.append(f"d.{column} = ${len(args)}")
+
+    keys = ", ".join(DASHBOARD_KEYS)
+    key_values = ", ".join(f"COALESCE(mp.{k}, 0) AS {k}" for k in DASHBOARD_KEYS)
+    stats = ('total_indicadores', 'con_rendicion', 'en_meta', 'suma_avance', 'con_avance', 'actualizado')
+    query = f"""
+        WITH fresh AS (
+            SELECT g.gestion, {key_values},
+                   count(*) AS total_indicadores,
+                   count(r.id_rendicion) AS con_rendicion,
+                   count(*) FILTER (WHERE {DASHBOARD_AVANCE} >= {DASHBOARD_MES} * 100.0 / 12) AS en_meta,
+                   COALESCE(sum({DASHBOARD_AVANCE}), 0) AS suma_avance,
+                   count({DASHBOARD_AVANCE}) AS con_avance,
+                   now() AS actualizado
+            FROM matriz_parametro mp
+            CROSS JOIN ({gestiones}) g
+            LEFT JOIN rendicion r ON r.id_indicador = mp.id_indicador AND r.gestion = g.gestion
+            WHERE {' AND '.join(mp_conditions)}
+            GROUP BY g.gestion, {', '.join(f'COALESCE(mp.{k}, 0)' for k in DASHBOARD_KEYS)}
+        ), upserted AS (
+            INSERT INTO dashboard_resumen (gestion, {keys}, {', '.join(stats)})
+            SELECT * FROM fresh
+            ON CONFLICT (gestion, {keys}) DO UPDATE SET
+                {', '.join(f'{c} = EXCLUDED.{c}' for c in stats)}
+        )
+        DELETE FROM dashboard_resumen d
+        WHERE {' AND '.join(d_conditions) or 'TRUE'}
+          AND NOT EXISTS (
+              SELECT 1 FROM fresh f
+              WHERE f.gestion = d.gestion AND {' AND '.join(f'f.{k} = d.{k}' for k in DASHBOARD_KEYS)}
+          )
+    """
+    name = "dashboard.refresh" + (".grupo" if grupo is not None else "") + (".gestion" if gestion is not None else "")
+    return statements.add(name, query), args
+
+async def refresh_dashboard(conn, grupo: Optional[tuple] = None, gestion: Optional[int] = None):
+    statement, args = build_dashboard_refresh(grupo, gestion)
+    await statement.execute(conn, *args)
+
+DASHBOARD_GRUPOS = statements.add("dashboard.grupos", f"""
+    SELECT DISTINCT {', '.join(f'COALESCE(mp.{k}, 0) AS {k}' for k in DASHBOARD_KEYS)}, k.gestion
+    FROM matriz_parametro mp
+    JOIN unnest($1::int[], $2::int[]) AS k(id_indicador, gestion) ON k.id_indicador = mp.id_indicador
+""")
+
+async def get_dashboard_grupos(conn, keys: list) -> set:
+    """Dashboard (grupo, gestion) pairs of (id_indicador, gestion) keys.
+
+    A gestion of None means every gestión of that group.
+    """
+    try:
+        rows = await DASHBOARD_GRUPOS.fetch(conn, [k[0] for k in keys], [k[1] for k in keys])
+    except asyncpg.PostgresError as e:
+        logger.warning(f"Could not resolve dashboard groups: {e}")
+        return set()
+    return {(tuple(r[k] for k in DASHBOARD_KEYS), r['gestion']) for r in rows}
+
+async def refresh_dashboard_grupos(conn, grupos: set):
+    """Incremental refresh after a write; failures never fail the write."""
+    try:
+        for grupo, gestion in grupos:
+            await refresh_dashboard(conn, grupo, gestion)
+    except asyncpg.PostgresError as e:
+        logger.warning(f"Dashboard refresh failed: {e}")
+
+# One statement per nivel: unset filters are passed as NULL instead of
+# changing the text
+DASHBOARD_QUERIES = {
+    nivel: statements.add(f"dashboard.{nivel}", f"""
+        SELECT d.{key} AS id, c.{name} AS nombre,
+               sum(d.total_indicadores) AS total_indicadores,
+               sum(d.con_rendicion) AS con_rendicion,
+               sum(d.en_meta) AS en_meta,
+               sum(d.suma_avance) AS suma_avance,
+               sum(d.con_avance) AS con_avance
+        FROM dashboard_resumen d
+        LEFT JOIN {table} c ON c.{key} = d.{key}
+        WHERE d.gestion = $1
+          AND {' AND '.join(f'(${i + 2}::int IS NULL OR d.{k} = ${i + 2})' for i, k in enumerate(DASHBOARD_KEYS))}
+        GROUP BY d.{key}, c.{name}
+        ORDER BY d.{key}
+    """)
+    for nivel, (key, table, name) in DASHBOARD_NIVELES.items()
+}
+
+@sms_router.get("/dashboard")
+async def get_dashboard(
+    gestion: int,
+    nivel: str = Query("pilar", pattern="^(sector|pilar|eje|entidad|area)$"),
+    id_sector: Optional[int] = None,
+    id_pilar: Optional[int] = None,
+    id_eje: Optional[int] = None,
+    id_entidad: Optional[int] = None,
+    id_area: Optional[int] = None
+):
+    # Same order as DASHBOARD_KEYS
+    filters = (id_sector, id_pilar, id_eje, id_entidad, id_area)
+
+    pool = await get_pg_read_pool()
+    async with pool.acquire() as conn:
+        rows = await DASHBOARD_QUERIES[nivel].fetch(conn, gestion, *filters)
+
+    def summarize(item: dict) -> dict:
+        total = item['total_indicadores']
+        suma_avance = float(item.pop('suma_avance') or 0)
+        con_avance = item.pop('con_avance')
+        item['porcentaje_en_meta'] = round(item['en_meta'] / total * 100, 2) if total else 0.0
+        item['avance_promedio'] = round(suma_avance / con_avance, 2) if con_avance else None
+        return item
+
+    items = [summarize(dict(r)) for r in rows]
+    totales = summarize({
+        'total_indicadores': sum(r['total_indicadores'] for r in rows),
+        'con_rendicion': sum(r['con_rendicion'] for r in rows),
+        'en_meta': sum(r['en_meta'] for r in rows),
+        'suma_avance': sum(float(r['suma_avance'] or 0) for r in rows),
+        'con_avance': sum(r['con_avance'] for r in rows)
+    })
+    return {"gestion": gestion, "nivel": nivel, "totales": totales, "items": items}
+
+@sms_router.post("/dashboard/refresh")
+async def refresh_dashboard_endpoint(gestion: Optional[int] = None):
+    pool = await get_pg_pool()
+    async with pool.acquire() as conn:
+        await refresh_dashboard(conn, gestion=gestion)
+    return {"message": "Dashboard actualizado"}
 
 # ========== Archivos Adjuntos (usando MongoDB) ==========
 UPLOAD_DIR = Path("/app/backend/uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-@sms_router.get("/archivos/{id_indicador}/{gestion}")
-async def get_archivos(id_indicador: int, gestion: int):
+# Content-addressed store: each distinct file is kept once under
+# blobs/<sha256[:2]>/<sha256>; blob_refs counts the archivos_rendicion
+# documents pointing at it, atomically across workers
+BLOB_DIR = UPLOAD_DIR / "blobs"
+BLOB_DIR.mkdir(exist_ok=True)
+
+# Seconds after which the removal of a blob that never finished (worker
+# killed while unlinking) stops blocking new references to it
+BLOB_REMOVAL_TIMEOUT = 60
+
+def blob_relative_path(sha256: str) -> str:
+    return f"blobs/{sha256[:2]}/{sha256}"
+
+async def acquire_blob(sha256: str):
+    """Count one more reference to a blob, before placing or reusing its file.
+
+    While another worker removes the blob, the upsert hits the existing
+    document (it does not match the filter) and fails; wait for the removal
+    to finish, then the file is placed again.
+    """
+    while True:
+        stale = datetime.now(timezone.utc) - timedelta(seconds=BLOB_REMOVAL_TIMEOUT)
+        try:
+            await db.blob_refs.update_one(
+                {"_id": sha256, "$or": [{"borrado": None}, {"borrado": {"$lt": stale}}]},
+                {"$inc": {"refs": 1}, "$set": {"borrado": None, "borrado_por": None}},
+                upsert=True
+            )
+            return
+        except DuplicateKeyError:
+            await asyncio.sleep(0.05)
+
+async def release_blob(sha256: str):
+    """Drop one reference; whoever takes the count to zero removes the file."""
+    doc = await db.blob_refs.find_one_and_update(
+        {"_id": sha256}, {"$inc": {"refs": -1}}, return_document=ReturnDocument.AFTER
+    )
+    if doc is None or doc["refs"] > 0:
+        return
+    # Claim the removal; fails if a new reference arrived in between
+    claim = str(uuid.uuid4())
+    result = await db.blob_refs.update_one(
+        {"_id": sha256, "refs": {"$lte": 0}, "borrado": None},
+        {"$set": {"borrado": datetime.now(timezone.utc), "borrado_por": claim}}
+    )
+    if not result.modified_count:
+        return
+    try:
+        await asyncio.to_thread((UPLOAD_DIR / blob_relative_path(sha256)).unlink, missing_ok=True)
+    finally:
+        await db.blob_refs.delete_one({"_id": sha256, "borrado_por": claim})
+
+async def rebuild_blob_refs() -> int:
+    """Raise blob_refs to the number of documents pointing at each blob.
+
+    For blobs stored before the counts existed (and by dedupe_uploads.py).
+    Counts are only raised: too high keeps a file, too low would delete one
+    still in use. Returns the number of blobs counted.
+    """
+    counts = {}
+    async for archivo in db.archivos_rendicion.find({"sha256": {"$ne": None}}, {"sha256": 1, "nombre_almacenado": 1}):
+        if archivo["nombre_almacenado"] == blob_relative_path(archivo["sha256"]):
+            counts[archivo["sha256"]] = counts.get(archivo["sha256"], 0) + 1
+    for sha256, refs in counts.items():
+        await db.blob_refs.update_one({"_id": sha256}, {"$max": {"refs": refs}}, upsert=True)
+    return len(counts)
+
+def store_blob(source: Path, sha256: str) -> bool:
+    """Move a hashed file into the blob store; returns False if already stored.
+
+    Call while holding a reference (acquire_blob), so the existing file
+    cannot be removed after it was found.
+    """
+    destination = UPLOAD_DIR / blob_relative_path(sha256)
+    if destination.exists():
+        source.unlink()
+        return False
+    destination.parent.mkdir(exist_ok=True)
+    source.replace(destination)
+    return True
+
+def upload_too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail="El archivo supera el tamaño máximo permitido")
+
+async def receive_upload(request: Request, file_field: str, destination: Path) -> tuple:
+    """Parse a multipart/form-data body as it arrives, writing `file_field` to disk.
+
+    Unlike an UploadFile parameter, which Starlette spools completely to a
+    temporary file before the handler runs, the file part goes straight to
+    `destination` in UPLOAD_CHUNK_SIZE writes (worker threads), hashed on the
+    way, through a .part file renamed only when complete. Oversized requests
+    are refused from Content-Length before reading. The other fields are
+    kept in memory, at most UPLOAD_FORM_MAX_BYTES in total.
+    Returns (fields, filename, size, sha256).
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Se esperaba multipart/form-data")
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > UPLOAD_MAX_BYTES + UPLOAD_FORM_MAX_BYTES:
+        raise upload_too_large()
+
+    fields = {}
+    part = SimpleNamespace(headers={}, field=b"", value=b"", name=None, is_file=False)
+    upload = SimpleNamespace(filename=None, buffer=bytearray(), form_bytes=0)
+
+    def on_part_begin():
+        part.headers, part.name, part.is_file = {}, None, False
+
+    def on_header_field(data, start, end):
+        part.field += data[start:end]
+
+    def on_header_value(data, start, end):
+        part.value += data[start:end]
+
+    def on_header_end():
+        part.headers[part.field.lower()] = part.value
+        part.field, part.value = b"", b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(part.headers.get(b"content-disposition", b""))
+        part.name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if part.name == file_field and filename is not None:
+            if upload.filename is not None:
+                raise HTTPException(status_code=400, detail="Solo se admite un archivo por carga")
+            part.is_file = True
+            upload.filename = filename.decode("utf-8", "replace")
+        else:
+            fields[part.name] = bytearray()
+
+    def on_part_data(data, start, end):
+        if part.is_file:
+            upload.buffer += data[start:end]
+        else:
+            upload.form_bytes += end - start
+            fields[part.name] += data[start:end]
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data
+    })
+    digest = hashlib.sha256()
+    size = 0
+    partial = destination.with_name(destination.name + ".part")
+
+    def write_chunk(f, chunk: bytes):
+        digest.update(chunk)
+        f.write(chunk)
+
+    f = await asyncio.to_thread(open, partial, "wb")
+    try:
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                if upload.form_bytes > UPLOAD_FORM_MAX_BYTES:
+                    raise upload_too_large()
+                if len(upload.buffer) >= UPLOAD_CHUNK_SIZE:
+                    size += len(upload.buffer)
+                    if size > UPLOAD_MAX_BYTES:
+                        raise upload_too_large()
+                    await asyncio.to_thread(write_chunk, f, bytes(upload.buffer))
+                    upload.buffer.clear()
+            parser.finalize()
+        except MultipartParseError:
+            raise HTTPException(status_code=400, detail="Cuerpo multipart no válido")
+        size += len(upload.buffer)
+        if size > UPLOAD_MAX_BYTES:
+            raise upload_too_large()
+        if upload.filename is None:
+            raise HTTPException(status_code=422, detail=f"Falta el campo {file_field}")
+        await asyncio.to_thread(write_chunk, f, bytes(upload.buffer))
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(partial.replace, destination)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        partial.unlink(missing_ok=True)
+        raise
+    try:
+        form = {name: bytes(value).decode() for name, value in fields.items()}
+    except UnicodeDecodeError:
+        destination.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="Los campos del formulario deben estar en UTF-8")
+    return form, upload.filename, size, digest.hexdigest()
+
+def form_int(form: dict, name: str) -> int:
+    value = form.get(name)
+    if value is None:
+        raise HTTPException(status_code=422, detail=f"Falta el campo {name}")
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"{name} debe ser un número entero")
+
+ARCHIVO_FIELDS = (
+    "id", "id_indicador", "gestion", "nombre_original", "nombre_almacenado",
+    "descripcion", "tamaño", "sha256", "fecha_carga"
+)
+ARCHIVO_PROJECTION = {f: 1 for f in ARCHIVO_FIELDS}
+
+def parse_archivos_cursor(cursor: Optional[str]) -> Optional[ObjectId]:
+    if cursor is None:
+        return None
+    if not ObjectId.is_valid(cursor):
+        raise HTTPException(status_code=400, detail="Cursor no válido")
+    return ObjectId(cursor)
+
+async def find_archivos_page(query: dict, projection: dict, limit: int, cursor: Optional[str]) -> tuple:
+    """One page of attachments in upload order; returns (archivos, next_cursor).
+
+    `projection` must list the fields to return (inclusion): _id is added
+    for paging and removed again.
+    """
+    after = parse_archivos_cursor(cursor)
+    if after is not None:
+        query = {**query, "_id": {"$gt": after}}
+    # Fetch one extra document to know whether another page exists
     archivos = await db.archivos_rendicion.find(
-        {"id_indicador": id_indicador, "gestion": gestion},
-        {"_id": 0}
-    ).to_list(100)
+        query, {**projection, "_id": 1}
+    ).sort("_id", 1).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(archivos) > limit:
+        archivos = archivos[:limit]
+        next_cursor = str(archivos[-1]["_id"])
+    for archivo in archivos:
+        archivo.pop("_id")
+    return archivos, next_cursor
+
+# Typed segments so /archivos/download/{file_id} is not captured here
+@sms_router.get("/archivos/{id_indicador:int}/{gestion:int}")
+async def get_archivos(
+    id_indicador: int,
+    gestion: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=ARCHIVOS_MAX_PAGE),
+    cursor: Optional[str] = None
+):
+    """Attachments of one indicator; further pages via the X-Next-Cursor header."""
+    archivos, next_cursor = await find_archivos_page(
+        {"id_indicador": id_indicador, "gestion": gestion}, ARCHIVO_PROJECTION, limit, cursor
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return archivos
 
+@sms_router.post("/archivos/query")
+async def query_archivos(request: ArchivosQueryRequest):
+    """Attachments for many (id_indicador, gestion) pairs in a single query.
+
+    Results are grouped per requested pair (empty groups included). When more
+    than `limit` attachments match, pass `next_cursor` back as `cursor` and
+    merge the groups of the following pages.
+    """
+    if not request.pares:
+        return {"resultados": [], "next_cursor": None}
+    if len(request.pares) > ARCHIVOS_QUERY_MAX_PARES:
+        raise HTTPException(status_code=400, detail=f"Máximo {ARCHIVOS_QUERY_MAX_PARES} pares por consulta")
+    
+    if request.fields:
+        unknown = [f for f in request.fields if f not in ARCHIVO_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(unknown)}")
+        # The pair keys are always returned: results are grouped by them
+        projection = {f: 1 for f in ("id", "id_indicador", "gestion", *request.fields)}
+    else:
+        projection = ARCHIVO_PROJECTION
+    
+    # One $in per gestión (normally just one), served by the compound index
+    ids_by_gestion = {}
+    for par in request.pares:
+        ids_by_gestion.setdefault(par.gestion, set()).add(par.id_indicador)
+    clauses = [
+        {"gestion": gestion, "id_indicador": {"$in": sorted(ids)}}
+        for gestion, ids in ids_by_gestion.items()
+    ]
+    query = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+    archivos, next_cursor = await find_archivos_page(query, projection, request.limit, request.cursor)
+    
+    grupos = {}
+    for par in request.pares:
+        grupos.setdefault((par.id_indicador, par.gestion), [])
+    for archivo in archivos:
+        grupos[(archivo["id_indicador"], archivo["gestion"])].append(archivo)
+    return {
+        "resultados": [
+            {"id_indicador": id_indicador, "gestion": gestion, "archivos": items}
+            for (id_indicador, gestion), items in grupos.items()
+        ],
+        "next_cursor": next_cursor
+    }
+
 @sms_router.post("/archivos")
-async def upload_archivo(
-    id_indicador: int = Form(...),
-    gestion: int = Form(...),
-    descripcion: str = Form(""),
-    archivo: UploadFile = File(...)
-):
-    # Generate unique filename
+async def upload_archivo(request: Request):
+    """Upload an attachment as multipart/form-data: id_indicador, gestion,
+    descripcion (optional) and the file in `archivo`, in any order."""
+    # Receive into a temporary file; its hash decides the stored name
     file_id = str(uuid.uuid4())
-    file_extension = Path(archivo.filename).suffix
-    stored_filename = f"{file_id}{file_extension}"
-    file_path = UPLOAD_DIR / stored_filename
-    
-    # Save file
-    content = await archivo.read()
-    file_size = len(content)
-    with open(file_path, "wb") as f:
-        f.write(content)
+    temp_path = UPLOAD_DIR / f"{file_id}.upload"
+    form, filename, file_size, sha256 = await receive_upload(request, "archivo", temp_path)
+    try:
+        id_indicador = form_int(form, "id_indicador")
+        gestion = form_int(form, "gestion")
+    except HTTPException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    descripcion = form.get("descripcion", "")
+    stored_filename = blob_relative_path(sha256)
     
     # Save metadata to MongoDB
     archivo_doc = {
         "id": file_id,
         "id_indicador": id_indicador,
         "gestion": gestion,
-        "nombre_original": archivo.filename,
+        "nombre_original": filename,
         "nombre_almacenado": stored_filename,
         "descripcion": descripcion,
         "tamaño": file_size,
+        "sha256": sha256,
         "fecha_carga": datetime.now(timezone.utc).isoformat()
     }
-    await db.archivos_rendicion.insert_one(archivo_doc)
+    # Counted before the file is placed, so a concurrent removal of the
+    # blob cannot unlink it afterwards; the document only once it is there
+    await acquire_blob(sha256)
+    try:
+        await asyncio.to_thread(store_blob, temp_path, sha256)
+        await db.archivos_rendicion.insert_one(archivo_doc)
+    except BaseException:
+        await release_blob(sha256)
+        raise
+    finally:
+        temp_path.unlink(missing_ok=True)
     
-    return {"id": file_id, "nombre_original": archivo.filename, "tamaño": file_size, "descripcion": descripcion}
+    return {"id": file_id, "nombre_original": filename, "tamaño": file_size, "sha256": sha256, "descripcion": descripcion}
 
 @sms_router.delete("/archivos/{file_id}")
 async def delete_archivo(file_id: str):
@@ -831,8 +3419,16 @@ async def delete_archivo(file_id: str):
     if not archivo:
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
-    # Delete file from disk
     file_path = UPLOAD_DIR / archivo["nombre_almacenado"]
+    sha256 = archivo.get("sha256")
+    if sha256 and archivo["nombre_almacenado"] == blob_relative_path(sha256):
+        # Shared blob: unlinked by whoever drops its last reference
+        result = await db.archivos_rendicion.delete_one({"id": file_id})
+        if result.deleted_count:
+            await release_blob(sha256)
+        return {"message": "Archivo eliminado"}
+    
+    # Legacy file stored under its own name
     if file_path.exists():
         file_path.unlink()
     
@@ -841,24 +3437,637 @@ async def delete_archivo(file_id: str):
     
     return {"message": "Archivo eliminado"}
 
-@sms_router.get("/archivos/download/{file_id}")
-async def download_archivo(file_id: str):
-    from fastapi.responses import FileResponse
-    
-    archivo = await db.archivos_rendicion.find_one({"id": file_id})
+class RangeFileResponse(FileResponse):
+    """FileResponse that can serve a single byte range (206) of the file.
+
+    The body goes through the ASGI zero-copy (sendfile) or pathsend extensions
+    when the server offers them, otherwise it is read with pread in a thread.
+    """
+    chunk_size = DOWNLOAD_CHUNK_SIZE
+
+    def __init__(self, path, stat_result: os.stat_result, byte_range: Optional[tuple] = None, **kwargs):
+        super().__init__(path, stat_result=stat_result, **kwargs)
+        self.headers["accept-ranges"] = "bytes"
+        self.byte_range = byte_range
+        if byte_range:
+            start, end = byte_range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+            self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send):
+        start, end = self.byte_range or (0, self.stat_result.st_size - 1)
+        count = end - start + 1
+        extensions = scope.get("extensions") or {}
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in extensions:
+            f = await asyncio.to_thread(open, self.path, "rb")
+            try:
+                await send({"type": "http.response.zerocopysend", "file": f, "offset": start, "count": count})
+            finally:
+                f.close()
+        elif self.byte_range is None and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            f = await asyncio.to_thread(open, self.path, "rb")
+            try:
+                offset, remaining = start, count
+                while remaining > 0:
+                    chunk = await asyncio.to_thread(os.pread, f.fileno(), min(self.chunk_size, remaining), offset)
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    # File shrank underneath us; close the response cleanly
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+            finally:
+                f.close()
+
+def parse_byte_range(range_header: str, size: int) -> Optional[tuple]:
+    """Parse a single 'bytes=' range into (start, end); None means serve the whole file.
+
+    As in RFC 9110, a range that cannot be parsed (including bytes=5-2) is
+    ignored, while a valid one that selects nothing (bytes=-0, or a start at
+    or past the end) is refused with 416.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        # Other units and multipart ranges are not supported: full response
+        return None
+    first, sep, last = (part.strip() for part in spec.strip().partition("-"))
+    if not sep or not (first or last) or not all(p.isascii() and p.isdigit() for p in (first, last) if p):
+        return None
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        length = int(last)
+        # A zero-length suffix selects nothing
+        start, end = (max(size - length, 0), size - 1) if length else (size, size)
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Rango no satisfacible",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+def not_modified_since(if_modified_since: Optional[str], mtime: float) -> bool:
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return int(mtime) <= since.timestamp()
+
+@sms_router.api_route("/archivos/download/{file_id}", methods=["GET", "HEAD"])
+async def download_archivo(file_id: str, request: Request):
+    archivo = await db.archivos_rendicion.find_one(
+        {"id": file_id},
+        {"_id": 0, "nombre_almacenado": 1, "nombre_original": 1, "sha256": 1}
+    )
     if not archivo:
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     file_path = UPLOAD_DIR / archivo["nombre_almacenado"]
-    if not file_path.exists():
+    try:
+        stat_result = await asyncio.to_thread(os.stat, file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Archivo no encontrado en disco")
     
-    return FileResponse(
-        path=str(file_path),
-        filename=archivo["nombre_original"],
-        media_type="application/octet-stream"
+    # Content hash when known, size/mtime for legacy files
+    if archivo.get("sha256"):
+        etag = f'"{archivo["sha256"]}"'
+    else:
+        etag = f'"{stat_result.st_size:x}-{int(stat_result.st_mtime):x}"'
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    headers = {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": "no-cache"}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag) or (
+        if_none_match is None and not_modified_since(request.headers.get("if-modified-since"), stat_result.st_mtime)
+    ):
+        return Response(status_code=304, headers=headers)
+    
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() in (etag, last_modified)):
+        byte_range = parse_byte_range(range_header, stat_result.st_size)
+    
+    nombre = archivo["nombre_original"]
+    return RangeFileResponse(
+        path=file_path,
+        stat_result=stat_result,
+        byte_range=byte_range,
+        filename=nombre,
+        media_type=mimetypes.guess_type(nombre)[0] or "application/octet-stream",
+        headers=headers
     )
 
+# ========== Background Jobs ==========
+JOB_RESULT_DIR = Path("/app/backend/job_results")
+JOB_RESULT_DIR.mkdir(exist_ok=True)
+
+# A running job refreshes `actualizado` this often; jobs silent for
+# JOB_STALE_SECONDS belong to a dead process
+JOB_HEARTBEAT_SECONDS = 30
+JOB_STALE_SECONDS = 120
+
+JOB_TYPES = {}
+
+def job_type(tipo: str):
+    """Register `func(job, **params)` as a background job type."""
+    def register(func):
+        JOB_TYPES[tipo] = func
+        return func
+    return register
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class JobContext:
+    """What a job function gets: limited database access and progress reporting."""
+
+    def __init__(self, runner: "JobRunner", job: dict):
+        self.runner = runner
+        self.id = job["id"]
+        self.result_path = JOB_RESULT_DIR / self.id
+        self._last_report = 0.0
+
+    def acquire(self, read_only: bool = False):
+        return self.runner.acquire(read_only)
+
+    async def progress(self, progreso: float, mensaje: Optional[str] = None):
+        # At most one Mongo write per second
+        now = time.monotonic()
+        if now - self._last_report < 1:
+            return
+        self._last_report = now
+        update = {"progreso": round(min(progreso, 100), 1), "actualizado": utc_now_iso()}
+        if mensaje:
+            update["mensaje"] = mensaje
+        await db.jobs.update_one({"id": self.id}, {"$set": update})
+
+class JobRunner:
+    """In-process job queue with a fixed set of worker tasks.
+
+    Job state lives in the Mongo `jobs` collection, so any process can report
+    on a job. Workers claim jobs atomically, which makes re-queuing pending
+    jobs after a restart safe with several server processes. Database work
+    in jobs goes through acquire(), capped at `pg_connections` connections.
+    """
+
+    def __init__(self, workers: int, pg_connections: int, max_queue: int):
+        self.workers = workers
+        self.pg_connections = pg_connections
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(pg_connections)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._running = {}
+        self.completed = 0
+        self.failed = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        await self._fail_stale()
+        async for job in db.jobs.find({"estado": "pendiente"}, {"_id": 0, "id": 1}).sort("creado", 1):
+            self._queue.put_nowait(job["id"])
+        await self.prune()
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    @staticmethod
+    def _stale_before() -> str:
+        return (datetime.now(timezone.utc) - timedelta(seconds=JOB_STALE_SECONDS)).isoformat()
+
+    async def _fail_stale(self):
+        """Jobs en_proceso without a heartbeat belong to a process that died."""
+        await db.jobs.update_many(
+            {"estado": "en_proceso", "actualizado": {"$lt": self._stale_before()}},
+            {"$set": {"estado": "error", "error": "Interrumpido por reinicio del servidor", "finalizado": utc_now_iso()}}
+        )
+
+    async def sweep(self):
+        """Fail dead jobs and take over pending jobs untouched for JOB_STALE_SECONDS.
+
+        Those were queued by a process that stopped before running them (or
+        handed back at its shutdown); claiming them is atomic, so a job that
+        ends up queued in two processes still runs once.
+        """
+        await self._fail_stale()
+        while job := await db.jobs.find_one_and_update(
+            {"estado": "pendiente", "actualizado": {"$lt": self._stale_before()}},
+            {"$set": {"actualizado": utc_now_iso()}},
+            projection={"_id": 0, "id": 1},
+            sort=[("creado", 1)]
+        ):
+            self._queue.put_nowait(job["id"])
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning(f"Job sweep failed: {e}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @asynccontextmanager
+    async def acquire(self, read_only: bool = False):
+        async with self._semaphore:
+            pool = await get_pg_read_pool() if read_only else await get_pg_pool()
+            async with pool.acquire() as conn:
+                yield conn
+
+    async def submit(self, tipo: str, params: dict, usuario: dict) -> dict:
+        func = JOB_TYPES.get(tipo)
+        if func is None:
+            raise HTTPException(status_code=400, detail=f"Tipo de trabajo no válido: {tipo}")
+        try:
+            inspect.signature(func).bind(None, **params)
+        except TypeError as e:
+            raise HTTPException(status_code=400, detail=f"Parámetros no válidos: {e}")
+        if self._queue is None:
+            raise HTTPException(status_code=503, detail="Servicio de trabajos no disponible")
+        if self._queue.qsize() >= self.max_queue:
+            raise HTTPException(status_code=503, detail="Demasiados trabajos en cola, intente más tarde")
+        now = utc_now_iso()
+        job = {
+            "id": str(uuid.uuid4()),
+            "tipo": tipo,
+            "params": params,
+            "estado": "pendiente",
+            "progreso": 0,
+            "mensaje": None,
+            "resultado": None,
+            "error": None,
+            "id_usuario": usuario.get("id_usuario"),
+            "creado": now,
+            "actualizado": now,
+            "iniciado": None,
+            "finalizado": None
+        }
+        await db.jobs.insert_one(dict(job))
+        self._queue.put_nowait(job["id"])
+        return job
+
+    async def cancel(self, job: dict) -> bool:
+        """Cancel a pending job or one running in this process."""
+        task = self._running.get(job["id"])
+        if task:
+            task.cancel()
+            return True
+        result = await db.jobs.update_one(
+            {"id": job["id"], "estado": "pendiente"},
+            {"$set": {"estado": "cancelado", "finalizado": utc_now_iso()}}
+        )
+        return result.modified_count == 1
+
+    async def prune(self):
+        """Drop finished jobs (and their result files) older than the retention."""
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=JOB_RESULT_TTL_HOURS)).isoformat()
+        query = {"finalizado": {"$ne": None, "$lt": cutoff}}
+        async for job in db.jobs.find(query, {"_id": 0, "id": 1}):
+            (JOB_RESULT_DIR / job["id"]).unlink(missing_ok=True)
+        await db.jobs.delete_many(query)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+                await self.prune()
+            except Exception as e:
+                logger.error(f"Job {job_id} failed unexpectedly: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            await db.jobs.update_one({"id": job_id}, {"$set": {"actualizado": utc_now_iso()}})
+
+    async def _run(self, job_id: str):
+        now = utc_now_iso()
+        job = await db.jobs.find_one_and_update(
+            {"id": job_id, "estado": "pendiente"},
+            {"$set": {"estado": "en_proceso", "iniciado": now, "actualizado": now}},
+            projection={"_id": 0}
+        )
+        if not job:
+            # Cancelled, or already claimed by another process
+            return
+        context = JobContext(self, job)
+        # The job task inherits this, so its database time is reported per type
+        current_handler.set(f"job {job['tipo']}")
+        task = asyncio.create_task(JOB_TYPES[job["tipo"]](context, **job["params"]))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        self._running[job_id] = task
+        interrupted = None
+        try:
+            await asyncio.wait({task})
+        except asyncio.CancelledError as e:
+            # The worker itself is cancelled: the server is stopping
+            interrupted = e
+        finally:
+            heartbeat.cancel()
+            task.cancel()
+            self._running.pop(job_id, None)
+        if interrupted:
+            # Hand the job back; the next start (or another process's sweep) runs it again
+            context.result_path.unlink(missing_ok=True)
+            await db.jobs.update_one(
+                {"id": job_id, "estado": "en_proceso"},
+                {"$set": {"estado": "pendiente", "progreso": 0, "mensaje": None, "iniciado": None, "actualizado": utc_now_iso()}}
+            )
+            raise interrupted
+
+        update = {"finalizado": utc_now_iso(), "actualizado": utc_now_iso()}
+        if task.cancelled():
+            update["estado"] = "cancelado"
+        elif task.exception() is not None:
+            update.update({"estado": "error", "error": str(task.exception()) or type(task.exception()).__name__})
+            self.failed += 1
+            logger.error(f"Job {job_id} ({job['tipo']}) failed: {task.exception()}")
+        else:
+            update.update({"estado": "completado", "progreso": 100, "resultado": task.result()})
+            self.completed += 1
+        if update["estado"] != "completado":
+            context.result_path.unlink(missing_ok=True)
+        await db.jobs.update_one({"id": job_id}, {"$set": update})
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pg_connections": self.pg_connections,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "running": len(self._running),
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+job_runner = JobRunner(JOB_WORKERS, JOB_PG_CONNECTIONS, JOB_QUEUE_MAX)
+
+@job_type("rendicion_export")
+async def export_rendicion_job(job: JobContext, gestion: int, formato: str = "ndjson"):
+    if formato not in ("ndjson", "csv"):
+        raise ValueError(f"Formato no válido: {formato}")
+    async with job.acquire(read_only=True) as conn:
+        total = await RENDICION_COUNT.fetchval(conn, gestion)
+    written = 0
+    f = await asyncio.to_thread(open, job.result_path, "w", encoding="utf-8", newline="")
+    try:
+        reader = SimpleNamespace(acquire=lambda: job.acquire(read_only=True))
+        async for chunk in stream_rendicion_export(reader, gestion, formato):
+            await asyncio.to_thread(f.write, chunk)
+            written += RENDICION_EXPORT_BATCH
+            await job.progress(100 * min(written, total) / total if total else 100)
+    finally:
+        await asyncio.to_thread(f.close)
+    extension = "csv" if formato == "csv" else "ndjson"
+    return {
+        "archivo": f"rendicion_{gestion}.{extension}",
+        "media_type": "text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson",
+        "filas": total,
+        "tamaño": job.result_path.stat().st_size
+    }
+
+@job_type("recompute_rendicion")
+async def recompute_rendicion_job(job: JobContext, gestion: Optional[int] = None):
+    async with job.acquire() as conn:
+        if gestion is None:
+            rows = await RENDICION_GESTIONES.fetch(conn)
+            gestiones = [r['gestion'] for r in rows]
+        else:
+            gestiones = [gestion]
+        rendiciones = 0
+        for i, g in enumerate(gestiones, 1):
+            rendiciones += await recompute_rendicion_gestion(conn, g)
+            await job.progress(100 * i / len(gestiones), f"Gestión {g} recalculada")
+        await refresh_dashboard(conn, gestion=gestion)
+    return {"gestiones": gestiones, "rendiciones": rendiciones}
+
+@job_type("dashboard_refresh")
+async def refresh_dashboard_job(job: JobContext, gestion: Optional[int] = None):
+    async with job.acquire() as conn:
+        await refresh_dashboard(conn, gestion=gestion)
+    return {"gestion": gestion}
+
+def can_see_job(job: dict, current_user: dict) -> bool:
+    return current_user.get("id_rol") == ADMIN_ROL_ID or job.get("id_usuario") == current_user.get("id_usuario")
+
+async def get_job_for_user(job_id: str, current_user: dict) -> dict:
+    job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job or not can_see_job(job, current_user):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+@sms_router.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest, current_user: dict = Depends(get_current_user)):
+    return await job_runner.submit(request.tipo, request.params, current_user)
+
+@sms_router.get("/jobs")
+async def list_jobs(
+    estado: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user)
+):
+    query = {}
+    if current_user.get("id_rol") != ADMIN_ROL_ID:
+        query["id_usuario"] = current_user.get("id_usuario")
+    if estado:
+        query["estado"] = estado
+    return await db.jobs.find(query, {"_id": 0}).sort("creado", -1).to_list(limit)
+
+@sms_router.get("/jobs/stats")
+async def get_job_stats():
+    return {**job_runner.stats(), "tipos": sorted(JOB_TYPES)}
+
+@sms_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    return await get_job_for_user(job_id, current_user)
+
+@sms_router.get("/jobs/{job_id}/resultado")
+async def download_job_result(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await get_job_for_user(job_id, current_user)
+    resultado = job.get("resultado") or {}
+    result_path = JOB_RESULT_DIR / job_id
+    if job["estado"] != "completado" or "archivo" not in resultado:
+        raise HTTPException(status_code=409, detail="El trabajo no tiene un resultado descargable")
+    if not result_path.exists():
+        raise HTTPException(status_code=404, detail="Resultado no encontrado en disco")
+    return FileResponse(path=result_path, filename=resultado["archivo"], media_type=resultado["media_type"])
+
+@sms_router.delete("/jobs/{job_id}")
+async def delete_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await get_job_for_user(job_id, current_user)
+    if job["estado"] in ("pendiente", "en_proceso"):
+        if not await job_runner.cancel(job):
+            raise HTTPException(status_code=409, detail="El trabajo se está ejecutando en otro proceso")
+        return {"message": "Trabajo cancelado"}
+    (JOB_RESULT_DIR / job_id).unlink(missing_ok=True)
+    await db.jobs.delete_one({"id": job_id})
+    return {"message": "Trabajo eliminado"}
+
+# ========== Cache Stats ==========
+@sms_router.get("/cache/stats")
+async def get_cache_stats():
+    return {"catalogos": catalog_cache.stats(), "permisos": permission_matrix.stats(), "tokens": token_registry.stats()}
+
+def db_stats() -> dict:
+    return {
+        "primary": pg_pool.stats() if pg_pool else pool_metrics.stats(),
+        "replica": (pg_replica_pool.stats() if pg_replica_pool else replica_metrics.stats()) if PG_REPLICA_CONFIG else None,
+        "statements": statements.stats()
+    }
+
+@sms_router.get("/db/stats")
+async def get_db_stats():
+    return db_stats()
+
+@sms_router.get("/health")
+async def health():
+    """Liveness of PostgreSQL and MongoDB; 503 when either does not answer."""
+    checks = {}
+    start = time.perf_counter()
+    try:
+        pool = await asyncio.wait_for(get_pg_pool(), HEALTH_TIMEOUT)
+        async with pool.acquire(timeout=HEALTH_TIMEOUT) as conn:
+            await conn.fetchval("SELECT 1", timeout=HEALTH_TIMEOUT)
+        checks["postgres"] = {"ok": True, "latency_ms": round(1000 * (time.perf_counter() - start), 2)}
+    except Exception as e:
+        checks["postgres"] = {"ok": False, "error": str(e) or type(e).__name__}
+    
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), HEALTH_TIMEOUT)
+        checks["mongo"] = {"ok": True, "latency_ms": round(1000 * (time.perf_counter() - start), 2)}
+    except Exception as e:
+        checks["mongo"] = {"ok": False, "error": str(e) or type(e).__name__}
+    
+    healthy = all(check["ok"] for check in checks.values())
+    body = {"status": "ok" if healthy else "error", **checks}
+    if PG_REPLICA_CONFIG:
+        # Informational only: reads fall back to the primary without it
+        start = time.perf_counter()
+        try:
+            replica = await asyncio.wait_for(get_pg_replica_pool(), HEALTH_TIMEOUT)
+            if replica is None:
+                raise ConnectionError("replica no disponible")
+            async with replica.acquire(timeout=HEALTH_TIMEOUT) as conn:
+                await conn.fetchval("SELECT 1", timeout=HEALTH_TIMEOUT)
+            body["replica"] = {"ok": True, "latency_ms": round(1000 * (time.perf_counter() - start), 2)}
+        except Exception as e:
+            body["replica"] = {"ok": False, "error": str(e) or type(e).__name__}
+    if pg_pool:
+        body["pool"] = {k: v for k, v in pg_pool.stats().items() if k != "handlers"}
+    return JSONResponse(jsonable_encoder(body), status_code=200 if healthy else 503)
+
+@sms_router.get("/auth/stats")
+async def get_auth_stats():
+    return {"bcrypt": password_hasher.stats(), "tokens": token_registry.stats()}
+
+# ========== Metrics ==========
+def prometheus_labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+def render_prometheus() -> str:
+    """Request and database metrics of this worker in Prometheus text format."""
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{name}{suffix}{prometheus_labels(**labels) if labels else ''} {value}")
+
+    routes = request_metrics.items()
+    metric("sms_http_requests_in_flight", "gauge", "Requests being served",
+           [("", None, request_metrics.in_flight)])
+    metric("sms_http_requests_total", "counter", "Requests by route and status code", [
+        ("", {"method": method, "route": route, "status": status}, count)
+        for (method, route), entry in routes
+        for status, count in sorted(entry["status"].items())
+    ])
+    samples = []
+    for (method, route), entry in routes:
+        latency = entry["latency"]
+        for bound, count in latency.cumulative():
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            samples.append(("_bucket", {"method": method, "route": route, "le": le}, count))
+        samples.append(("_sum", {"method": method, "route": route}, latency.sum))
+        samples.append(("_count", {"method": method, "route": route}, latency.count))
+    metric("sms_http_request_duration_seconds", "histogram", "Request latency until the last body chunk", samples)
+
+    pools = [(pool_metrics, pg_pool)]
+    if PG_REPLICA_CONFIG:
+        pools.append((replica_metrics, pg_replica_pool))
+    handler_series = [
+        ("sms_db_queries_total", "counter", "Queries run by handler", "queries"),
+        ("sms_db_query_errors_total", "counter", "Queries that raised, by handler", "errors"),
+        ("sms_db_query_seconds_total", "counter", "Time spent in queries by handler", "query_time"),
+        ("sms_db_rows_total", "counter", "Rows returned or changed by handler", "rows"),
+        ("sms_db_slow_queries_total", "counter", f"Queries slower than {SLOW_QUERY_MS:g} ms by handler", "slow"),
+        ("sms_db_acquires_total", "counter", "Connections acquired by handler", "acquires"),
+        ("sms_db_acquire_wait_seconds_total", "counter", "Time waiting for a connection by handler", "acquire_wait"),
+    ]
+    for name, kind, help_text, key in handler_series:
+        metric(name, kind, help_text, [
+            ("", {"pool": metrics.name, "handler": handler}, entry[key])
+            for metrics, _ in pools
+            for handler, entry in metrics.items()
+        ])
+    metric("sms_db_pool_waiting", "gauge", "Callers waiting for a connection",
+           [("", {"pool": metrics.name}, metrics.waiting) for metrics, _ in pools])
+    metric("sms_db_pool_connections", "gauge", "Open connections by state", [
+        ("", {"pool": metrics.name, "state": state}, value)
+        for metrics, pool in pools if pool is not None
+        for state, value in (("idle", pool.get_idle_size()), ("in_use", pool.get_size() - pool.get_idle_size()))
+    ])
+    metric("sms_db_statement_calls_total", "counter", "Executions of each named statement", [
+        ("", {"statement": name}, stats["calls"]) for name, stats in statements.stats().items()
+    ])
+    metric("sms_db_statement_seconds_total", "counter", "Time spent in each named statement", [
+        ("", {"statement": name}, stats["total_ms"] / 1000) for name, stats in statements.stats().items()
+    ])
+    return "\n".join(lines) + "\n"
+
+@api_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint (per worker process)."""
+    return Response(content=render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@sms_router.get("/metrics")
+async def get_metrics_summary(current_user: dict = Depends(get_current_user)):
+    """Same metrics as JSON, with estimated percentiles and the recent slow queries."""
+    if current_user.get("id_rol") != ADMIN_ROL_ID:
+        raise HTTPException(status_code=403, detail="Solo el administrador puede ver las métricas")
+    return {
+        "requests": request_metrics.stats(),
+        "db": db_stats(),
+        "slow_query_ms": SLOW_QUERY_MS,
+        "slow_queries": list(reversed(slow_queries))
+    }
+
 # ========== Original MongoDB routes ==========
 class StatusCheck(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -885,15 +4094,143 @@ async def create_status_check(input: StatusCheckCreate):
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
     status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
-    return status_checks
+    # Returning a Response skips response_model: validate and drop extra fields here
+    return FastJSONResponse([StatusCheck(**check).model_dump() for check in status_checks])
+
+# ========== Compression ==========
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "application/xml", "text/")
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+class CompressionMiddleware:
+    """Brotli (when installed) or gzip for compressible responses.
+
+    Bodies under `minimum_size` are sent as is. Responses that are already
+    encoded or serve byte ranges (file downloads) pass through untouched,
+    including ASGI pathsend/zerocopysend messages. Streamed bodies are
+    compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = 1000, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _negotiate(self, accept_encoding: str) -> Optional[str]:
+        accepted = set()
+        for part in accept_encoding.lower().split(","):
+            coding, _, params = part.strip().partition(";")
+            if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                accepted.add(coding.strip())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _encoder(self, encoding: str):
+        return BrotliEncoder(self.brotli_quality) if encoding == "br" else GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    "content-encoding" in headers
+                    or "content-range" in headers
+                    or "accept-ranges" in headers
+                    or message["status"] in (204, 304)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    # Each event must reach the client as soon as it is written
+                    or content_type.startswith("text/event-stream")
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held until the first body chunk shows whether it is worth it
+                    start_message = message
+                return
+            if message["type"] != "http.response.body":
+                if start_message is not None:
+                    await send(start_message)
+                    start_message = None
+                passthrough = True
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = self._encoder(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                    body = encoder.compress(body)
+                else:
+                    body = encoder.compress(body) + encoder.finish()
+                    headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                start_message = None
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            body = encoder.compress(body)
+            if not more_body:
+                body += encoder.finish()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
 
 # Include routers
 app.include_router(api_router)
 app.include_router(sms_router)
 
+# Request metrics, innermost: CORS preflights answered by CORSMiddleware are not counted
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
+
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -901,12 +4238,166 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Client-Id"],
+)
+
+# Compress JSON payloads (bootstrap, indicator lists) and exports
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_level=GZIP_LEVEL,
+    brotli_quality=BROTLI_QUALITY
 )
 
+# Startup event
+@app.on_event("startup")
+async def open_pg_pool():
+    """Connect at startup so the first request does not pay for it."""
+    try:
+        await get_pg_pool()
+    except Exception as e:
+        logger.warning(f"PostgreSQL not available at startup, will retry on first use: {e}")
+
+# (id_indicador, gestion) pairs stored more than once; merged by dedupe_rendicion.py
+RENDICION_DUPLICATES = """
+    SELECT id_indicador, gestion, array_agg(id_rendicion ORDER BY id_rendicion DESC) AS ids
+    FROM rendicion GROUP BY id_indicador, gestion HAVING count(*) > 1
+    ORDER BY gestion, id_indicador
+"""
+
+async def ensure_rendicion_unique(conn):
+    """Create the conflict target of the rendicion upserts, if missing.
+
+    Duplicated (id_indicador, gestion) rows stop the startup: they hold data
+    users entered, so they are merged by an operator (dedupe_rendicion.py),
+    never deleted here.
+    """
+    exists = "SELECT to_regclass('uq_rendicion_indicador_gestion') IS NOT NULL"
+    if await conn.fetchval(exists):
+        return
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE rendicion IN SHARE ROW EXCLUSIVE MODE")
+        # Another worker may have created it while this one waited for the lock
+        if await conn.fetchval(exists):
+            return
+        duplicates = await conn.fetch(RENDICION_DUPLICATES)
+        if duplicates:
+            raise RuntimeError(
+                f"rendicion has {len(duplicates)} duplicated (id_indicador, gestion) pairs, "
+                f"first {duplicates[0]['id_indicador']}/{duplicates[0]['gestion']}; "
+                "review them with `python dedupe_rendicion.py --dry-run` and merge them with "
+                "`python dedupe_rendicion.py` before starting the API"
+            )
+        await conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_rendicion_indicador_gestion ON rendicion (id_indicador, gestion)"
+        )
+
+@app.on_event("startup")
+async def ensure_pg_schema():
+    """Create the indexes and sequences the query paths rely on, if missing.
+
+    Without the rendicion conflict target every save would fail, so the
+    startup stops if it cannot be created.
+    """
+    ddl = [
+        f"CREATE INDEX IF NOT EXISTS idx_matriz_parametro_busqueda ON matriz_parametro USING gin (({MATRIZ_SEARCH_VECTOR}))",
+        # Optimistic concurrency token of rendicion saves
+        "ALTER TABLE rendicion ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1",
+        # id_opcion generator for role/menu provisioning, never behind MAX(id_opcion)
+        f"CREATE SEQUENCE IF NOT EXISTS {OPCIONES_SEQ}",
+        f"""SELECT setval('{OPCIONES_SEQ}', GREATEST(
+            (SELECT COALESCE(MAX(id_opcion), 0) FROM opciones),
+            (SELECT last_value FROM {OPCIONES_SEQ}), 1))"""
+    ]
+    try:
+        pool = await get_pg_pool()
+    except Exception as e:
+        logger.warning(f"Could not ensure PostgreSQL schema: {e}")
+        return
+    async with pool.acquire() as conn:
+        await ensure_rendicion_unique(conn)
+        for statement in ddl:
+            try:
+                await conn.execute(statement)
+            except asyncpg.PostgresError as e:
+                logger.warning(f"Could not ensure PostgreSQL schema object: {e}")
+
+@app.on_event("startup")
+async def load_permission_matrix():
+    try:
+        await permission_matrix.rebuild()
+    except Exception as e:
+        logger.warning(f"Could not build permission matrix: {e}")
+
+@app.on_event("startup")
+async def ensure_dashboard():
+    """Create dashboard_resumen and build it on first run."""
+    try:
+        pool = await get_pg_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(DASHBOARD_TABLE_DDL)
+            if not await conn.fetchval("SELECT EXISTS (SELECT 1 FROM dashboard_resumen)"):
+                await refresh_dashboard(conn)
+                logger.info("Dashboard summary built")
+    except Exception as e:
+        logger.warning(f"Could not prepare dashboard summary: {e}")
+
+@app.on_event("startup")
+async def ensure_mongo_indexes():
+    try:
+        await db.archivos_rendicion.create_index("id", unique=True)
+        await db.archivos_rendicion.create_index("sha256")
+        await db.archivos_rendicion.create_index([("id_indicador", 1), ("gestion", 1)])
+        await db.jobs.create_index("id", unique=True)
+        await db.jobs.create_index([("id_usuario", 1), ("creado", -1)])
+        await db.jobs.create_index("estado")
+    except Exception as e:
+        logger.warning(f"Could not ensure MongoDB indexes: {e}")
+
+@app.on_event("startup")
+async def ensure_blob_refs():
+    """Count the references of blobs stored before blob_refs existed."""
+    try:
+        if not await db.blob_refs.estimated_document_count():
+            blobs = await rebuild_blob_refs()
+            if blobs:
+                logger.info(f"Counted references of {blobs} stored blobs")
+    except Exception as e:
+        logger.warning(f"Could not count blob references: {e}")
+
+@app.on_event("startup")
+async def start_job_runner():
+    try:
+        await job_runner.start()
+    except Exception as e:
+        logger.warning(f"Could not start background jobs: {e}")
+
+@app.on_event("startup")
+async def setup_cache():
+    """Prepare the shared cache tier and take the revocations made before this worker started."""
+    if cache_backend is None:
+        return
+    try:
+        await cache_backend.setup()
+        await token_registry.load()
+    except Exception as e:
+        logger.warning(f"Shared cache ({CACHE_BACKEND}) not available at startup: {e}")
+
+@app.on_event("startup")
+async def start_event_bus():
+    event_bus.start()
+
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown():
     global pg_pool
+    await event_bus.stop()
+    await job_runner.stop()
+    if cache_backend:
+        await cache_backend.close()
     client.close()
+    password_hasher.shutdown()
     if pg_pool:
         await pg_pool.close()
+    if pg_replica_pool:
+        await pg_replica_pool.close()
@@ -558,7 +558,9 @@ function SeguimientoView({ user }) {
         id_indicador: selectedIndicador.id_indicador,
         gestion,
         id_area: selectedIndicador.id_area || user?.id_area,
-        ...rendicion
+        ...rendicion,
+        // Version loaded with the record (0: new); the server answers 409 if someone saved it meanwhile
+        version: rendicion.version ?? 0
       };
       
       const res = await fetch(`${API_URL}/api/sms/rendicion`, {
@@ -0,0 +1,76 @@
+import os
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+
+# server.py reads these at import time; nothing connects until first use
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'sms_test')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+class FakeConnection:
+    """Enough of an asyncpg connection for handler tests.
+
+    Each query is answered by the first `on()` whose SQL fragment it contains
+    (a value, or a function of the query arguments); others get None or [].
+    Every call is kept in `calls` as (sql, args).
+    """
+
+    def __init__(self):
+        self.answers = []
+        self.calls = []
+
+    def on(self, fragment: str, answer):
+        self.answers.append((fragment, answer))
+
+    def queries(self, fragment: str) -> list:
+        return [args for sql, args in self.calls if fragment in sql]
+
+    def _answer(self, sql, args):
+        self.calls.append((sql, args))
+        for fragment, answer in self.answers:
+            if fragment in sql:
+                return answer(*args) if callable(answer) else answer
+        return None
+
+    async def fetch(self, sql, *args, timeout=None):
+        return self._answer(sql, args) or []
+
+    async def fetchrow(self, sql, *args, timeout=None):
+        return self._answer(sql, args)
+
+    async def fetchval(self, sql, *args, timeout=None):
+        return self._answer(sql, args)
+
+    async def execute(self, sql, *args, timeout=None):
+        self._answer(sql, args)
+
+    async def executemany(self, sql, records):
+        for record in records:
+            self._answer(sql, tuple(record))
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+@pytest.fixture
+def pg(monkeypatch):
+    """A FakeConnection behind server's primary pool (reads use it too)."""
+    import server
+
+    conn = FakeConnection()
+    monkeypatch.setattr(server, "pg_pool", FakePool(conn))
+    return conn
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+import dedupe_uploads
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / "blobs").mkdir()
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(server, "db", AsyncMongoMockClient()["sms_test"])
+    # No lifespan: nothing connects to PostgreSQL
+    return TestClient(server.app)
+
+
+def upload(client, data: bytes, id_indicador=3, gestion=2025, descripcion="informe"):
+    response = client.post(
+        "/api/sms/archivos",
+        files={"archivo": ("informe.pdf", data, "application/pdf")},
+        data={"id_indicador": str(id_indicador), "gestion": str(gestion), "descripcion": descripcion}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_list_after_upload(client):
+    data = b"%PDF-1.4 contenido"
+    subido = upload(client, data)
+
+    response = client.get("/api/sms/archivos/3/2025")
+    assert response.status_code == 200
+    archivos = response.json()
+    assert len(archivos) == 1
+    archivo = archivos[0]
+    assert archivo["id"] == subido["id"]
+    assert archivo["nombre_original"] == "informe.pdf"
+    assert archivo["descripcion"] == "informe"
+    assert archivo["tamaño"] == len(data)
+    assert archivo["sha256"] == hashlib.sha256(data).hexdigest()
+    assert set(archivo) == set(server.ARCHIVO_FIELDS)
+    assert client.get("/api/sms/archivos/3/2024").json() == []
+
+
+def test_list_pages_with_cursor(client):
+    ids = [upload(client, f"archivo {i}".encode())["id"] for i in range(3)]
+
+    first = client.get("/api/sms/archivos/3/2025", params={"limit": 2})
+    cursor = first.headers["x-next-cursor"]
+    second = client.get("/api/sms/archivos/3/2025", params={"limit": 2, "cursor": cursor})
+    assert [a["id"] for a in first.json() + second.json()] == ids
+    assert "x-next-cursor" not in second.headers
+
+
+def test_query_groups_by_pair(client):
+    subido = upload(client, b"uno", id_indicador=1)
+    upload(client, b"dos", id_indicador=2)
+
+    response = client.post("/api/sms/archivos/query", json={
+        "pares": [{"id_indicador": 1, "gestion": 2025}, {"id_indicador": 9, "gestion": 2025}],
+        "fields": ["nombre_original"]
+    })
+    assert response.status_code == 200
+    assert response.json()["resultados"] == [
+        {"id_indicador": 1, "gestion": 2025, "archivos": [
+            {"id": subido["id"], "id_indicador": 1, "gestion": 2025, "nombre_original": "informe.pdf"}
+        ]},
+        {"id_indicador": 9, "gestion": 2025, "archivos": []}
+    ]
+
+
+async def legacy_archivo(id_archivo: str, data: bytes) -> str:
+    """An attachment stored under its own name, before the blob store."""
+    nombre = f"{id_archivo}.pdf"
+    (server.UPLOAD_DIR / nombre).write_bytes(data)
+    await server.db.archivos_rendicion.insert_one({"id": id_archivo, "nombre_almacenado": nombre})
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_dedupe_counts_each_moved_document(client):
+    async def run():
+        sha256 = await legacy_archivo("a", b"mismo contenido")
+        await legacy_archivo("b", b"mismo contenido")
+        await dedupe_uploads.main(dry_run=False)
+        return sha256, await server.db.blob_refs.find_one({"_id": sha256})
+
+    sha256, refs = asyncio.run(run())
+    assert refs["refs"] == 2
+    assert (server.UPLOAD_DIR / server.blob_relative_path(sha256)).exists()
+    assert not (server.UPLOAD_DIR / "a.pdf").exists()
+
+
+def test_dedupe_releases_blob_of_document_deleted_meanwhile(client, monkeypatch):
+    acquire_blob = server.acquire_blob
+
+    async def acquire_then_delete(sha256):
+        await acquire_blob(sha256)
+        # delete_archivo of a document not moved yet: no reference to release
+        await server.db.archivos_rendicion.delete_one({"id": "a"})
+
+    async def run():
+        sha256 = await legacy_archivo("a", b"borrado durante la migracion")
+        await dedupe_uploads.main(dry_run=False)
+        return sha256, await server.db.blob_refs.find_one({"_id": sha256})
+
+    monkeypatch.setattr(server, "acquire_blob", acquire_then_delete)
+    sha256, refs = asyncio.run(run())
+    assert refs is None
+    assert not (server.UPLOAD_DIR / server.blob_relative_path(sha256)).exists()
+
+
+def test_download_ranges(client):
+    data = b"0123456789"
+    subido = upload(client, data)
+    url = f"/api/sms/archivos/download/{subido['id']}"
+
+    parcial = client.get(url, headers={"Range": "bytes=2-4"})
+    assert parcial.status_code == 206
+    assert parcial.content == b"234"
+    assert parcial.headers["content-range"] == "bytes 2-4/10"
+    assert client.get(url, headers={"Range": "bytes=-3"}).content == b"789"
+    assert client.get(url, headers={"Range": "bytes=7-100"}).content == b"789"
+
+    # Ranges that cannot be parsed are ignored: whole file
+    for header in ("bytes=5-2", "bytes=a-b", "bytes=0-1,3-4", "items=0-1"):
+        completo = client.get(url, headers={"Range": header})
+        assert completo.status_code == 200, header
+        assert completo.content == data
+
+    # Valid but selecting nothing
+    for header in ("bytes=-0", "bytes=10-"):
+        refused = client.get(url, headers={"Range": header})
+        assert refused.status_code == 416, header
+        assert refused.headers["content-range"] == "bytes */10"
+
+    # A range for another version of the file is not applied
+    stale = client.get(url, headers={"Range": "bytes=2-4", "If-Range": '"otro"'})
+    assert stale.status_code == 200 and stale.content == data
+    etag = parcial.headers["etag"]
+    assert client.get(url, headers={"Range": "bytes=2-4", "If-Range": etag}).status_code == 206
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+
+def multipart(data: bytes, boundary="limite") -> bytes:
+    return (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="id_indicador"\r\n\r\n3\r\n'
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="gestion"\r\n\r\n2025\r\n'
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="archivo"; filename="informe.pdf"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+
+
+def nothing_stored(tmp_path) -> bool:
+    files = [p for p in tmp_path.rglob("*") if p.is_file()]
+    return files == [] and asyncio.run(server.db.archivos_rendicion.count_documents({})) == 0
+
+
+@pytest.mark.parametrize("size, status", [(64, 200), (65, 413), (200, 413)])
+def test_upload_size_limit(client, tmp_path, monkeypatch, size, status):
+    monkeypatch.setattr(server, "UPLOAD_MAX_BYTES", 64)
+    monkeypatch.setattr(server, "UPLOAD_CHUNK_SIZE", 16)
+    body = multipart(b"x" * size)
+
+    def chunks():
+        # No Content-Length: the limit has to hold while streaming
+        for start in range(0, len(body), 32):
+            yield body[start:start + 32]
+
+    response = client.post(
+        "/api/sms/archivos", content=chunks(), headers={"Content-Type": "multipart/form-data; boundary=limite"}
+    )
+    assert response.status_code == status, response.text
+    if status == 413:
+        assert response.json()["detail"] == "El archivo supera el tamaño máximo permitido"
+        assert nothing_stored(tmp_path)
+    else:
+        assert response.json()["tamaño"] == size
+
+
+def test_upload_refused_from_content_length(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "UPLOAD_MAX_BYTES", 64)
+    monkeypatch.setattr(server, "UPLOAD_FORM_MAX_BYTES", 64)
+    # The body itself is within the limit; only the declared length is not
+    body = multipart(b"x" * 10)
+
+    def chunks():
+        yield body
+
+    response = client.post("/api/sms/archivos", content=chunks(), headers={
+        "Content-Type": "multipart/form-data; boundary=limite", "Content-Length": "129"
+    })
+    assert response.status_code == 413
+    assert nothing_stored(tmp_path)
+
+
+def test_upload_form_fields_are_limited(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "UPLOAD_FORM_MAX_BYTES", 16)
+    response = client.post(
+        "/api/sms/archivos",
+        files={"archivo": ("informe.pdf", b"%PDF", "application/pdf")},
+        data={"id_indicador": "3", "gestion": "2025", "descripcion": "d" * 100}
+    )
+    assert response.status_code == 413
+    assert nothing_stored(tmp_path)
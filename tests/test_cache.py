@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+def test_concurrent_gets_share_one_load_and_release_locks():
+    cache = server.TieredCache("test", max_size=2, ttl=60)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return b"valor"
+
+    async def run():
+        same = await asyncio.gather(*[cache.get("area", "1", loader) for _ in range(5)])
+        # More keys than the LRU keeps: none of their locks may stay behind
+        for id_entidad in range(20):
+            await cache.get("area", f"entidad:{id_entidad}", loader)
+        return same
+
+    assert asyncio.run(run()) == [b"valor"] * 5
+    assert len(loads) == 21
+    assert cache._locks == {}
+    assert cache.stats()["entries"] == 2
+
+
+@pytest.fixture
+def client(pg, monkeypatch):
+    monkeypatch.setattr(server, "catalog_cache", server.TieredCache(
+        "catalogos", server.CACHE_LOCAL_SIZE, server.CATALOG_CACHE_TTL, None, server.catalog_entry
+    ))
+    sectores = [{"id": 1, "nombre": "Salud", "estado": "ACTIVO"}, {"id": 2, "nombre": "Educación", "estado": "ACTIVO"}]
+
+    def update(nombre, estado, id):
+        sectores[id - 1] = {"id": id, "nombre": nombre, "estado": estado}
+        return sectores[id - 1]
+
+    pg.on("FROM sector ORDER BY", lambda: list(sectores))
+    pg.on("UPDATE sector", update)
+    return TestClient(server.app)
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ('*', True),
+    ('"abcd"', False),
+])
+def test_etag_matches(header, matches):
+    assert server.etag_matches(header, '"abc"') is matches
+
+
+def test_catalog_served_from_cache_with_etag(client, pg):
+    first = client.get("/api/sms/sectores")
+    assert first.status_code == 200
+    assert [s["nombre"] for s in first.json()] == ["Salud", "Educación"]
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    again = client.get("/api/sms/sectores", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    assert len(pg.queries("FROM sector ORDER BY")) == 1
+    assert server.catalog_cache.stats()["hits"] == 1
+
+
+def test_write_invalidates_catalog(client, pg):
+    etag = client.get("/api/sms/sectores").headers["etag"]
+
+    response = client.put("/api/sms/sectores/1", json={"nombre": "Salud Pública", "estado": "ACTIVO"})
+    assert response.status_code == 200
+    # Other workers are told through the event bus
+    assert any('"tabla":"sector"' in args[1] for args in pg.queries("pg_notify"))
+
+    fresh = client.get("/api/sms/sectores", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.json()[0]["nombre"] == "Salud Pública"
+    assert fresh.headers["etag"] != etag
+    assert len(pg.queries("FROM sector ORDER BY")) == 2
+
+
+def test_drop_from_another_worker_reloads(client, pg):
+    client.get("/api/sms/sectores")
+    server.catalog_cache.drop("sector")
+    client.get("/api/sms/sectores")
+    assert len(pg.queries("FROM sector ORDER BY")) == 2
@@ -0,0 +1,97 @@
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import server
+
+LARGE = b'{"filas": [' + b'{"id": 1, "nombre": "Salud"}, ' * 100 + b'{}]}'
+
+
+def large(request):
+    return Response(LARGE, media_type="application/json")
+
+
+def small(request):
+    return Response(b'{"id": 1}', media_type="application/json")
+
+
+def streamed(request):
+    async def chunks():
+        for _ in range(3):
+            yield LARGE
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+
+def events(request):
+    return StreamingResponse(iter([LARGE]), media_type="text/event-stream")
+
+
+def ranged(request):
+    return Response(LARGE, media_type="text/plain", headers={"Accept-Ranges": "bytes"})
+
+
+def image(request):
+    return Response(LARGE, media_type="image/png")
+
+
+def not_modified(request):
+    return PlainTextResponse("", status_code=304)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "brotli", None)
+    routes = [Route(f"/{f.__name__}", f) for f in (large, small, streamed, events, ranged, image, not_modified)]
+    app = server.CompressionMiddleware(Starlette(routes=routes), minimum_size=500)
+    return TestClient(app)
+
+
+def get(client, path, accept_encoding="gzip"):
+    response = client.get(path, headers={"Accept-Encoding": accept_encoding})
+    assert response.status_code in (200, 304)
+    return response
+
+
+def test_large_json_is_gzipped(client):
+    with client.stream("GET", "/large", headers={"Accept-Encoding": "br, gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["content-length"] == str(len(raw))
+    assert gzip.decompress(raw) == LARGE
+
+
+@pytest.mark.parametrize("accept_encoding", ["", "identity", "gzip;q=0", "deflate, gzip; q=0.0", "br"])
+def test_gzip_only_when_accepted(client, accept_encoding):
+    response = get(client, "/large", accept_encoding)
+    assert "content-encoding" not in response.headers
+    assert response.content == LARGE
+
+
+@pytest.mark.parametrize("path", ["/small", "/events", "/ranged", "/image", "/not_modified"])
+def test_passthrough(client, path):
+    response = get(client, path)
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+
+
+def test_streamed_body_is_compressed_chunk_by_chunk(client):
+    with client.stream("GET", "/streamed", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(raw) == LARGE * 3
+
+
+def test_brotli_preferred_when_installed(monkeypatch):
+    brotli = pytest.importorskip("brotli")
+    monkeypatch.setattr(server, "brotli", brotli)
+    app = server.CompressionMiddleware(Starlette(routes=[Route("/large", large)]), minimum_size=500)
+    with TestClient(app).stream("GET", "/large", headers={"Accept-Encoding": "gzip, br"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "br"
+    assert brotli.decompress(raw) == LARGE
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+import server
+
+ADMIN = {"id_usuario": 1, "id_rol": server.ADMIN_ROL_ID, "id_area": None}
+AREA_3 = {"id_usuario": 7, "id_rol": 2, "id_area": 3}
+AREA_4 = {"id_usuario": 8, "id_rol": 2, "id_area": 4}
+
+
+def received(subscriber) -> list:
+    events = []
+    while not subscriber.queue.empty():
+        frame = subscriber.queue.get_nowait()
+        events.append(json.loads(frame.split("data: ", 1)[1]))
+    return events
+
+
+def test_stream_needs_a_session():
+    client = TestClient(server.app)
+    assert client.get("/api/sms/events").status_code == 401
+    assert client.get("/api/sms/events", params={"token": "x"}).status_code == 401
+
+
+def test_payloads_follow_the_users_permissions():
+    bus = server.EventBus(queue_size=10, replay_size=10)
+    admin, area_3, area_4 = (bus.subscribe(user) for user in (ADMIN, AREA_3, AREA_4))
+
+    bus._broadcast({"tipo": "indicador", "accion": "actualizar", "id_indicador": 5, "fila": {"id_area": 3, "codi": "X"}})
+    bus._broadcast({"tipo": "usuario", "accion": "clave", "id_usuario": 7})
+    bus._broadcast({"tipo": "catalogo", "tabla": "sector", "id": 1, "fila": {"nombre": "Salud"}})
+
+    assert [e["tipo"] for e in received(admin)] == ["indicador", "usuario", "catalogo"]
+    indicador, usuario, catalogo = received(area_3)
+    assert indicador["fila"] == {"id_area": 3, "codi": "X"}
+    assert usuario["id_usuario"] == 7
+    assert catalogo["fila"] == {"nombre": "Salud"}
+    # Another area: the indicator's keys only, and no other user's account events
+    indicador, catalogo = received(area_4)
+    assert indicador == {"tipo": "indicador", "accion": "actualizar", "id_indicador": 5}
+    assert catalogo["tipo"] == "catalogo"
+
+
+def test_replay_applies_the_same_filter():
+    bus = server.EventBus(queue_size=10, replay_size=10)
+    first = bus.subscribe(AREA_4)
+    bus._broadcast({"tipo": "usuario", "accion": "clave", "id_usuario": 7})
+    bus._broadcast({"tipo": "indicador", "id_indicador": 5, "fila": {"id_area": 3}})
+    last_id = f"{bus.worker_id}-0"
+    assert len(received(first)) == 1
+
+    replayed = received(bus.subscribe(AREA_4, last_event_id=last_id))
+    assert replayed == [{"tipo": "indicador", "id_indicador": 5}]
+
+
+def test_streams_stay_out_of_request_metrics():
+    metrics = server.RequestMetrics(server.LATENCY_BUCKETS)
+    seen = []
+
+    async def app(scope, receive, send):
+        scope["route_path"] = "/api/sms/events"
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        seen.append(metrics.in_flight)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def send(message):
+        pass
+
+    middleware = server.MetricsMiddleware(app, metrics)
+    asyncio.run(middleware({"type": "http", "method": "GET", "path": "/api/sms/events"}, None, send))
+    assert seen == [0]
+    assert metrics.in_flight == 0
+    assert metrics.items() == []
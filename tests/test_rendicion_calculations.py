@@ -0,0 +1,64 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import server
+
+COLUMNS = (
+    ['id_rendicion', 'id_indicador', 'gestion', 'programado']
+    + [f'{prefix}_{mes}' for mes in server.MESES for prefix in ('ejecutado', 'acumulado', 'proc_ejecutado')]
+)
+
+
+class BatchConnection:
+    """Enough of an asyncpg connection for recompute_rendicion."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.written = {}
+
+    async def fetch(self, query, *args):
+        return self.rows
+
+    async def executemany(self, query, records):
+        names = [part.split(" = ")[0] for part in query.split(" SET ")[1].split(" WHERE ")[0].split(", ")]
+        for record in records:
+            self.written[record[0]] = dict(zip(names, record[1:]))
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+def row(id_rendicion, programado, *ejecutado):
+    data = {c: None for c in COLUMNS}
+    data.update({'id_rendicion': id_rendicion, 'programado': programado})
+    for mes, value in zip(server.MESES, ejecutado):
+        data[f'ejecutado_{mes}'] = value
+    return data
+
+
+EDGE_ROWS = [
+    row(1, 0, 5, 5),
+    row(2, -10, 5, None, 2.5),
+    row(3, None, 1, 2),
+    row(4, '', '3'),
+    row(5, 3, 0.1, 0.2, 0.0005),
+    row(6, 7, 2.675, 'NaN', 1.0045),
+    row(7, 'abc', 4),
+    row(8, 100, None, None, None),
+]
+
+
+def test_batch_matches_single_row_path(monkeypatch):
+    monkeypatch.setitem(server.table_columns_cache, "rendicion", COLUMNS)
+    conn = BatchConnection(EDGE_ROWS)
+    assert asyncio.run(server.recompute_rendicion(conn, "TRUE")) == len(EDGE_ROWS)
+    for data in EDGE_ROWS:
+        assert conn.written[data['id_rendicion']] == server.compute_rendicion_totals(data, COLUMNS)
+
+
+def test_non_positive_programado_has_no_percentage():
+    for programado in (0, -10, None):
+        derived = server.compute_rendicion_totals(row(1, programado, 5, 5), COLUMNS)
+        assert derived['acumulado_feb'] == 10
+        assert derived['proc_ejecutado_feb'] is None
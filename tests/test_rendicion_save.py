@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+COLUMNS = ['id_rendicion', 'id_indicador', 'gestion', 'version', 'programado', 'ejecutado_ene', 'acumulado_ene']
+STORED = {'id_rendicion': 9, 'id_indicador': 5, 'gestion': 2025, 'version': 3,
+          'programado': 10, 'ejecutado_ene': 1, 'acumulado_ene': 1}
+
+
+@pytest.fixture
+def client(pg, monkeypatch):
+    monkeypatch.setitem(server.table_columns_cache, "rendicion", COLUMNS)
+    pg.on("FROM rendicion WHERE id_indicador = $1 AND gestion = $2", dict(STORED))
+    return TestClient(server.app)
+
+
+def updated(id_rendicion, version, programado, ejecutado_ene, acumulado_ene):
+    return {**STORED, 'version': version + 1, 'programado': programado,
+            'ejecutado_ene': ejecutado_ene, 'acumulado_ene': acumulado_ene}
+
+
+def save(client, **datos):
+    return client.post("/api/sms/rendicion", json={'id_indicador': 5, 'gestion': 2025, **datos})
+
+
+@pytest.mark.parametrize("version", [2, 4, 0, None])
+def test_stale_version_is_refused(client, pg, version):
+    response = save(client, version=version, ejecutado_ene=4)
+    assert response.status_code == 409
+    assert response.json()["detail"] == server.RENDICION_CONFLICT
+    assert pg.queries("UPDATE rendicion SET") == []
+
+
+def test_current_version_saves_and_bumps_it(client, pg):
+    pg.on("UPDATE rendicion SET", updated)
+    response = save(client, version=3, ejecutado_ene=4)
+    assert response.status_code == 200
+    assert response.json()['version'] == 4
+    assert response.json()['acumulado_ene'] == 4
+    (args,) = pg.queries("UPDATE rendicion SET")
+    assert args[:2] == (9, 3)
+
+
+def test_row_changed_after_read_is_refused(client, pg):
+    # The versioned UPDATE matches nothing: another save got in between
+    pg.on("UPDATE rendicion SET", None)
+    assert save(client, version=3, ejecutado_ene=4).status_code == 409
+    assert len(pg.queries("UPDATE rendicion SET")) == 1
+
+
+def test_without_version_retries_then_locks(client, pg):
+    attempts = []
+
+    def update(*args):
+        attempts.append(args)
+        return updated(*args) if len(attempts) == server.RENDICION_SAVE_ATTEMPTS else None
+
+    pg.on("UPDATE rendicion SET", update)
+    response = save(client, ejecutado_ene=4)
+    assert response.status_code == 200
+    assert len(attempts) == server.RENDICION_SAVE_ATTEMPTS
+    assert len(pg.queries("FOR UPDATE")) == 1
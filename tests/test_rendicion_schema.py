@@ -0,0 +1,80 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+import server
+import dedupe_rendicion
+
+COLUMNS = ['id_rendicion', 'id_indicador', 'gestion', 'version', 'programado', 'meta', 'ejecutado_enero', 'acumulado_enero']
+
+
+class SchemaConnection:
+    """Enough of an asyncpg connection for ensure_rendicion_unique.
+
+    `index_after_lock` plays another worker that created the index while
+    this one waited for the table lock.
+    """
+
+    def __init__(self, duplicates=(), index=False, index_after_lock=False):
+        self.duplicates = list(duplicates)
+        self.index = index
+        self.index_after_lock = index_after_lock
+        self.executed = []
+
+    async def fetchval(self, query, *args):
+        return self.index
+
+    async def fetch(self, query, *args):
+        return self.duplicates
+
+    async def execute(self, query, *args):
+        self.executed.append(query)
+        if query.startswith("LOCK") and self.index_after_lock:
+            self.index = True
+        if query.startswith("CREATE UNIQUE INDEX"):
+            self.index = True
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+def test_existing_index_takes_no_lock():
+    conn = SchemaConnection(index=True)
+    asyncio.run(server.ensure_rendicion_unique(conn))
+    assert conn.executed == []
+
+
+def test_index_created_by_another_worker_is_rechecked_after_lock():
+    conn = SchemaConnection(index_after_lock=True)
+    asyncio.run(server.ensure_rendicion_unique(conn))
+    assert not any(q.startswith("CREATE") for q in conn.executed)
+
+
+def test_index_created_when_no_duplicates():
+    conn = SchemaConnection()
+    asyncio.run(server.ensure_rendicion_unique(conn))
+    assert "IF NOT EXISTS" in conn.executed[-1] and conn.index
+
+
+def test_duplicates_stop_startup_without_deleting():
+    conn = SchemaConnection(duplicates=[{'id_indicador': 5, 'gestion': 2025, 'ids': [9, 4]}])
+    with pytest.raises(RuntimeError, match="dedupe_rendicion.py"):
+        asyncio.run(server.ensure_rendicion_unique(conn))
+    assert not any(q.startswith(("DELETE", "CREATE")) for q in conn.executed)
+    assert not conn.index
+
+
+def test_merge_keeps_newest_and_fills_its_gaps():
+    newest = {'id_rendicion': 9, 'id_indicador': 5, 'gestion': 2025, 'version': 3,
+              'programado': 10, 'meta': '', 'ejecutado_enero': None, 'acumulado_enero': None}
+    older = {'id_rendicion': 4, 'id_indicador': 5, 'gestion': 2025, 'version': 7,
+             'programado': 20, 'meta': 'Meta', 'ejecutado_enero': 4, 'acumulado_enero': 4}
+    merged, conflicts = dedupe_rendicion.merge_rows([newest, older], COLUMNS)
+    assert merged['id_rendicion'] == 9 and merged['version'] == 3
+    assert merged['programado'] == 10
+    assert merged['meta'] == 'Meta'
+    assert merged['ejecutado_enero'] == 4
+    assert merged['acumulado_enero'] == 4
+    assert conflicts == ['programado']
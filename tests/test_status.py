@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "db", AsyncMongoMockClient()["sms_test"])
+    return TestClient(server.app)
+
+
+def test_status_checks_only_expose_model_fields(client):
+    asyncio.run(server.db.status_checks.insert_one({
+        "id": "abc", "client_name": "web", "timestamp": "2025-03-01T10:00:00+00:00", "interno": "secreto"
+    }))
+    client.post("/api/status", json={"client_name": "movil"})
+
+    checks = client.get("/api/status").json()
+    assert [c["client_name"] for c in checks] == ["web", "movil"]
+    assert all(set(c) == {"id", "client_name", "timestamp"} for c in checks)
+    assert checks[0]["timestamp"] == "2025-03-01T10:00:00+00:00"
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = server.TokenRegistry(max_size=2)
+    monkeypatch.setattr(server, "token_registry", registry)
+    return registry
+
+
+def token_for(id_usuario: int) -> str:
+    return server.create_token({"id_usuario": id_usuario, "id_rol": 2, "id_area": 3})
+
+
+def rejected(registry, token) -> str:
+    with pytest.raises(HTTPException) as error:
+        registry.verify(token)
+    assert error.value.status_code == 401
+    return error.value.detail
+
+
+def test_verified_claims_are_cached(registry):
+    token = token_for(7)
+    assert registry.verify(token)["id_usuario"] == 7
+    assert registry.verify(token)["id_usuario"] == 7
+    assert (registry.hits, registry.misses) == (1, 1)
+    assert rejected(registry, token + "x") == "Token inválido"
+    # The LRU keeps max_size tokens
+    token_for_8, token_for_9 = token_for(8), token_for(9)
+    registry.verify(token_for_8)
+    registry.verify(token_for_9)
+    assert registry.stats()["entries"] == 2
+
+
+def test_revoked_token_is_rejected_even_when_cached(registry):
+    token, other = token_for(7), token_for(7)
+    claims = registry.verify(token)
+    registry.revoke(token, claims["exp"])
+    assert rejected(registry, token) == "Token revocado"
+    assert registry.verify(other)["id_usuario"] == 7
+
+
+def test_expired_revocations_are_forgotten(registry):
+    registry.revoke_key("viejo", time.time() - 1)
+    registry.revoke(token_for(7), time.time() + 60)
+    assert registry.stats()["revoked"] == 1
+
+
+def test_epoch_rejects_tokens_issued_before_it(registry):
+    before, other_user = token_for(7), token_for(8)
+    registry.verify(before)
+    registry.revoke_user(7)
+    assert rejected(registry, before) == "Token revocado"
+    assert registry.verify(other_user)["id_usuario"] == 8
+    assert registry.verify(token_for(7))["id_usuario"] == 7
+    # An older epoch from a late event never moves it back
+    registry.revoke_user(7, 1.0)
+    assert rejected(registry, before) == "Token revocado"
+
+
+def test_revocations_from_other_workers(registry):
+    token = token_for(7)
+    claims = registry.verify(token)
+    server.event_bus._apply({"tipo": "sesion", "clave": registry._key(token), "exp": claims["exp"]})
+    assert rejected(registry, token) == "Token revocado"
+
+    other = token_for(8)
+    server.event_bus._apply({"tipo": "usuario", "id_usuario": 8, "revocado": time.time()})
+    assert rejected(registry, other) == "Token revocado"
+
+
+def test_logout_and_password_change_end_sessions(registry, pg):
+    client = TestClient(server.app)
+    token = token_for(7)
+    auth = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/sms/verify-token", headers=auth).status_code == 200
+
+    assert client.post("/api/sms/logout", headers=auth).status_code == 200
+    response = client.get("/api/sms/verify-token", headers=auth)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revocado"
+    assert any('"tipo":"sesion"' in args[1] for args in pg.queries("pg_notify"))
+
+    token = token_for(7)
+    auth = {"Authorization": f"Bearer {token}"}
+    assert client.put("/api/sms/usuarios/7/clave", data={"clave": "nueva-clave"}, headers=auth).status_code == 200
+    assert pg.queries("UPDATE usuario SET clave")
+    assert client.get("/api/sms/verify-token", headers=auth).status_code == 401
+    assert client.get("/api/sms/verify-token", headers={"Authorization": f"Bearer {token_for(7)}"}).status_code == 200